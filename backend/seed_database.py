@@ -8,7 +8,7 @@ import os
 from datetime import datetime, timezone, timedelta
 from uuid import uuid4
 import random
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import AsyncMongoClient
 from passlib.context import CryptContext
 
 # Password hashing
@@ -33,7 +33,7 @@ MONTREAL_LOCATIONS = [
 ]
 
 async def seed_database():
-    client = AsyncIOMotorClient(MONGO_URL)
+    client = AsyncMongoClient(MONGO_URL)
     db = client[DB_NAME]
     
     print("🗑️  Clearing existing data...")
@@ -43,6 +43,8 @@ async def seed_database():
     await db.platform_settings.delete_many({})
     
     now = datetime.now(timezone.utc)
+    # Every demo account shares one password; hash it once rather than per account
+    demo_password = pwd_context.hash("demo123")
     
     # ==================== USERS ====================
     print("👤 Creating users...")
@@ -51,7 +53,7 @@ async def seed_database():
         {
             "id": str(uuid4()),
             "email": "user@demo.com",
-            "password": pwd_context.hash("demo123"),
+            "password": demo_password,
             "name": "John Doe",
             "first_name": "John",
             "last_name": "Doe",
@@ -72,7 +74,7 @@ async def seed_database():
         {
             "id": str(uuid4()),
             "email": "user2@demo.com",
-            "password": pwd_context.hash("demo123"),
+            "password": demo_password,
             "name": "Jane Smith",
             "first_name": "Jane",
             "last_name": "Smith",
@@ -89,8 +91,7 @@ async def seed_database():
         }
     ]
     
-    await db.users.insert_many(users)
-    print(f"   ✅ Created {len(users)} users")
+    print(f"   ✅ Prepared {len(users)} users")
     
     # ==================== ADMIN ====================
     print("👑 Creating admin...")
@@ -98,7 +99,7 @@ async def seed_database():
     admin = {
         "id": str(uuid4()),
         "email": "admin@demo.com",
-        "password": pwd_context.hash("demo123"),
+        "password": demo_password,
         "name": "Admin User",
         "first_name": "Admin",
         "last_name": "User",
@@ -110,8 +111,9 @@ async def seed_database():
         "is_verified": True
     }
     
-    await db.users.insert_one(admin)
-    print("   ✅ Created admin user")
+    # Users and admin go in one batch
+    await db.users.insert_many([*users, admin], ordered=False)
+    print(f"   ✅ Created {len(users)} users and admin user")
     
     # ==================== DRIVERS ====================
     print("🚗 Creating drivers...")
@@ -146,7 +148,7 @@ async def seed_database():
         driver = {
             "id": str(uuid4()),
             "email": email,
-            "password": pwd_context.hash("demo123"),
+            "password": demo_password,
             "name": f"{first} {last}",
             "first_name": first,
             "last_name": last,
@@ -157,6 +159,8 @@ async def seed_database():
             "rating": round(4.5 + random.random() * 0.5, 1),
             "total_trips": random.randint(50, 500),
             "total_earnings": round(random.uniform(5000, 50000), 2),
+            "earnings_today": 0.0,
+            "earnings_date": now.date().isoformat(),
             "points": points,
             "tier": tier,
             "vehicle": {
@@ -184,7 +188,7 @@ async def seed_database():
         }
         drivers.append(driver)
     
-    await db.drivers.insert_many(drivers)
+    await db.drivers.insert_many(drivers, ordered=False)
     await db.drivers.create_index([("location", "2dsphere")])
     print(f"   ✅ Created {len(drivers)} drivers (5 online, 3 offline)")
     
@@ -225,7 +229,7 @@ async def seed_database():
         }
         bookings.append(booking)
     
-    await db.bookings.insert_many(bookings)
+    await db.bookings.insert_many(bookings, ordered=False)
     print(f"   ✅ Created {len(bookings)} bookings")
     
     # ==================== PLATFORM SETTINGS ====================
@@ -260,7 +264,7 @@ async def seed_database():
     print("-"*50)
     print("\n🚀 Ready for live testing!")
     
-    client.close()
+    await client.close()
 
 if __name__ == "__main__":
     asyncio.run(seed_database())
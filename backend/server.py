@@ -1,24 +1,37 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Request, UploadFile, File, Form, Cookie, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import AsyncMongoClient
+from pymongo import ReplaceOne, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure, PyMongoError
 import os
 import logging
 from pathlib import Path
+from functools import lru_cache
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import uuid
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, date, timezone, timedelta
 from jose import JWTError, jwt
-from passlib.context import CryptContext
+import bcrypt
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 import json
+import csv
+import io
 import math
+import base64
+import hashlib
+import time
+import asyncio
 import stripe
 import random
 import httpx
 import aiofiles
+import numpy as np
+import orjson
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -32,10 +45,26 @@ DOCUMENTS_DIR.mkdir(parents=True, exist_ok=True)
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+# tz_aware so native BSON Date fields come back as UTC-aware datetimes.
+# Pool sized for bursty meter traffic; a saturated pool fails fast instead of queueing forever.
+client = AsyncMongoClient(
+    mongo_url,
+    tz_aware=True,
+    maxPoolSize=int(os.environ.get('MONGO_MAX_POOL_SIZE', 200)),
+    minPoolSize=int(os.environ.get('MONGO_MIN_POOL_SIZE', 20)),
+    waitQueueTimeoutMS=2000,
+    maxIdleTimeMS=60000,
+    serverSelectionTimeoutMS=3000,
+    retryWrites=True
+)
 db = client[os.environ['DB_NAME']]
 
-# Stripe configuration
+async def aggregate_list(collection, pipeline: list, length: Optional[int] = None) -> list:
+    """Run an aggregation and collect up to `length` results (aggregate() is awaited in PyMongo Async)."""
+    cursor = await collection.aggregate(pipeline)
+    return await cursor.to_list(length)
+
+# Stripe configuration (fallback key; a secret saved via /admin/stripe/config takes precedence)
 stripe.api_key = os.environ.get('STRIPE_API_KEY', 'sk_test_emergent')
 
 # JWT Configuration
@@ -44,19 +73,148 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost factor; existing hashes keep verifying whatever rounds they were made with
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+BCRYPT_MAX_BYTES = 72  # bcrypt ignores anything past this, as passlib did
+
+def _bcrypt_hash(password: str) -> str:
+    return bcrypt.hashpw(password.encode("utf-8")[:BCRYPT_MAX_BYTES], bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode("ascii")
+
+def _bcrypt_verify(password: str, hashed: str) -> bool:
+    try:
+        return bcrypt.checkpw(password.encode("utf-8")[:BCRYPT_MAX_BYTES], hashed.encode("ascii"))
+    except ValueError:
+        # Missing or malformed stored hash
+        return False
 security = HTTPBearer(auto_error=False)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Transpo API", description="Multi-Service Mobility Platform")
+app = FastAPI(
+    title="Transpo API",
+    description="Multi-Service Mobility Platform",
+    default_response_class=ORJSONResponse
+)
 api_router = APIRouter(prefix="/api")
 
 # Mount static files for uploads
 app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
 
+# ============== TIME HELPERS ==============
+
+_day_stamp_cache = (None, "")  # (date, "YYYYMMDD") used in case/payout/dispute references
+
+def utc_now_iso() -> str:
+    """Current UTC time as an ISO string. Call once per handler and reuse."""
+    return datetime.now(timezone.utc).isoformat()
+
+def as_utc_datetime(value) -> datetime:
+    """Aware UTC datetime from a stored timestamp, either a native BSON Date or a legacy ISO string."""
+    if isinstance(value, str):
+        # Our own writes use isoformat() ("+00:00"); only external writers send a "Z" suffix
+        if value.endswith("Z"):
+            value = value[:-1] + "+00:00"
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+def day_stamp() -> str:
+    """Local YYYYMMDD stamp for reference numbers, re-formatted only when the day changes."""
+    global _day_stamp_cache
+    today = date.today()
+    if _day_stamp_cache[0] != today:
+        _day_stamp_cache = (today, today.strftime('%Y%m%d'))
+    return _day_stamp_cache[1]
+
+# ============== CACHE HELPERS ==============
+
+class TTLCache:
+    """Small in-process cache whose entries expire after `ttl` seconds."""
+    
+    def __init__(self, maxsize: int = 128, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: Dict[Any, tuple] = {}
+    
+    def get(self, key, default=None):
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return default
+        return value
+    
+    def set(self, key, value):
+        if key not in self._data and len(self._data) >= self.maxsize:
+            # Evict the oldest insertion
+            self._data.pop(next(iter(self._data)))
+        self._data[key] = (time.monotonic() + self.ttl, value)
+    
+    def pop(self, key):
+        self._data.pop(key, None)
+    
+    def clear(self):
+        self._data.clear()
+
+# Slowly-changing config documents (commission, merchant/payout settings, Stripe config).
+# PUT handlers invalidate their entry; other workers pick up changes within the TTL.
+config_cache = TTLCache(maxsize=32, ttl=30)
+_CACHE_MISS = object()
+
+async def get_cached(name: str, loader):
+    """Return the cached value for `name`, awaiting `loader()` on a miss (None results are cached too)."""
+    value = config_cache.get(name, _CACHE_MISS)
+    if value is _CACHE_MISS:
+        value = await loader()
+        config_cache.set(name, value)
+    return value
+
+def invalidate_cached(*names: str):
+    """Drop cached config entries after they are modified."""
+    for name in names:
+        config_cache.pop(name)
+
+async def get_commission_rate() -> float:
+    """Active commission rate as a fraction (defaults to 15%)."""
+    config = await get_cached(
+        "commission_config",
+        lambda: db.commission_configs.find_one({"is_active": True}, {"_id": 0})
+    )
+    return config.get("rate", 15) / 100 if config else 0.15
+
+async def load_merchant_settings() -> Optional[dict]:
+    """Platform merchant settings document (cached)."""
+    return await get_cached(
+        "merchant_settings",
+        lambda: db.merchant_settings.find_one({"type": "platform"}, {"_id": 0})
+    )
+
+async def load_payout_settings() -> Optional[dict]:
+    """Global driver payout settings document (cached)."""
+    return await get_cached(
+        "payout_settings",
+        lambda: db.payout_settings.find_one({"type": "global"}, {"_id": 0})
+    )
+
+async def load_platform_settings() -> Optional[dict]:
+    """Global platform settings document (cached; read on every meter stop)."""
+    return await get_cached(
+        "platform_settings",
+        lambda: db.platform_settings.find_one({"type": "global"}, {"_id": 0})
+    )
+
+async def load_stripe_config() -> Optional[dict]:
+    """Platform Stripe configuration document (cached)."""
+    return await get_cached(
+        "stripe_config",
+        lambda: db.stripe_config.find_one({"type": "platform"}, {"_id": 0})
+    )
+
 # ============== MODELS ==============
 
 class UserCreate(BaseModel):
@@ -217,6 +375,9 @@ DRIVER_TIERS = {
 POINTS_PER_COMPLETED_TRIP = 10
 POINTS_BONUS_FIVE_STAR = 5
 
+# Extra match score per tier so higher tier drivers get slight priority
+DRIVER_TIER_MATCH_BONUS = {"silver": 0, "gold": 0.05, "platinum": 0.1, "diamond": 0.15}
+
 def get_driver_tier(points: int) -> dict:
     """Get driver tier based on points"""
     for tier_name, tier_info in DRIVER_TIERS.items():
@@ -268,21 +429,33 @@ FARE_CONFIG = {
     }
 }
 
+# Time-of-day surge: 1.25x during the 7-9am and 5-7pm rush hours, indexed by local hour
+SURGE_BY_HOUR = tuple(1.25 if 7 <= hour <= 9 or 17 <= hour <= 19 else 1.0 for hour in range(24))
+
 COMPETITOR_PRICING = {
     "UberX": {"base": 2.75, "per_km": 1.55, "per_min": 0.35},
     "Lyft": {"base": 2.50, "per_km": 1.60, "per_min": 0.40},
     "TaxiCoop": {"base": 3.80, "per_km": 1.90, "per_min": 0.70}
 }
 
+EARTH_RADIUS_KM = 6371
+
+# Haversine with the 2·asin(√a) closed form (one transcendental instead of atan2's two);
+# a is clamped because rounding can push it a hair past 1 for antipodal points
 def calculate_distance_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
-    R = 6371
     lat1_rad = math.radians(lat1)
     lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lng = math.radians(lng2 - lng1)
-    a = math.sin(delta_lat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lng/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    return R * c
+    a = math.sin((lat2_rad - lat1_rad) / 2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(math.radians(lng2 - lng1) / 2)**2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+def calculate_distances_km(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Vectorized calculate_distance_km from one point to arrays of points."""
+    # Origin terms are computed once, not per destination
+    lat_rad = math.radians(lat)
+    cos_lat = math.cos(lat_rad)
+    lats_rad = np.radians(lats)
+    a = np.sin((lats_rad - lat_rad) / 2)**2 + cos_lat * np.cos(lats_rad) * np.sin(np.radians(lngs - lng) / 2)**2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
 
 def estimate_duration_minutes(distance_km: float, traffic_factor: float = 1.0) -> float:
     avg_speed_kmh = 30 / traffic_factor
@@ -326,67 +499,109 @@ def get_competitor_estimates(distance_km: float, duration_min: float) -> List[Di
         })
     return sorted(estimates, key=lambda x: x["estimated_fare"])
 
+# Fare estimates are memoised: riders and dashboards re-poll the same trips, and public
+# estimates snap pickup/dropoff to a ~110m grid (3 decimal places) so riders quoting the
+# same corridor share entries. Duration derives from distance, so each grid cell pair maps
+# to one set of fare and competitor inputs.
+FARE_ESTIMATE_GRID_DECIMALS = 3
+
+@lru_cache(maxsize=50000)
+def _cached_trip_metrics(pickup_lat: float, pickup_lng: float, dropoff_lat: float, dropoff_lng: float) -> tuple:
+    distance_km = calculate_distance_km(pickup_lat, pickup_lng, dropoff_lat, dropoff_lng)
+    return distance_km, estimate_duration_minutes(distance_km)
+
+def estimate_trip_metrics(pickup_lat: float, pickup_lng: float, dropoff_lat: float, dropoff_lng: float) -> tuple:
+    """(distance_km, duration_min) between grid-snapped points, memoised per cell pair."""
+    return _cached_trip_metrics(
+        round(pickup_lat, FARE_ESTIMATE_GRID_DECIMALS), round(pickup_lng, FARE_ESTIMATE_GRID_DECIMALS),
+        round(dropoff_lat, FARE_ESTIMATE_GRID_DECIMALS), round(dropoff_lng, FARE_ESTIMATE_GRID_DECIMALS)
+    )
+
+@lru_cache(maxsize=50000)
+def _cached_fare_items(distance_km: float, duration_min: float, vehicle_type: str, surge_multiplier: float) -> tuple:
+    return tuple(calculate_fare(distance_km, duration_min, vehicle_type, surge_multiplier).items())
+
+@lru_cache(maxsize=50000)
+def _cached_competitor_items(distance_km: float, duration_min: float) -> tuple:
+    return tuple(tuple(e.items()) for e in get_competitor_estimates(distance_km, duration_min))
+
+def cached_fare(distance_km: float, duration_min: float, vehicle_type: str = "sedan", surge_multiplier: float = 1.0) -> Dict[str, float]:
+    """calculate_fare memoised on its inputs; returns a fresh dict each call."""
+    return dict(_cached_fare_items(distance_km, duration_min, vehicle_type, surge_multiplier))
+
+def cached_competitor_estimates(distance_km: float, duration_min: float) -> List[Dict]:
+    """get_competitor_estimates memoised on its inputs; returns fresh dicts each call."""
+    return [dict(items) for items in _cached_competitor_items(distance_km, duration_min)]
+
 # ============== DRIVER MATCHING ALGORITHM ==============
 
+def geo_point(lat: float, lng: float) -> dict:
+    """GeoJSON Point for the drivers.current_location 2dsphere index (coordinates are [lng, lat])."""
+    return {"type": "Point", "coordinates": [lng, lat]}
+
 async def find_nearby_drivers(lat: float, lng: float, radius_km: float = 5.0, vehicle_type: str = None, limit: int = 10) -> List[Dict]:
-    query = {"status": "online", "is_available": True}
+    # $geoNear walks the 2dsphere index, keeps only drivers inside the radius and
+    # returns them nearest first with the distance, so scoring only sees a few candidates
+    match = {"status": "online", "is_available": True}
     if vehicle_type:
-        query["vehicle_type"] = vehicle_type
-    drivers = await db.drivers.find(query, {"_id": 0}).to_list(100)
-    scored_drivers = []
-    
-    for driver in drivers:
-        if "location" not in driver:
-            continue
-        
-        driver_lat = driver["location"].get("latitude", 0)
-        driver_lng = driver["location"].get("longitude", 0)
-        distance = calculate_distance_km(lat, lng, driver_lat, driver_lng)
-        
-        if distance <= radius_km:
-            rating = driver.get("rating", 4.5)
-            acceptance_rate = driver.get("acceptance_rate", 0.85)
-            distance_score = (1 / max(distance, 0.1)) * 0.6
-            rating_score = (rating / 5.0) * 0.3
-            acceptance_score = acceptance_rate * 0.1
-            
-            # Tier bonus: higher tier drivers get slight priority
-            tier_info = get_driver_tier(driver.get("points", 0))
-            tier_bonus = {"silver": 0, "gold": 0.05, "platinum": 0.1, "diamond": 0.15}.get(tier_info["tier"], 0)
-            
-            total_score = distance_score + rating_score + acceptance_score + tier_bonus
-            
-            # Priority boost for no-show drivers in same area
-            if driver.get("priority_boost"):
-                boost_location = driver.get("priority_boost_location", {})
-                boost_lat = boost_location.get("latitude", 0)
-                boost_lng = boost_location.get("longitude", 0)
-                # Check if pickup is within 2km of where driver got the no-show
-                if boost_lat and boost_lng:
-                    distance_from_boost = calculate_distance_km(lat, lng, boost_lat, boost_lng)
-                    if distance_from_boost <= 2.0:  # Within 2km of original area
-                        total_score += 0.5  # Significant boost to priority
-            
-            eta_minutes = estimate_duration_minutes(distance, traffic_factor=1.2)
-            scored_drivers.append({
-                **driver,
-                "distance_km": round(distance, 2),
-                "eta_minutes": round(eta_minutes, 1),
-                "match_score": round(total_score, 3),
-                "has_priority_boost": driver.get("priority_boost", False),
-                "tier": tier_info["tier"]
-            })
+        match["vehicle_type"] = vehicle_type
+    pipeline = [
+        {"$geoNear": {
+            "near": geo_point(lat, lng),
+            "key": "current_location",
+            "distanceField": "distance_m",
+            "maxDistance": radius_km * 1000,
+            "spherical": True,
+            "query": match
+        }},
+        {"$limit": limit * 4},
+        {"$project": {"_id": 0}}
+    ]
+    drivers = [d for d in await aggregate_list(db.drivers, pipeline, limit * 4) if "location" in d]
+    if not drivers:
+        return []
+    
+    # Score every candidate in one vectorized pass
+    count = len(drivers)
+    distances = np.fromiter((d.pop("distance_m") / 1000 for d in drivers), dtype=np.float64, count=count)
+    ratings = np.fromiter((d.get("rating", 4.5) for d in drivers), dtype=np.float64, count=count)
+    acceptance = np.fromiter((d.get("acceptance_rate", 0.85) for d in drivers), dtype=np.float64, count=count)
+    tiers = [get_driver_tier(d.get("points", 0))["tier"] for d in drivers]
+    tier_bonus = np.fromiter((DRIVER_TIER_MATCH_BONUS.get(t, 0) for t in tiers), dtype=np.float64, count=count)
+    scores = (1 / np.maximum(distances, 0.1)) * 0.6 + (ratings / 5.0) * 0.3 + acceptance * 0.1 + tier_bonus
+    
+    # Priority boost for no-show drivers whose no-show was within 2km of this pickup
+    boost_locations = [(d.get("priority_boost_location") or {}) if d.get("priority_boost") else {} for d in drivers]
+    boost_lats = np.fromiter((b.get("latitude", 0) or 0 for b in boost_locations), dtype=np.float64, count=count)
+    boost_lngs = np.fromiter((b.get("longitude", 0) or 0 for b in boost_locations), dtype=np.float64, count=count)
+    has_boost = (boost_lats != 0) & (boost_lngs != 0)
+    if has_boost.any():
+        near_boost = has_boost & (calculate_distances_km(lat, lng, boost_lats, boost_lngs) <= 2.0)
+        scores += np.where(near_boost, 0.5, 0.0)
     
-    scored_drivers.sort(key=lambda x: x["match_score"], reverse=True)
-    return scored_drivers[:limit]
+    scored_drivers = []
+    for i in np.argsort(-scores, kind="stable")[:limit].tolist():
+        driver = drivers[i]
+        distance = float(distances[i])
+        scored_drivers.append({
+            **driver,
+            "distance_km": round(distance, 2),
+            "eta_minutes": round(estimate_duration_minutes(distance, traffic_factor=1.2), 1),
+            "match_score": round(float(scores[i]), 3),
+            "has_priority_boost": driver.get("priority_boost", False),
+            "tier": tiers[i]
+        })
+    return scored_drivers
 
 # ============== AUTH HELPERS ==============
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+# bcrypt is deliberately slow; run it off the event loop so other requests keep flowing.
+# Hashes are plain $2b$ bcrypt, so ones made earlier through passlib verify unchanged.
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await asyncio.to_thread(_bcrypt_verify, plain_password, hashed_password)
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def hash_password(password: str) -> str:
+    return await asyncio.to_thread(_bcrypt_hash, password)
 
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
@@ -405,11 +620,7 @@ async def get_current_user(
     if session_token:
         session = await db.user_sessions.find_one({"session_token": session_token}, {"_id": 0})
         if session:
-            expires_at = session.get("expires_at")
-            if isinstance(expires_at, str):
-                expires_at = datetime.fromisoformat(expires_at)
-            if expires_at.tzinfo is None:
-                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            expires_at = as_utc_datetime(session.get("expires_at"))
             if expires_at > datetime.now(timezone.utc):
                 user = await db.users.find_one({"id": session["user_id"]}, {"_id": 0, "password": 0})
                 if not user:
@@ -468,7 +679,7 @@ async def save_upload_file(upload_file: UploadFile, folder: str) -> str:
     if file_ext not in ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.pdf']:
         raise HTTPException(status_code=400, detail="Invalid file type")
     
-    file_id = str(uuid.uuid4())
+    file_id = uuid.uuid4().hex
     filename = f"{file_id}{file_ext}"
     
     if folder == "photos":
@@ -497,14 +708,14 @@ async def register(
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    user_id = str(uuid.uuid4())
+    user_id = uuid.uuid4().hex
     now = datetime.now(timezone.utc).isoformat()
     name = f"{first_name} {last_name}"
     
     user_doc = {
         "id": user_id,
         "email": email,
-        "password": hash_password(password),
+        "password": await hash_password(password),
         "name": name,
         "first_name": first_name,
         "last_name": last_name,
@@ -551,6 +762,7 @@ async def register(
             "earnings_today": 0.0,
             "earnings_total": 0.0,
             "location": {"latitude": 0, "longitude": 0},
+            "current_location": geo_point(0, 0),
             "drivers_license_number": None,
             "drivers_license_expiry": None,
             "drivers_license_photo": None,
@@ -594,14 +806,14 @@ async def register_json(user_data: UserCreate):
     first_name = name_parts[0] if name_parts else "User"
     last_name = " ".join(name_parts[1:]) if len(name_parts) > 1 else ""
     
-    user_id = str(uuid.uuid4())
+    user_id = uuid.uuid4().hex
     now = datetime.now(timezone.utc).isoformat()
     name = f"{first_name} {last_name}".strip()
     
     user_doc = {
         "id": user_id,
         "email": user_data.email,
-        "password": hash_password(user_data.password),
+        "password": await hash_password(user_data.password),
         "name": name,
         "first_name": first_name,
         "last_name": last_name,
@@ -644,6 +856,7 @@ async def register_json(user_data: UserCreate):
             "earnings_today": 0.0,
             "earnings_total": 0.0,
             "location": {"latitude": 0, "longitude": 0},
+            "current_location": geo_point(0, 0),
             "drivers_license_status": "pending",
             "taxi_license_status": "pending",
             "profile_photo_status": "pending",
@@ -678,7 +891,7 @@ async def login(credentials: UserLogin):
     if not user.get("password"):
         raise HTTPException(status_code=401, detail="Please login with social account")
     
-    if not verify_password(credentials.password, user["password"]):
+    if not await verify_password(credentials.password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     token = create_access_token({"sub": user["id"], "role": user["role"]})
@@ -764,7 +977,7 @@ async def process_social_session(request: Request, response: Response):
             )
     else:
         # Create new user
-        user_id = str(uuid.uuid4())
+        user_id = uuid.uuid4().hex
         now = datetime.now(timezone.utc).isoformat()
         
         user_doc = {
@@ -858,7 +1071,7 @@ async def change_password(
         raise HTTPException(status_code=400, detail="Cannot change password for social login accounts. Please use your social provider to manage your password.")
     
     # Verify current password
-    if not verify_password(request.current_password, user["password"]):
+    if not await verify_password(request.current_password, user["password"]):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
     
     # Validate new password
@@ -866,7 +1079,7 @@ async def change_password(
         raise HTTPException(status_code=400, detail="New password must be at least 6 characters")
     
     # Update password
-    new_hashed = hash_password(request.new_password)
+    new_hashed = await hash_password(request.new_password)
     await db.users.update_one(
         {"id": current_user["id"]},
         {"$set": {
@@ -904,7 +1117,7 @@ async def forgot_password(request: ForgotPasswordRequest):
         return {"message": "If an account exists with this email, a password reset link has been sent."}
     
     # Generate reset token
-    reset_token = str(uuid.uuid4())
+    reset_token = uuid.uuid4().hex
     expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
     
     # Store reset token
@@ -914,7 +1127,7 @@ async def forgot_password(request: ForgotPasswordRequest):
             "user_id": user["id"],
             "email": user["email"],
             "token": reset_token,
-            "expires_at": expires_at.isoformat(),
+            "expires_at": expires_at,
             "created_at": datetime.now(timezone.utc).isoformat(),
             "used": False
         }},
@@ -946,9 +1159,7 @@ async def reset_password(request: ResetPasswordRequest):
         raise HTTPException(status_code=400, detail="Invalid or expired reset token")
     
     # Check expiration
-    expires_at = datetime.fromisoformat(reset_record["expires_at"])
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    expires_at = as_utc_datetime(reset_record["expires_at"])
     
     if datetime.now(timezone.utc) > expires_at:
         raise HTTPException(status_code=400, detail="Reset token has expired. Please request a new one.")
@@ -958,7 +1169,7 @@ async def reset_password(request: ResetPasswordRequest):
         raise HTTPException(status_code=400, detail="Password must be at least 6 characters")
     
     # Update password
-    new_hashed = hash_password(request.new_password)
+    new_hashed = await hash_password(request.new_password)
     await db.users.update_one(
         {"id": reset_record["user_id"]},
         {"$set": {
@@ -988,9 +1199,7 @@ async def verify_reset_token(token: str):
     if not reset_record:
         return {"valid": False, "message": "Invalid or expired reset token"}
     
-    expires_at = datetime.fromisoformat(reset_record["expires_at"])
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    expires_at = as_utc_datetime(reset_record["expires_at"])
     
     if datetime.now(timezone.utc) > expires_at:
         return {"valid": False, "message": "Reset token has expired"}
@@ -1091,7 +1300,7 @@ async def get_saved_addresses(current_user: dict = Depends(get_current_user)):
 @api_router.post("/user/saved-addresses")
 async def add_saved_address(address: SavedAddress, current_user: dict = Depends(get_current_user)):
     address_doc = {
-        "id": str(uuid.uuid4()),
+        "id": uuid.uuid4().hex,
         "label": address.label,
         "address": address.address,
         "latitude": address.latitude,
@@ -1153,7 +1362,7 @@ async def update_notification_preferences(prefs: NotificationPreferences, curren
 @api_router.post("/user/payment-methods")
 async def add_payment_method(method: PaymentMethodAdd, current_user: dict = Depends(get_current_user)):
     payment_method = {
-        "id": str(uuid.uuid4()),
+        "id": uuid.uuid4().hex,
         "type": method.type,
         "card_last_four": method.card_last_four,
         "card_brand": method.card_brand,
@@ -1301,7 +1510,8 @@ async def update_driver_location(location: LocationUpdate, current_user: dict =
                 "heading": location.heading,
                 "speed": location.speed,
                 "updated_at": datetime.now(timezone.utc).isoformat()
-            }
+            },
+            "current_location": geo_point(location.latitude, location.longitude)
         }}
     )
     return {"message": "Location updated"}
@@ -1328,7 +1538,13 @@ async def accept_booking(booking_id: str, current_user: dict = Depends(get_curre
     if current_user["role"] != "driver":
         raise HTTPException(status_code=403, detail="Not a driver")
     
-    driver = await db.drivers.find_one({"user_id": current_user["id"]}, {"_id": 0})
+    # The driver update below must wait for the conditional booking claim, so only this read
+    # precedes it; it is trimmed to the fields copied onto the booking
+    driver = await db.drivers.find_one(
+        {"user_id": current_user["id"]},
+        {"_id": 0, "name": 1, "vehicle_color": 1, "vehicle_make": 1, "vehicle_model": 1,
+         "license_plate": 1, "rating": 1, "profile_photo": 1}
+    )
     
     result = await db.bookings.update_one(
         {"id": booking_id, "status": "pending"},
@@ -1363,39 +1579,49 @@ async def complete_booking(booking_id: str, current_user: dict = Depends(get_cur
     if current_user["role"] != "driver":
         raise HTTPException(status_code=403, detail="Not a driver")
     
-    booking = await db.bookings.find_one({"id": booking_id, "driver_id": current_user["id"]})
+    booking = await db.bookings.find_one({"id": booking_id, "driver_id": current_user["id"]}, {"_id": 0, "fare.total": 1})
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
     
-    now = datetime.now(timezone.utc).isoformat()
+    completed_at = datetime.now(timezone.utc)
+    now = completed_at.isoformat()
+    today = completed_at.date().isoformat()
     fare_total = booking["fare"]["total"]
-    
-    await db.bookings.update_one(
-        {"id": booking_id},
-        {"$set": {"status": "completed", "completed_at": now}}
-    )
-    
-    # Add points for completed trip
-    await db.drivers.update_one(
-        {"user_id": current_user["id"]},
-        {
-            "$set": {"is_available": True},
-            "$inc": {
-                "total_rides": 1,
-                "earnings_today": fare_total * 0.8,
-                "earnings_total": fare_total * 0.8,
-                "points": POINTS_PER_COMPLETED_TRIP  # +10 points per completed trip
-            }
-        }
+    earnings = fare_total * 0.8
+    
+    # Booking and driver writes are independent; the driver update returns the new points for the tier
+    _, driver = await asyncio.gather(
+        db.bookings.update_one(
+            {"id": booking_id},
+            {"$set": {"status": "completed", "completed_at": now}}
+        ),
+        # Add points for completed trip. earnings_today rolls over to this trip alone on the
+        # first completion of a new (UTC) day, so no midnight reset job is needed; drivers
+        # saved before earnings_date existed keep their legacy total until then
+        db.drivers.find_one_and_update(
+            {"user_id": current_user["id"]},
+            [{"$set": {
+                "is_available": True,
+                "total_rides": {"$add": [{"$ifNull": ["$total_rides", 0]}, 1]},
+                "earnings_today": {"$cond": [
+                    {"$eq": [{"$ifNull": ["$earnings_date", today]}, today]},
+                    {"$add": [{"$ifNull": ["$earnings_today", 0]}, earnings]},
+                    earnings
+                ]},
+                "earnings_date": today,
+                "earnings_total": {"$add": [{"$ifNull": ["$earnings_total", 0]}, earnings]},
+                "points": {"$add": [{"$ifNull": ["$points", 0]}, POINTS_PER_COMPLETED_TRIP]}  # +10 points per completed trip
+            }}],
+            projection={"_id": 0, "points": 1},
+            return_document=ReturnDocument.AFTER
+        )
     )
-    
-    # Get updated driver info for tier
-    driver = await db.drivers.find_one({"user_id": current_user["id"]}, {"_id": 0})
+    driver = driver or {}
     tier_info = get_driver_tier(driver.get("points", 0))
     
     return {
         "message": "Ride completed", 
-        "earnings": fare_total * 0.8,
+        "earnings": earnings,
         "points_earned": POINTS_PER_COMPLETED_TRIP,
         "total_points": driver.get("points", 0),
         "tier": tier_info["tier"]
@@ -1444,7 +1670,7 @@ async def driver_cancel_trip(booking_id: str, request: TripCancellationRequest,
         {"id": booking_id},
         {"$set": {
             "status": "cancelled_by_driver",
-            "cancelled_at": now.isoformat(),
+            "cancelled_at": now,
             "cancellation_reason": request.reason,
             "cancellation_notes": request.notes
         }}
@@ -1598,23 +1824,32 @@ async def get_driver_earnings(current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "driver":
         raise HTTPException(status_code=403, detail="Not a driver")
     
-    driver = await db.drivers.find_one({"user_id": current_user["id"]}, {"_id": 0})
-    
-    week_ago = (datetime.now(timezone.utc) - timedelta(days=7)).isoformat()
-    completed_rides = await db.bookings.find(
-        {"driver_id": current_user["id"], "status": "completed", "completed_at": {"$gte": week_ago}},
-        {"_id": 0}
-    ).to_list(100)
+    now = datetime.now(timezone.utc)
+    today = now.date().isoformat()
+    week_ago = (now - timedelta(days=7)).isoformat()
+    weekly_match = {"driver_id": current_user["id"], "status": "completed", "completed_at": {"$gte": week_ago}}
+    
+    # Weekly total is summed server-side; only the 10 most recent rides are fetched
+    driver, weekly_rows, recent_rides = await asyncio.gather(
+        db.drivers.find_one({"user_id": current_user["id"]}, {"_id": 0}),
+        aggregate_list(db.bookings, [
+            {"$match": weekly_match},
+            {"$group": {"_id": None, "fares": {"$sum": "$fare.total"}}}
+        ], 1),
+        db.bookings.find(weekly_match, {"_id": 0}).sort("completed_at", -1).limit(10).to_list(10)
+    )
     
-    weekly_earnings = sum(r["fare"]["total"] * 0.8 for r in completed_rides)
+    weekly_earnings = weekly_rows[0]["fares"] * 0.8 if weekly_rows else 0
     
     return {
-        "today": driver.get("earnings_today", 0),
+        # Only counts if the last completion was today (UTC), otherwise it is an earlier day's
+        # total; legacy drivers without earnings_date report the stored value as before
+        "today": driver.get("earnings_today", 0) if driver.get("earnings_date", today) == today else 0,
         "weekly": round(weekly_earnings, 2),
         "total": driver.get("earnings_total", 0),
         "total_rides": driver.get("total_rides", 0),
         "rating": driver.get("rating", 5.0),
-        "recent_rides": completed_rides[:10]
+        "recent_rides": recent_rides
     }
 
 # ============== ADMIN ROLE DEFINITIONS ==============
@@ -1653,9 +1888,12 @@ ADMIN_ROLES = {
     }
 }
 
+# Roles allowed through the admin dependencies
+ADMIN_ROLE_NAMES = frozenset({"admin", "super_admin"})
+
 def check_admin_permission(user: dict, required_permission: str) -> bool:
     """Check if admin has a specific permission."""
-    if user.get("role") not in ["admin", "super_admin"]:
+    if user.get("role") not in ADMIN_ROLE_NAMES:
         return False
     
     admin_role = user.get("admin_role", "admin")
@@ -1677,6 +1915,31 @@ def require_permission(permission: str):
         return current_user
     return check
 
+def require_roles(*roles: str, detail: str = "Insufficient role"):
+    """Dependency factory that rejects users whose role is not in roles."""
+    allowed = frozenset(roles)
+    async def check(current_user: dict = Depends(get_current_user)) -> dict:
+        if current_user.get("role") not in allowed:
+            raise HTTPException(status_code=403, detail=detail)
+        return current_user
+    return check
+
+require_admin = require_roles(*ADMIN_ROLE_NAMES, detail="Admin access required")
+# Plain "admin" role only (excludes super_admin), for handlers that have always checked exactly that
+require_admin_role = require_roles("admin", detail="Admin access required")
+
+async def require_driver(current_user: dict = Depends(get_current_user)) -> dict:
+    """Dependency that only lets drivers through."""
+    if current_user.get("role") != "driver":
+        raise HTTPException(status_code=403, detail="Driver access required")
+    return current_user
+
+async def require_super_admin(current_user: dict = Depends(get_current_user)) -> dict:
+    """Dependency that only lets super admins through."""
+    if current_user.get("admin_role") != "super_admin":
+        raise HTTPException(status_code=403, detail="Super Admin access required")
+    return current_user
+
 # ============== ADMIN MANAGEMENT ENDPOINTS ==============
 
 class AdminCreateRequest(BaseModel):
@@ -1748,9 +2011,9 @@ async def create_admin(
     
     # Create admin user
     admin_user = {
-        "id": str(uuid.uuid4()),
+        "id": uuid.uuid4().hex,
         "email": admin_data.email,
-        "password": pwd_context.hash(admin_data.password),
+        "password": await hash_password(admin_data.password),
         "name": f"{admin_data.first_name} {admin_data.last_name}",
         "first_name": admin_data.first_name,
         "last_name": admin_data.last_name,
@@ -1766,8 +2029,8 @@ async def create_admin(
     await db.users.insert_one(admin_user)
     
     # Log the action
-    await db.admin_logs.insert_one({
-        "id": str(uuid.uuid4()),
+    enqueue_audit("admin_logs", {
+        "id": uuid.uuid4().hex,
         "action": "admin_created",
         "admin_id": current_user["id"],
         "target_user_id": admin_user["id"],
@@ -1828,8 +2091,8 @@ async def update_admin(
         await db.users.update_one({"id": admin_id}, {"$set": update_data})
         
         # Log the action
-        await db.admin_logs.insert_one({
-            "id": str(uuid.uuid4()),
+        enqueue_audit("admin_logs", {
+            "id": uuid.uuid4().hex,
             "action": "admin_updated",
             "admin_id": current_user["id"],
             "target_user_id": admin_id,
@@ -1868,8 +2131,8 @@ async def delete_admin(
     )
     
     # Log the action
-    await db.admin_logs.insert_one({
-        "id": str(uuid.uuid4()),
+    enqueue_audit("admin_logs", {
+        "id": uuid.uuid4().hex,
         "action": "admin_deactivated",
         "admin_id": current_user["id"],
         "target_user_id": admin_id,
@@ -1948,6 +2211,59 @@ async def get_admin_activity_log(
 
 # ============== COMPREHENSIVE AUDIT LOGGING ==============
 
+# Audit writes (admin_logs, audit_logs, document_notifications) are fire-and-forget:
+# handlers enqueue them and a background worker drains the queue with insert_many.
+AUDIT_QUEUE_MAXSIZE = 10000
+AUDIT_BATCH_SIZE = 100
+audit_queue: asyncio.Queue = asyncio.Queue(maxsize=AUDIT_QUEUE_MAXSIZE)
+audit_worker_task: Optional[asyncio.Task] = None
+
+def enqueue_audit(collection: str, entry: dict):
+    """Queue an audit document for the background writer."""
+    try:
+        audit_queue.put_nowait((collection, entry))
+    except asyncio.QueueFull:
+        logger.warning(f"[AUDIT] Queue full, dropping {collection} entry {entry.get('id')}")
+
+async def write_audit_batch(batch: List[tuple]):
+    """Insert a batch of queued audit documents, one insert_many per collection."""
+    by_collection: Dict[str, List[dict]] = {}
+    for collection, entry in batch:
+        by_collection.setdefault(collection, []).append(entry)
+    
+    for collection, entries in by_collection.items():
+        try:
+            await db[collection].insert_many(entries, ordered=False)
+        except Exception as e:
+            logger.error(f"[AUDIT] Failed to write {len(entries)} {collection} entries: {e}")
+
+async def audit_worker():
+    """Drain the audit queue in batches of up to AUDIT_BATCH_SIZE."""
+    while True:
+        batch = [await audit_queue.get()]
+        while len(batch) < AUDIT_BATCH_SIZE and not audit_queue.empty():
+            batch.append(audit_queue.get_nowait())
+        try:
+            await write_audit_batch(batch)
+        finally:
+            for _ in batch:
+                audit_queue.task_done()
+
+async def flush_audit_queue(timeout: float = 5.0):
+    """Wait for the worker to drain the queue, then write anything left over."""
+    if audit_worker_task and not audit_worker_task.done():
+        try:
+            await asyncio.wait_for(audit_queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("[AUDIT] Timed out waiting for audit queue to drain")
+        audit_worker_task.cancel()
+    
+    batch = []
+    while not audit_queue.empty():
+        batch.append(audit_queue.get_nowait())
+    if batch:
+        await write_audit_batch(batch)
+
 async def create_audit_log(
     actor_id: str,
     actor_role: str,
@@ -1961,7 +2277,7 @@ async def create_audit_log(
 ):
     """Create a comprehensive audit log entry."""
     log_entry = {
-        "id": str(uuid.uuid4()),
+        "id": uuid.uuid4().hex,
         "actor_id": actor_id,
         "actor_role": actor_role,
         "action_type": action_type,
@@ -1977,7 +2293,7 @@ async def create_audit_log(
         log_entry["ip_address"] = request.client.host if request.client else None
         log_entry["user_agent"] = request.headers.get("user-agent")
     
-    await db.audit_logs.insert_one(log_entry)
+    enqueue_audit("audit_logs", dict(log_entry))
     return log_entry
 
 @api_router.get("/admin/audit-logs")
@@ -2032,7 +2348,7 @@ async def get_taxi_configs(
     # If no configs exist, create default
     if not configs:
         default_config = {
-            "id": str(uuid.uuid4()),
+            "id": uuid.uuid4().hex,
             "version": "1.0.0",
             "status": ConfigStatus.ACTIVE,
             **DEFAULT_QUEBEC_CONFIG,
@@ -2097,7 +2413,7 @@ async def create_taxi_config(
         new_version = "1.0.0"
     
     config = {
-        "id": str(uuid.uuid4()),
+        "id": uuid.uuid4().hex,
         "version": new_version,
         "status": ConfigStatus.DRAFT,
         **config_data.dict(),
@@ -2341,8 +2657,8 @@ async def create_dispute(
         raise HTTPException(status_code=404, detail="Trip not found")
     
     dispute = {
-        "id": str(uuid.uuid4()),
-        "dispute_number": f"DSP-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:4].upper()}",
+        "id": uuid.uuid4().hex,
+        "dispute_number": f"DSP-{day_stamp()}-{uuid.uuid4().hex[:4].upper()}",
         **dispute_data.dict(),
         "status": "open",
         "trip_snapshot": {
@@ -2447,7 +2763,7 @@ async def resolve_dispute(
     # Process refund if applicable
     if resolution.decision in ["partial_refund", "full_refund"] and resolution.refund_amount:
         await db.refunds.insert_one({
-            "id": str(uuid.uuid4()),
+            "id": uuid.uuid4().hex,
             "dispute_id": dispute_id,
             "trip_id": dispute.get("trip_id"),
             "amount": resolution.refund_amount,
@@ -2579,7 +2895,7 @@ async def create_trip_complaint(
         raise HTTPException(status_code=404, detail="Trip not found")
     
     complaint = {
-        "id": str(uuid.uuid4()),
+        "id": uuid.uuid4().hex,
         "trip_id": trip_id,
         "driver_id": trip.get("driver_id"),
         "customer_id": trip.get("customer_id") or reporter_id,
@@ -2636,7 +2952,7 @@ async def add_trip_note(
         raise HTTPException(status_code=404, detail="Trip not found")
     
     note_entry = {
-        "id": str(uuid.uuid4()),
+        "id": uuid.uuid4().hex,
         "note": note,
         "created_by": current_user["id"],
         "created_by_name": current_user.get("name", "Admin"),
@@ -2663,9 +2979,12 @@ async def get_admin_trip_details(
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
     
-    # Get driver info
-    driver = await db.drivers.find_one({"user_id": trip.get("driver_id")}, {"_id": 0})
-    driver_user = await db.users.find_one({"id": trip.get("driver_id")}, {"_id": 0, "password": 0})
+    # Get driver info and the GPS fix count (legacy sessions embed their snapshots)
+    driver, driver_user, snapshot_count = await asyncio.gather(
+        db.drivers.find_one({"user_id": trip.get("driver_id")}, {"_id": 0}),
+        db.users.find_one({"id": trip.get("driver_id")}, {"_id": 0, "password": 0}),
+        db.meter_snapshots.count_documents({"meter_id": trip_id})
+    )
     
     # Get config used
     config = None
@@ -2678,7 +2997,7 @@ async def get_admin_trip_details(
         "driver_user": driver_user,
         "config_used": config,
         "gps_summary": {
-            "total_snapshots": len(trip.get("fare_snapshots", [])),
+            "total_snapshots": snapshot_count + len(trip.get("fare_snapshots", [])),
             "start_location": trip.get("start_location"),
             "end_location": trip.get("end_location")
         }
@@ -2745,7 +3064,7 @@ async def apply_fare_adjustment(
     before_snapshot = {"final_fare": trip.get("final_fare")}
     
     adjustment = {
-        "id": str(uuid.uuid4()),
+        "id": uuid.uuid4().hex,
         "amount": adjustment_amount,
         "reason": reason,
         "applied_by": current_user["id"],
@@ -2782,16 +3101,31 @@ async def get_admin_stats(current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    total_users = await db.users.count_documents({"role": "user"})
-    total_drivers = await db.drivers.count_documents({})
-    online_drivers = await db.drivers.count_documents({"status": "online"})
-    pending_verifications = await db.drivers.count_documents({"verification_status": "pending"})
-    total_bookings = await db.bookings.count_documents({})
-    active_bookings = await db.bookings.count_documents({"status": {"$in": ["pending", "accepted", "in_progress"]}})
-    completed_bookings = await db.bookings.count_documents({"status": "completed"})
-    
-    completed = await db.bookings.find({"status": "completed"}, {"fare.total": 1}).to_list(1000)
-    total_revenue = sum(b["fare"]["total"] for b in completed)
+    # One $group per collection (bookings by status, with completed revenue summed
+    # server-side) plus the user count, all issued concurrently
+    booking_rows, driver_rows, total_users = await asyncio.gather(
+        aggregate_list(db.bookings, [
+            {"$group": {"_id": "$status", "count": {"$sum": 1}, "revenue": {"$sum": "$fare.total"}}}
+        ]),
+        aggregate_list(db.drivers, [
+            {"$group": {
+                "_id": None,
+                "total": {"$sum": 1},
+                "online": {"$sum": {"$cond": [{"$eq": ["$status", "online"]}, 1, 0]}},
+                "pending": {"$sum": {"$cond": [{"$eq": ["$verification_status", "pending"]}, 1, 0]}}
+            }}
+        ], 1),
+        db.users.count_documents({"role": "user"})
+    )
+    by_status = {row["_id"]: row for row in booking_rows}
+    drivers = driver_rows[0] if driver_rows else {"total": 0, "online": 0, "pending": 0}
+    total_drivers = drivers["total"]
+    online_drivers = drivers["online"]
+    pending_verifications = drivers["pending"]
+    total_bookings = sum(row["count"] for row in booking_rows)
+    active_bookings = sum(by_status.get(st, {}).get("count", 0) for st in ("pending", "accepted", "in_progress"))
+    completed_bookings = by_status.get("completed", {}).get("count", 0)
+    total_revenue = by_status.get("completed", {}).get("revenue", 0)
     platform_revenue = total_revenue * 0.2
     
     return {
@@ -2845,9 +3179,9 @@ async def admin_create_user(
         raise HTTPException(status_code=400, detail="Email already registered")
     
     new_user = {
-        "id": str(uuid.uuid4()),
+        "id": uuid.uuid4().hex,
         "email": user_data.email,
-        "password": pwd_context.hash(user_data.password),
+        "password": await hash_password(user_data.password),
         "name": f"{user_data.first_name} {user_data.last_name}",
         "first_name": user_data.first_name,
         "last_name": user_data.last_name,
@@ -3044,13 +3378,13 @@ async def admin_create_driver(
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    driver_id = str(uuid.uuid4())
+    driver_id = uuid.uuid4().hex
     
     # Create user account
     new_user = {
         "id": driver_id,
         "email": driver_data.email,
-        "password": pwd_context.hash(driver_data.password),
+        "password": await hash_password(driver_data.password),
         "name": f"{driver_data.first_name} {driver_data.last_name}",
         "first_name": driver_data.first_name,
         "last_name": driver_data.last_name,
@@ -3065,7 +3399,7 @@ async def admin_create_driver(
     
     # Create driver profile
     new_driver = {
-        "id": str(uuid.uuid4()),
+        "id": uuid.uuid4().hex,
         "user_id": driver_id,
         "name": f"{driver_data.first_name} {driver_data.last_name}",
         "first_name": driver_data.first_name,
@@ -3181,22 +3515,23 @@ async def admin_suspend_driver(
     if not driver:
         raise HTTPException(status_code=404, detail="Driver not found")
     
-    await db.drivers.update_one(
-        {"user_id": driver_id},
-        {"$set": {
-            "status": "suspended",
-            "is_active": False,
-            "is_available": False,
-            "suspension_reason": reason,
-            "suspended_by": current_user["id"],
-            "suspended_at": datetime.now(timezone.utc).isoformat()
-        }}
-    )
-    
-    # Also update user account
-    await db.users.update_one(
-        {"id": driver_id},
-        {"$set": {"is_active": False}}
+    # Driver and user account updates are independent; issue them together
+    await asyncio.gather(
+        db.drivers.update_one(
+            {"user_id": driver_id},
+            {"$set": {
+                "status": "suspended",
+                "is_active": False,
+                "is_available": False,
+                "suspension_reason": reason,
+                "suspended_by": current_user["id"],
+                "suspended_at": datetime.now(timezone.utc).isoformat()
+            }}
+        ),
+        db.users.update_one(
+            {"id": driver_id},
+            {"$set": {"is_active": False}}
+        )
     )
     
     # Audit log
@@ -3224,23 +3559,24 @@ async def admin_reactivate_driver(
     if not driver:
         raise HTTPException(status_code=404, detail="Driver not found")
     
-    await db.drivers.update_one(
-        {"user_id": driver_id},
-        {"$set": {
-            "status": "offline",
-            "is_active": True,
-            "reactivated_by": current_user["id"],
-            "reactivated_at": datetime.now(timezone.utc).isoformat()
-        },
-        "$unset": {
-            "suspension_reason": ""
-        }}
-    )
-    
-    # Also update user account
-    await db.users.update_one(
-        {"id": driver_id},
-        {"$set": {"is_active": True}}
+    # Driver and user account updates are independent; issue them together
+    await asyncio.gather(
+        db.drivers.update_one(
+            {"user_id": driver_id},
+            {"$set": {
+                "status": "offline",
+                "is_active": True,
+                "reactivated_by": current_user["id"],
+                "reactivated_at": datetime.now(timezone.utc).isoformat()
+            },
+            "$unset": {
+                "suspension_reason": ""
+            }}
+        ),
+        db.users.update_one(
+            {"id": driver_id},
+            {"$set": {"is_active": True}}
+        )
     )
     
     # Audit log
@@ -3293,11 +3629,28 @@ async def admin_approve_driver(
     
     return {"message": "Driver approved"}
 
+# Driver document field names, precomputed per allowed document type
+DOCUMENT_STATUS_FIELDS = {
+    doc_type: {"status": f"{doc_type}_status", "rejection_reason": f"{doc_type}_rejection_reason"}
+    for doc_type in ("drivers_license", "taxi_license", "profile_photo")
+}
+
+ALL_DOCUMENTS_APPROVED_EXPR = {"$and": [
+    {"$eq": [f"${fields['status']}", "approved"]} for fields in DOCUMENT_STATUS_FIELDS.values()
+]}
+
+DOCUMENT_APPROVAL_FIELDS = {
+    doc_type: {
+        "verified": f"{doc_type}_verified",
+        "verified_at": f"{doc_type}_verified_at",
+        "verified_by": f"{doc_type}_verified_by",
+        "notes": f"{doc_type}_verification_notes"
+    }
+    for doc_type in ("license", "taxi_license", "insurance", "vehicle_registration")
+}
+
 @api_router.get("/admin/drivers/pending-verification")
-async def get_pending_verifications(current_user: dict = Depends(get_current_user)):
-    if current_user["role"] != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
+async def get_pending_verifications(current_user: dict = Depends(require_admin)):
     drivers = await db.drivers.find(
         {"$or": [
             {"drivers_license_status": "pending"},
@@ -3310,42 +3663,36 @@ async def get_pending_verifications(current_user: dict = Depends(get_current_use
     return {"drivers": drivers}
 
 @api_router.post("/admin/verify-document")
-async def verify_document(verification: DocumentVerification, current_user: dict = Depends(get_current_user)):
-    if current_user["role"] != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
+async def verify_document(verification: DocumentVerification, current_user: dict = Depends(require_admin)):
+    fields = DOCUMENT_STATUS_FIELDS.get(verification.document_type)
+    if not fields:
+        raise HTTPException(status_code=400, detail="Invalid document type")
     
-    update_field = f"{verification.document_type}_status"
-    update_data = {update_field: verification.status}
+    update_data = {fields["status"]: verification.status}
     
     if verification.status == "rejected" and verification.rejection_reason:
-        update_data[f"{verification.document_type}_rejection_reason"] = verification.rejection_reason
-    
-    await db.drivers.update_one(
-        {"id": verification.driver_id},
-        {"$set": update_data}
-    )
+        update_data[fields["rejection_reason"]] = verification.rejection_reason
     
-    # Check if all documents are approved
-    driver = await db.drivers.find_one({"id": verification.driver_id})
-    if driver:
-        all_approved = (
-            driver.get("drivers_license_status") == "approved" and
-            driver.get("taxi_license_status") == "approved" and
-            driver.get("profile_photo_status") == "approved"
+    if verification.status != "approved":
+        # Only an approval can complete verification, so a plain $set is enough
+        await db.drivers.update_one({"id": verification.driver_id}, {"$set": update_data})
+    else:
+        # Single pipeline update: apply the status, then flip verification_status
+        # server-side once all three documents are approved
+        await db.drivers.update_one(
+            {"id": verification.driver_id},
+            [
+                {"$set": {k: {"$literal": v} for k, v in update_data.items()}},
+                {"$set": {"verification_status": {"$cond": [
+                    ALL_DOCUMENTS_APPROVED_EXPR, "approved", "$verification_status"
+                ]}}}
+            ]
         )
-        if all_approved:
-            await db.drivers.update_one(
-                {"id": verification.driver_id},
-                {"$set": {"verification_status": "approved"}}
-            )
     
     return {"message": f"Document {verification.status}"}
 
 @api_router.get("/admin/bookings")
-async def get_all_bookings(current_user: dict = Depends(get_current_user)):
-    if current_user["role"] != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
+async def get_all_bookings(current_user: dict = Depends(require_admin)):
     bookings = await db.bookings.find({}, {"_id": 0}).sort("created_at", -1).to_list(100)
     return {"bookings": bookings}
 
@@ -3388,54 +3735,51 @@ class PayoutCreate(BaseModel):
     method: str = "bank_transfer"  # bank_transfer, stripe, check
     notes: Optional[str] = None
 
+DEFAULT_PLATFORM_SETTINGS = {
+    "type": "global",
+    "commission_rate": 25.0,  # 25% default
+    "card_payment_commission": 25.0,
+    "cash_payment_commission": 25.0,
+    "app_payment_commission": 25.0,
+    "min_payout_amount": 50.0,
+    "payout_frequency": "weekly",
+    "auto_payout_enabled": False,
+    "stripe_enabled": False,
+    "stripe_merchant_id": None,
+    "tax_settings": {
+        "gst_rate": 5.0,
+        "qst_rate": 9.975,
+        "government_fee": 0.90
+    },
+    "meter_settings": {
+        "day_base_fare": 5.15,
+        "day_per_km": 2.05,
+        "night_base_fare": 5.75,
+        "night_per_km": 2.35
+    }
+}
+
 @api_router.get("/admin/settings")
-async def get_platform_settings(current_user: dict = Depends(get_current_user)):
+async def get_platform_settings(current_user: dict = Depends(require_admin)):
     """Get platform settings including commission rates."""
-    if current_user["role"] != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
     settings = await db.platform_settings.find_one({"type": "global"}, {"_id": 0})
     if not settings:
         # Create default settings
-        settings = {
-            "type": "global",
-            "commission_rate": 25.0,  # 25% default
-            "card_payment_commission": 25.0,
-            "cash_payment_commission": 25.0,
-            "app_payment_commission": 25.0,
-            "min_payout_amount": 50.0,
-            "payout_frequency": "weekly",
-            "auto_payout_enabled": False,
-            "stripe_enabled": False,
-            "stripe_merchant_id": None,
-            "tax_settings": {
-                "gst_rate": 5.0,
-                "qst_rate": 9.975,
-                "government_fee": 0.90
-            },
-            "meter_settings": {
-                "day_base_fare": 5.15,
-                "day_per_km": 2.05,
-                "night_base_fare": 5.75,
-                "night_per_km": 2.35
-            },
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }
+        settings = {**DEFAULT_PLATFORM_SETTINGS, "updated_at": utc_now_iso()}
         await db.platform_settings.insert_one(settings)
+        settings.pop("_id", None)
+        invalidate_cached("platform_settings")
     
     return settings
 
 @api_router.put("/admin/settings")
 async def update_platform_settings(
     updates: PlatformSettingsUpdate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_admin)
 ):
     """Update platform settings."""
-    if current_user["role"] != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
-    update_data = {k: v for k, v in updates.dict().items() if v is not None}
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_data = updates.model_dump(exclude_none=True, exclude_unset=True)
+    update_data["updated_at"] = utc_now_iso()
     update_data["updated_by"] = current_user["id"]
     
     await db.platform_settings.update_one(
@@ -3443,15 +3787,13 @@ async def update_platform_settings(
         {"$set": update_data},
         upsert=True
     )
+    invalidate_cached("platform_settings")
     
     return {"message": "Settings updated", "updated": update_data}
 
 @api_router.get("/admin/meter-settings")
-async def get_meter_settings(current_user: dict = Depends(get_current_user)):
+async def get_meter_settings(current_user: dict = Depends(require_admin)):
     """Get taxi meter rate settings."""
-    if current_user["role"] != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
     from taxi_meter import QUEBEC_TAXI_RATES
     
     # Get any custom overrides from DB
@@ -3464,11 +3806,8 @@ async def get_meter_settings(current_user: dict = Depends(get_current_user)):
     }
 
 @api_router.get("/admin/documents/pending")
-async def get_pending_documents(current_user: dict = Depends(get_current_user)):
+async def get_pending_documents(current_user: dict = Depends(require_admin)):
     """Get all pending driver documents for verification."""
-    if current_user["role"] != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
     # Get drivers with pending documents
     drivers = await db.drivers.find(
         {"$or": [
@@ -3493,34 +3832,35 @@ async def approve_document(
     document_type: str,  # license, taxi_license, insurance, vehicle_registration
     approved: bool,
     notes: Optional[str] = None,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_admin)
 ):
     """Approve or reject a driver document."""
-    if current_user["role"] != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
+    fields = DOCUMENT_APPROVAL_FIELDS.get(document_type)
+    if not fields:
+        raise HTTPException(status_code=400, detail="Invalid document type")
     
-    update_field = f"{document_type}_verified"
+    now_iso = utc_now_iso()
     
     await db.drivers.update_one(
         {"user_id": driver_id},
         {"$set": {
-            update_field: approved,
-            f"{document_type}_verified_at": datetime.now(timezone.utc).isoformat(),
-            f"{document_type}_verified_by": current_user["id"],
-            f"{document_type}_verification_notes": notes
+            fields["verified"]: approved,
+            fields["verified_at"]: now_iso,
+            fields["verified_by"]: current_user["id"],
+            fields["notes"]: notes
         }}
     )
     
     # Log the action
-    await db.admin_logs.insert_one({
-        "id": str(uuid.uuid4()),
+    enqueue_audit("admin_logs", {
+        "id": uuid.uuid4().hex,
         "action": "document_verification",
         "admin_id": current_user["id"],
         "driver_id": driver_id,
         "document_type": document_type,
         "approved": approved,
         "notes": notes,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": now_iso
     })
     
     return {"message": f"Document {document_type} {'approved' if approved else 'rejected'}"}
@@ -3549,12 +3889,9 @@ class PlatformDocumentUpdate(BaseModel):
 async def get_platform_documents(
     doc_type: Optional[str] = None,
     target_audience: Optional[str] = None,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_admin)
 ):
     """Get all platform documents (terms, policies, letters, etc.)."""
-    if current_user["role"] != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
     query = {}
     if doc_type:
         query["doc_type"] = doc_type
@@ -3567,19 +3904,17 @@ async def get_platform_documents(
 @api_router.post("/admin/platform-documents")
 async def create_platform_document(
     doc: PlatformDocument,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_super_admin)
 ):
     """Create a new platform document."""
-    if current_user.get("admin_role") != "super_admin":
-        raise HTTPException(status_code=403, detail="Only super admin can create documents")
-    
+    now_iso = utc_now_iso()
     document = {
-        "id": str(uuid.uuid4()),
-        **doc.dict(),
+        "id": uuid.uuid4().hex,
+        **doc.model_dump(),
         "version": 1,
         "created_by": current_user["id"],
-        "created_at": datetime.now(timezone.utc).isoformat(),
-        "updated_at": datetime.now(timezone.utc).isoformat()
+        "created_at": now_iso,
+        "updated_at": now_iso
     }
     
     await db.platform_documents.insert_one(document)
@@ -3600,19 +3935,16 @@ async def create_platform_document(
 async def update_platform_document(
     doc_id: str,
     updates: PlatformDocumentUpdate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_super_admin)
 ):
     """Update a platform document."""
-    if current_user.get("admin_role") != "super_admin":
-        raise HTTPException(status_code=403, detail="Only super admin can update documents")
-    
     doc = await db.platform_documents.find_one({"id": doc_id})
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    update_data = {k: v for k, v in updates.dict().items() if v is not None}
+    update_data = updates.model_dump(exclude_none=True, exclude_unset=True)
     update_data["version"] = doc.get("version", 1) + 1
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_data["updated_at"] = utc_now_iso()
     update_data["updated_by"] = current_user["id"]
     
     await db.platform_documents.update_one({"id": doc_id}, {"$set": update_data})
@@ -3631,12 +3963,9 @@ async def update_platform_document(
 @api_router.delete("/admin/platform-documents/{doc_id}")
 async def delete_platform_document(
     doc_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_super_admin)
 ):
     """Delete a platform document."""
-    if current_user.get("admin_role") != "super_admin":
-        raise HTTPException(status_code=403, detail="Only super admin can delete documents")
-    
     result = await db.platform_documents.delete_one({"id": doc_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Document not found")
@@ -3647,29 +3976,28 @@ async def delete_platform_document(
 async def send_document_notification(
     doc_id: str,
     notification_type: str,  # email, push, popup
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_admin)
 ):
     """Send notification about a document to target audience."""
-    if current_user["role"] != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
     doc = await db.platform_documents.find_one({"id": doc_id}, {"_id": 0})
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
     
+    now_iso = utc_now_iso()
+    
     # Create notification record
     notification = {
-        "id": str(uuid.uuid4()),
+        "id": uuid.uuid4().hex,
         "document_id": doc_id,
         "document_title": doc["title"],
         "notification_type": notification_type,
         "target_audience": doc["target_audience"],
         "sent_by": current_user["id"],
-        "sent_at": datetime.now(timezone.utc).isoformat(),
+        "sent_at": now_iso,
         "status": "sent"
     }
     
-    await db.document_notifications.insert_one(notification)
+    enqueue_audit("document_notifications", dict(notification))
     
     # If popup enabled for drivers, update driver popup settings
     if notification_type == "popup" and doc["target_audience"] in ["drivers", "all"]:
@@ -3679,7 +4007,7 @@ async def send_document_notification(
                 "active_popup_doc_id": doc_id,
                 "popup_title": doc.get("popup_title", doc["title"]),
                 "popup_content": doc["content"][:500],  # First 500 chars
-                "updated_at": datetime.now(timezone.utc).isoformat()
+                "updated_at": now_iso
             }},
             upsert=True
         )
@@ -3703,26 +4031,44 @@ async def get_public_documents(
 
 @api_router.get("/driver/popup")
 async def get_driver_popup(
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_driver)
 ):
     """Get active popup for driver."""
-    if current_user.get("role") != "driver":
-        raise HTTPException(status_code=403, detail="Driver access required")
-    
-    popup_setting = await db.platform_settings.find_one({"setting_type": "driver_popup"}, {"_id": 0})
-    if not popup_setting or not popup_setting.get("active_popup_doc_id"):
+    # Resolve popup setting, document and acknowledgement in one round trip
+    pipeline = [
+        {"$match": {"setting_type": "driver_popup", "active_popup_doc_id": {"$nin": [None, ""]}}},
+        {"$limit": 1},
+        {"$lookup": {
+            "from": "platform_documents",
+            "localField": "active_popup_doc_id",
+            "foreignField": "id",
+            "as": "doc"
+        }},
+        {"$lookup": {
+            "from": "driver_popup_status",
+            "let": {"doc_id": "$active_popup_doc_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$and": [
+                    {"$eq": ["$driver_id", current_user["id"]]},
+                    {"$eq": ["$popup_doc_id", "$$doc_id"]}
+                ]}}},
+                {"$project": {"_id": 0, "acknowledged": 1}}
+            ],
+            "as": "status"
+        }},
+        {"$project": {"_id": 0, "popup_title": 1, "doc": {"$arrayElemAt": ["$doc", 0]}, "status": {"$arrayElemAt": ["$status", 0]}}}
+    ]
+    result = await aggregate_list(db.platform_settings, pipeline, 1)
+    if not result:
         return {"has_popup": False}
     
-    # Check if driver has already seen this popup
-    driver_popup_status = await db.driver_popup_status.find_one({
-        "driver_id": current_user["id"],
-        "popup_doc_id": popup_setting["active_popup_doc_id"]
-    })
+    popup_setting = result[0]
     
-    if driver_popup_status and driver_popup_status.get("acknowledged"):
+    # Check if driver has already seen this popup
+    if (popup_setting.get("status") or {}).get("acknowledged"):
         return {"has_popup": False}
     
-    doc = await db.platform_documents.find_one({"id": popup_setting["active_popup_doc_id"]}, {"_id": 0})
+    doc = popup_setting.get("doc")
     if not doc:
         return {"has_popup": False}
     
@@ -3740,12 +4086,9 @@ async def get_driver_popup(
 async def acknowledge_driver_popup(
     doc_id: str,
     accepted: bool = True,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_driver)
 ):
     """Acknowledge/accept a driver popup."""
-    if current_user.get("role") != "driver":
-        raise HTTPException(status_code=403, detail="Driver access required")
-    
     await db.driver_popup_status.update_one(
         {"driver_id": current_user["id"], "popup_doc_id": doc_id},
         {"$set": {
@@ -3753,7 +4096,7 @@ async def acknowledge_driver_popup(
             "popup_doc_id": doc_id,
             "acknowledged": True,
             "accepted": accepted,
-            "acknowledged_at": datetime.now(timezone.utc).isoformat()
+            "acknowledged_at": utc_now_iso()
         }},
         upsert=True
     )
@@ -3765,12 +4108,9 @@ async def acknowledge_driver_popup(
 @api_router.get("/admin/cases")
 async def get_cases(
     status: Optional[str] = None,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_admin)
 ):
     """Get all support cases/disputes."""
-    if current_user["role"] != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
     query = {}
     if status:
         query["status"] = status
@@ -3781,20 +4121,18 @@ async def get_cases(
 @api_router.post("/admin/cases")
 async def create_case(
     case_data: CaseCreate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_admin)
 ):
     """Create a new support case."""
-    if current_user["role"] != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
+    now_iso = utc_now_iso()
     case = {
-        "id": str(uuid.uuid4()),
-        "case_number": f"CASE-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:4].upper()}",
-        **case_data.dict(),
+        "id": uuid.uuid4().hex,
+        "case_number": f"CASE-{day_stamp()}-{uuid.uuid4().hex[:4].upper()}",
+        **case_data.model_dump(),
         "status": "open",
         "created_by": current_user["id"],
-        "created_at": datetime.now(timezone.utc).isoformat(),
-        "updated_at": datetime.now(timezone.utc).isoformat(),
+        "created_at": now_iso,
+        "updated_at": now_iso,
         "history": []
     }
     
@@ -3806,20 +4144,18 @@ async def create_case(
 async def update_case(
     case_id: str,
     updates: CaseUpdate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_admin)
 ):
     """Update a case status."""
-    if current_user["role"] != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
-    update_data = {k: v for k, v in updates.dict().items() if v is not None}
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    now_iso = utc_now_iso()
+    update_data = updates.model_dump(exclude_none=True, exclude_unset=True)
+    update_data["updated_at"] = now_iso
     
     # Add to history
     history_entry = {
         "action": "status_update" if "status" in update_data else "note_added",
         "by": current_user["id"],
-        "at": datetime.now(timezone.utc).isoformat(),
+        "at": now_iso,
         "changes": update_data
     }
     
@@ -3838,12 +4174,9 @@ async def update_case(
 @api_router.get("/admin/payouts")
 async def get_payouts(
     status: Optional[str] = None,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_admin)
 ):
     """Get all payouts."""
-    if current_user["role"] != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
     query = {}
     if status:
         query["status"] = status
@@ -3851,13 +4184,15 @@ async def get_payouts(
     payouts = await db.payouts.find(query, {"_id": 0}).sort("created_at", -1).to_list(100)
     return {"payouts": payouts}
 
+PENDING_PAYOUT_KEYS = (
+    "driver_id", "driver", "user", "total_fares", "commission_rate",
+    "driver_share", "total_paid", "balance_due", "trip_count"
+)
+
 @api_router.get("/admin/payouts/pending")
-async def get_pending_payouts(current_user: dict = Depends(get_current_user)):
+async def get_pending_payouts(current_user: dict = Depends(require_admin)):
     """Get drivers with pending payouts."""
-    if current_user["role"] != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
-    settings = await db.platform_settings.find_one({"type": "global"}, {"_id": 0})
+    settings = await load_platform_settings()
     min_payout = settings.get("min_payout_amount", 50) if settings else 50
     commission_rate = settings.get("commission_rate", 25) if settings else 25
     
@@ -3871,57 +4206,48 @@ async def get_pending_payouts(current_user: dict = Depends(get_current_user)):
         }}
     ]
     
-    earnings = await db.meter_sessions.aggregate(pipeline).to_list(100)
+    earnings = await aggregate_list(db.meter_sessions, pipeline, 100)
     
     pending_payouts = []
     for e in earnings:
         if e["_id"]:
-            driver = await db.drivers.find_one({"user_id": e["_id"]}, {"_id": 0})
-            user = await db.users.find_one({"id": e["_id"]}, {"_id": 0, "password": 0})
+            # Driver, user and paid-out lookups are independent; run them concurrently
+            driver, user, paid_out = await asyncio.gather(
+                db.drivers.find_one({"user_id": e["_id"]}, {"_id": 0}),
+                db.users.find_one({"id": e["_id"]}, {"_id": 0, "password": 0}),
+                aggregate_list(db.payouts, [
+                    {"$match": {"driver_id": e["_id"], "status": "completed"}},
+                    {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
+                ], 1)
+            )
             
             # Calculate driver's share (after commission)
             driver_share = e["total_fares"] * (1 - commission_rate / 100)
             
-            # Check existing paid out amount
-            paid_out = await db.payouts.aggregate([
-                {"$match": {"driver_id": e["_id"], "status": "completed"}},
-                {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
-            ]).to_list(1)
-            
             total_paid = paid_out[0]["total"] if paid_out else 0
             balance = driver_share - total_paid
             
             if balance >= min_payout:
-                pending_payouts.append({
-                    "driver_id": e["_id"],
-                    "driver": driver,
-                    "user": user,
-                    "total_fares": e["total_fares"],
-                    "commission_rate": commission_rate,
-                    "driver_share": driver_share,
-                    "total_paid": total_paid,
-                    "balance_due": balance,
-                    "trip_count": e["trip_count"]
-                })
+                pending_payouts.append(dict(zip(PENDING_PAYOUT_KEYS, (
+                    e["_id"], driver, user, e["total_fares"], commission_rate,
+                    driver_share, total_paid, balance, e["trip_count"]
+                ))))
     
     return {"pending_payouts": pending_payouts, "min_payout_amount": min_payout}
 
 @api_router.post("/admin/payouts")
 async def create_payout(
     payout_data: PayoutCreate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_admin)
 ):
     """Create a new payout for a driver."""
-    if current_user["role"] != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
     payout = {
-        "id": str(uuid.uuid4()),
-        "reference": f"PAY-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:6].upper()}",
-        **payout_data.dict(),
+        "id": uuid.uuid4().hex,
+        "reference": f"PAY-{day_stamp()}-{uuid.uuid4().hex[:6].upper()}",
+        **payout_data.model_dump(),
         "status": "pending",
         "created_by": current_user["id"],
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utc_now_iso()
     }
     
     await db.payouts.insert_one(payout)
@@ -3933,19 +4259,16 @@ async def process_payout(
     payout_id: str,
     status: str,  # completed, failed
     transaction_id: Optional[str] = None,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_admin)
 ):
     """Process a payout."""
-    if current_user["role"] != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
     await db.payouts.update_one(
         {"id": payout_id},
         {"$set": {
             "status": status,
             "transaction_id": transaction_id,
             "processed_by": current_user["id"],
-            "processed_at": datetime.now(timezone.utc).isoformat()
+            "processed_at": utc_now_iso()
         }}
     )
     
@@ -3962,33 +4285,38 @@ class MerchantSettingsUpdate(BaseModel):
     auto_payout_enabled: Optional[bool] = None
     min_payout_amount: Optional[float] = None
 
+def trip_end_epoch(trip: dict) -> float:
+    """Trip end time as a UNIX epoch, parsing the ISO string for legacy trips (NaN if missing)."""
+    end_epoch = trip.get("end_time_epoch")
+    if end_epoch is not None:
+        return end_epoch
+    if not trip.get("end_time"):
+        return math.nan
+    return as_utc_datetime(trip["end_time"]).timestamp()
+
 @api_router.get("/admin/merchants/overview")
-async def get_merchant_overview(current_user: dict = Depends(get_current_user)):
+async def get_merchant_overview(current_user: dict = Depends(require_admin)):
     """Get platform earnings overview for merchants section."""
-    if current_user.get("role") not in ["admin", "super_admin"]:
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
     # Get completed trips for earnings calculation
     completed_trips = await db.meter_trips.find(
         {"status": "completed"},
-        {"_id": 0, "final_fare": 1, "end_time": 1, "driver_id": 1}
+        {"_id": 0, "final_fare.total_final": 1, "final_fare.gst": 1, "final_fare.qst": 1,
+         "end_time": 1, "end_time_epoch": 1, "driver_id": 1}
     ).to_list(10000)
     
-    # Calculate totals
-    total_collected = 0.0
-    total_commission = 0.0
-    total_taxes = 0.0
-    
     # Get current commission rate
-    commission_config = await db.commission_configs.find_one({"is_active": True}, {"_id": 0})
-    commission_rate = commission_config.get("rate", 15) / 100 if commission_config else 0.15
+    commission_rate = await get_commission_rate()
     
-    for trip in completed_trips:
-        fare = trip.get("final_fare", {})
-        trip_total = fare.get("total_final", 0)
-        total_collected += trip_total
-        total_commission += trip_total * commission_rate
-        total_taxes += fare.get("gst", 0) + fare.get("qst", 0)
+    # Calculate totals with vectorised sums over the trip fares
+    trip_count = len(completed_trips)
+    fares = [trip.get("final_fare") or {} for trip in completed_trips]
+    trip_totals = np.fromiter((f.get("total_final", 0) for f in fares), dtype=np.float64, count=trip_count)
+    trip_taxes = np.fromiter((f.get("gst", 0) + f.get("qst", 0) for f in fares), dtype=np.float64, count=trip_count)
+    end_epochs = np.fromiter((trip_end_epoch(t) for t in completed_trips), dtype=np.float64, count=trip_count)
+    
+    total_collected = float(trip_totals.sum())
+    total_commission = total_collected * commission_rate
+    total_taxes = float(trip_taxes.sum())
     
     # Get pending payouts to drivers
     pending_to_drivers = 0.0
@@ -4007,13 +4335,13 @@ async def get_merchant_overview(current_user: dict = Depends(get_current_user)):
     available_balance = total_commission - total_withdrawn
     
     # Get merchant settings
-    settings = await db.merchant_settings.find_one({"type": "platform"}, {"_id": 0})
+    settings = await load_merchant_settings()
     
     # Calculate this month's earnings
     now = datetime.now(timezone.utc)
     month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    this_month_trips = [t for t in completed_trips if t.get("end_time") and datetime.fromisoformat(t["end_time"].replace("Z", "+00:00")) >= month_start]
-    this_month_collected = sum(t.get("final_fare", {}).get("total_final", 0) for t in this_month_trips)
+    # NaN epochs (trips without an end time) never compare >= and drop out of the mask
+    this_month_collected = float(trip_totals[end_epochs >= month_start.timestamp()].sum())
     this_month_commission = this_month_collected * commission_rate
     
     return {
@@ -4033,61 +4361,98 @@ async def get_merchant_overview(current_user: dict = Depends(get_current_user)):
         "bank_connected": settings.get("bank_account_number") is not None if settings else False
     }
 
-@api_router.get("/admin/merchants/transactions")
-async def get_merchant_transactions(
-    page: int = 1,
-    limit: int = 50,
-    transaction_type: Optional[str] = None,
-    current_user: dict = Depends(get_current_user)
+transaction_count_cache = TTLCache(maxsize=64, ttl=30)
+
+COMMISSION_TRIP_PROJECTION = {"_id": 0, "id": 1, "driver_id": 1, "end_time": 1, "final_fare.total_final": 1}
+
+def build_commission_transaction(trip: dict, commission_rate: float) -> dict:
+    """Build a commission transaction record from a completed trip."""
+    trip_total = trip.get("final_fare", {}).get("total_final", 0)
+    return {
+        "id": f"txn_{trip.get('id', uuid.uuid4().hex[:8])}",
+        "type": "commission",
+        "amount": round(trip_total * commission_rate, 2),
+        "trip_id": trip.get("id"),
+        "driver_id": trip.get("driver_id"),
+        "description": f"Commission from trip {trip.get('id', 'N/A')[:8]}...",
+        "fare_total": round(trip_total, 2),
+        "created_at": trip.get("end_time") or utc_now_iso(),
+        "status": "completed"
+    }
+
+@api_router.get("/admin/merchants/transactions")
+async def get_merchant_transactions(
+    page: int = 1,
+    limit: int = 50,
+    transaction_type: Optional[str] = None,
+    after: Optional[str] = None,
+    after_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(require_admin)
 ):
     """Get platform transaction history."""
-    if current_user.get("role") not in ["admin", "super_admin"]:
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
     # Build query
     query = {}
     if transaction_type:
         query["type"] = transaction_type
     
-    skip = (page - 1) * limit
+    # Keyset pagination: pass the previous page's next_cursor as after/after_id.
+    # Page numbers are still accepted for small offsets.
+    page_query = dict(query)
+    if after:
+        if after_id:
+            page_query["$or"] = [
+                {"created_at": {"$lt": after}},
+                {"created_at": after, "id": {"$lt": after_id}}
+            ]
+        else:
+            page_query["created_at"] = {"$lt": after}
+        skip = 0
+    else:
+        skip = (page - 1) * limit
     
-    # Get platform transactions
+    # Get platform transactions (the planner picks the (type,) created_at, id index)
     transactions = await db.platform_transactions.find(
-        query, {"_id": 0}
-    ).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+        page_query, {"_id": 0}
+    ).sort([("created_at", -1), ("id", -1)]).skip(skip).limit(limit).to_list(limit)
     
-    total = await db.platform_transactions.count_documents(query)
+    next_cursor = None
+    if len(transactions) == limit:
+        last = transactions[-1]
+        next_cursor = {"after": last.get("created_at"), "after_id": last.get("id")}
+    
+    # Unfiltered totals come from collection metadata; filtered totals are cached briefly
+    if not transaction_type:
+        total = await db.platform_transactions.estimated_document_count()
+    else:
+        total = transaction_count_cache.get(transaction_type)
+        if total is None:
+            total = await db.platform_transactions.count_documents(query)
+            transaction_count_cache.set(transaction_type, total)
     
     # If no transactions exist, generate from completed trips
-    if not transactions:
+    if not transactions and not after:
         # Get commission rate
-        commission_config = await db.commission_configs.find_one({"is_active": True}, {"_id": 0})
-        commission_rate = commission_config.get("rate", 15) / 100 if commission_config else 0.15
+        commission_rate = await get_commission_rate()
         
-        # Generate transactions from trips
+        # Generate transactions from trips, seeking past the trip cursor when given
+        trip_query = {"status": "completed"}
+        trip_skip = skip
+        if cursor:
+            trip_query = {"$and": [trip_query, trip_cursor_filter(cursor)]}
+            trip_skip = 0
         trips = await db.meter_trips.find(
-            {"status": "completed"},
-            {"_id": 0}
-        ).sort("end_time", -1).skip(skip).limit(limit).to_list(limit)
+            trip_query,
+            COMMISSION_TRIP_PROJECTION
+        ).sort([("end_time", -1), ("id", -1)]).skip(trip_skip).limit(limit).to_list(limit)
         
-        for trip in trips:
-            fare = trip.get("final_fare", {})
-            trip_total = fare.get("total_final", 0)
-            commission = trip_total * commission_rate
-            
-            transactions.append({
-                "id": f"txn_{trip.get('id', str(uuid.uuid4())[:8])}",
-                "type": "commission",
-                "amount": round(commission, 2),
-                "trip_id": trip.get("id"),
-                "driver_id": trip.get("driver_id"),
-                "description": f"Commission from trip {trip.get('id', 'N/A')[:8]}...",
-                "fare_total": round(trip_total, 2),
-                "created_at": trip.get("end_time", datetime.now(timezone.utc).isoformat()),
-                "status": "completed"
-            })
+        transactions = [build_commission_transaction(trip, commission_rate) for trip in trips]
+        next_cursor = {"cursor": encode_trip_cursor(trips[-1])} if len(trips) == limit else None
         
-        total = await db.meter_trips.count_documents({"status": "completed"})
+        total = transaction_count_cache.get("completed_trips")
+        if total is None:
+            total = await db.meter_trips.count_documents({"status": "completed"})
+            transaction_count_cache.set("completed_trips", total)
     
     return {
         "transactions": transactions,
@@ -4095,21 +4460,19 @@ async def get_merchant_transactions(
             "page": page,
             "limit": limit,
             "total": total,
-            "pages": (total + limit - 1) // limit
+            "pages": (total + limit - 1) // limit,
+            "next_cursor": next_cursor
         }
     }
 
 @api_router.get("/admin/merchants/settings")
-async def get_merchant_settings(current_user: dict = Depends(get_current_user)):
+async def get_merchant_settings(current_user: dict = Depends(require_admin)):
     """Get merchant/platform payout settings."""
-    if current_user.get("role") not in ["admin", "super_admin"]:
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
-    settings = await db.merchant_settings.find_one({"type": "platform"}, {"_id": 0})
+    settings = await load_merchant_settings()
     
     if not settings:
         settings = {
-            "id": str(uuid.uuid4()),
+            "id": uuid.uuid4().hex,
             "type": "platform",
             "bank_account_name": None,
             "bank_account_number": None,
@@ -4120,24 +4483,21 @@ async def get_merchant_settings(current_user: dict = Depends(get_current_user)):
             "min_payout_amount": 100.0,
             "stripe_connected": False,
             "stripe_account_id": None,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": utc_now_iso()
         }
-        await db.merchant_settings.insert_one(settings)
-        settings.pop("_id", None)
+        await db.merchant_settings.insert_one({"_id": settings["id"], **settings})
+        invalidate_cached("merchant_settings")
     
     return {"settings": settings}
 
 @api_router.put("/admin/merchants/settings")
 async def update_merchant_settings(
     updates: MerchantSettingsUpdate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_super_admin)
 ):
     """Update merchant/platform payout settings."""
-    if current_user.get("admin_role") != "super_admin":
-        raise HTTPException(status_code=403, detail="Super Admin access required")
-    
-    update_data = {k: v for k, v in updates.dict().items() if v is not None}
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_data = updates.model_dump(exclude_none=True, exclude_unset=True)
+    update_data["updated_at"] = utc_now_iso()
     update_data["updated_by"] = current_user["id"]
     
     result = await db.merchant_settings.update_one(
@@ -4145,6 +4505,7 @@ async def update_merchant_settings(
         {"$set": update_data},
         upsert=True
     )
+    invalidate_cached("merchant_settings")
     
     # Audit log
     await create_audit_log(
@@ -4158,19 +4519,220 @@ async def update_merchant_settings(
     
     return {"message": "Merchant settings updated"}
 
+balance_cache = TTLCache(maxsize=4, ttl=5)
+
+# platform_totals holds running sums of completed trip fares and completed withdrawals so
+# balance reads are a single-document find. One worker at a time holds a lease on that
+# document and tails meter_trips and platform_withdrawals with one change stream. Pre- and
+# post-images (enabled in ensure_indexes) give each event the document before and after the
+# change, so completions, reversals and deletes each $inc their exact difference. The $inc
+# and the event's resume token are written together, conditional on the previous token, so
+# no event is applied twice even if the lease changes hands. While no worker holds a live
+# lease, balances fall back to aggregation.
+PLATFORM_TOTALS_ID = "platform"
+PLATFORM_TOTALS_LEASE = 30  # seconds
+PLATFORM_TOTALS_MAX_BACKOFF = 60  # seconds
+PLATFORM_TOTALS_OWNER = uuid.uuid4().hex
+PLATFORM_TOTALS_FIELDS = {"meter_trips": "trips", "platform_withdrawals": "withdrawals"}
+PLATFORM_TOTALS_CHANGES = [
+    {"$match": {
+        "ns.coll": {"$in": list(PLATFORM_TOTALS_FIELDS)},
+        "operationType": {"$in": ["insert", "update", "replace", "delete"]}
+    }},
+    {"$project": {
+        "operationType": 1, "ns.coll": 1, "clusterTime": 1,
+        "fullDocument.status": 1, "fullDocument.final_fare.total_final": 1, "fullDocument.amount": 1,
+        "fullDocumentBeforeChange.status": 1, "fullDocumentBeforeChange.final_fare.total_final": 1,
+        "fullDocumentBeforeChange.amount": 1
+    }}
+]
+platform_totals_pre_images = False  # set by ensure_indexes
+platform_totals_task: Optional[asyncio.Task] = None
+
+class PlatformTotalsLeaseLost(Exception):
+    """Another worker took over the platform_totals lease."""
+
+class PlatformTotalsResync(Exception):
+    """The stream can't be applied exactly; totals must be rebuilt."""
+
+async def aggregate_platform_totals(session=None) -> Dict[str, float]:
+    """Completed trip fare and withdrawal sums from one $unionWith aggregation."""
+    pipeline = [
+        {"$match": {"status": "completed"}},
+        {"$group": {"_id": "trips", "total": {"$sum": "$final_fare.total_final"}}},
+        {"$unionWith": {
+            "coll": "platform_withdrawals",
+            "pipeline": [
+                {"$match": {"status": "completed"}},
+                {"$group": {"_id": "withdrawals", "total": {"$sum": "$amount"}}}
+            ]
+        }}
+    ]
+    cursor = await db.meter_trips.aggregate(pipeline, session=session)
+    totals = {row["_id"]: row["total"] for row in await cursor.to_list(2)}
+    return {"trips": totals.get("trips", 0), "withdrawals": totals.get("withdrawals", 0)}
+
+def counted_amount(collection: str, doc: Optional[dict]) -> float:
+    """What a trip or withdrawal contributes to the platform totals in the given state."""
+    if not doc or doc.get("status") != "completed":
+        return 0
+    if collection == "meter_trips":
+        return (doc.get("final_fare") or {}).get("total_final", 0)
+    return doc.get("amount", 0)
+
+async def acquire_platform_totals_lease() -> bool:
+    """Take or extend the lease on the totals document; False while another worker holds it."""
+    now = datetime.now(timezone.utc)
+    try:
+        await db.platform_totals.update_one(
+            {"_id": PLATFORM_TOTALS_ID, "$or": [
+                {"owner": PLATFORM_TOTALS_OWNER},
+                {"lease_expires_at": {"$not": {"$gt": now}}}
+            ]},
+            {"$set": {
+                "owner": PLATFORM_TOTALS_OWNER,
+                "lease_expires_at": now + timedelta(seconds=PLATFORM_TOTALS_LEASE)
+            }},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+async def rebuild_platform_totals():
+    """Recompute the totals from a snapshot read; returns the cluster time it reflects."""
+    async with client.start_session(snapshot=True) as session:
+        totals = await aggregate_platform_totals(session)
+        # Snapshot reads run at one cluster time, reported back as the operation time
+        as_of = session.operation_time
+    result = await db.platform_totals.update_one(
+        {"_id": PLATFORM_TOTALS_ID, "owner": PLATFORM_TOTALS_OWNER},
+        {"$set": {**totals, "resume_token": None, "as_of": as_of}}
+    )
+    if result.matched_count == 0:
+        raise PlatformTotalsLeaseLost()
+    return as_of
+
+async def apply_platform_totals_change(change: dict, token: Optional[dict], as_of) -> Optional[dict]:
+    """$inc the event's delta and advance the stored resume token; returns the new token."""
+    if as_of is not None and change["clusterTime"] <= as_of:
+        return token  # already part of the rebuilt totals
+    operation = change["operationType"]
+    collection = change["ns"]["coll"]
+    before = change.get("fullDocumentBeforeChange")
+    after = change.get("fullDocument")
+    if (operation != "insert" and before is None) or (operation != "delete" and after is None):
+        raise PlatformTotalsResync(f"{operation} on {collection} without pre/post image")
+    delta = counted_amount(collection, after) - counted_amount(collection, before)
+    if not delta:
+        return token
+    result = await db.platform_totals.update_one(
+        {"_id": PLATFORM_TOTALS_ID, "owner": PLATFORM_TOTALS_OWNER, "resume_token": token},
+        {"$inc": {PLATFORM_TOTALS_FIELDS[collection]: delta}, "$set": {"resume_token": change["_id"]}}
+    )
+    if result.matched_count == 0:
+        raise PlatformTotalsLeaseLost()
+    return change["_id"]
+
+async def consume_platform_totals():
+    """Apply change events while this worker holds the lease, resuming where the last holder stopped."""
+    doc = await db.platform_totals.find_one({"_id": PLATFORM_TOTALS_ID}, {"resume_token": 1, "as_of": 1}) or {}
+    token, as_of = doc.get("resume_token"), doc.get("as_of")
+    watch_options = {
+        "full_document": "whenAvailable",
+        "full_document_before_change": "whenAvailable",
+        "max_await_time_ms": PLATFORM_TOTALS_LEASE * 1000 // 3
+    }
+    stream = None
+    if token or as_of:
+        try:
+            position = {"start_after": token} if token else {"start_at_operation_time": as_of}
+            stream = await db.watch(PLATFORM_TOTALS_CHANGES, **position, **watch_options)
+        except OperationFailure as e:
+            logger.warning(f"[BALANCE] Cannot resume platform totals stream, rebuilding: {e}")
+    if stream is None:
+        token, as_of = None, await rebuild_platform_totals()
+        stream = await db.watch(PLATFORM_TOTALS_CHANGES, start_at_operation_time=as_of, **watch_options)
+    
+    async with stream:
+        renew_at = time.monotonic() + PLATFORM_TOTALS_LEASE / 3
+        while True:
+            change = await stream.try_next()
+            if change is not None:
+                token = await apply_platform_totals_change(change, token, as_of)
+            if time.monotonic() >= renew_at:
+                if not await acquire_platform_totals_lease():
+                    raise PlatformTotalsLeaseLost()
+                renew_at = time.monotonic() + PLATFORM_TOTALS_LEASE / 3
+
+async def platform_totals_worker():
+    """Keep platform_totals current from whichever worker holds its lease; retries with
+    backoff on errors and only gives up where change streams can't work."""
+    backoff = 1
+    checked = False
+    resync = False
+    while True:
+        try:
+            if not checked:
+                hello = await client.admin.command("hello")
+                if not hello.get("setName") and hello.get("msg") != "isdbgrid":
+                    logger.warning("[BALANCE] Standalone MongoDB has no change streams; balances use aggregation")
+                    return
+                if not platform_totals_pre_images:
+                    logger.warning("[BALANCE] Change stream pre-images unavailable; balances use aggregation")
+                    return
+                checked = True
+            if resync:
+                # Drop the stream position so the next holder rebuilds from a snapshot
+                await db.platform_totals.update_one(
+                    {"_id": PLATFORM_TOTALS_ID, "owner": PLATFORM_TOTALS_OWNER},
+                    {"$set": {"resume_token": None, "as_of": None}}
+                )
+                resync = False
+            if await acquire_platform_totals_lease():
+                await consume_platform_totals()
+            await asyncio.sleep(PLATFORM_TOTALS_LEASE / 2)
+        except PlatformTotalsLeaseLost:
+            logger.info("[BALANCE] platform_totals lease moved to another worker")
+        except PlatformTotalsResync as e:
+            logger.warning(f"[BALANCE] Rebuilding platform totals: {e}")
+            resync = True
+        except PyMongoError as e:
+            logger.warning(f"[BALANCE] platform totals stream failed, retrying in {backoff}s: {e}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, PLATFORM_TOTALS_MAX_BACKOFF)
+            continue
+        backoff = 1
+
+async def compute_available_balance() -> float:
+    """Platform commission earned minus completed withdrawals (same figure as the
+    merchant overview), read from platform_totals and cached for a few seconds."""
+    cached = balance_cache.get("platform")
+    if cached is not None:
+        return cached
+    
+    # The document is only trusted while a worker holds its lease and keeps it current
+    totals = await db.platform_totals.find_one(
+        {"_id": PLATFORM_TOTALS_ID, "lease_expires_at": {"$gt": datetime.now(timezone.utc)}, "trips": {"$exists": True}},
+        {"trips": 1, "withdrawals": 1}
+    )
+    if not totals:
+        totals = await aggregate_platform_totals()
+    
+    commission_rate = await get_commission_rate()
+    available_balance = round(totals.get("trips", 0) * commission_rate - totals.get("withdrawals", 0), 2)
+    balance_cache.set("platform", available_balance)
+    return available_balance
+
 @api_router.post("/admin/merchants/withdraw")
 async def create_platform_withdrawal(
     amount: float,
     notes: Optional[str] = None,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_super_admin)
 ):
     """Create a platform withdrawal request (transfer to bank)."""
-    if current_user.get("admin_role") != "super_admin":
-        raise HTTPException(status_code=403, detail="Super Admin access required")
-    
     # Check available balance
-    overview_response = await get_merchant_overview(current_user)
-    available_balance = overview_response["overview"]["available_balance"]
+    available_balance = await compute_available_balance()
     
     if amount > available_balance:
         raise HTTPException(
@@ -4179,26 +4741,28 @@ async def create_platform_withdrawal(
         )
     
     # Check if bank is connected
-    settings = await db.merchant_settings.find_one({"type": "platform"}, {"_id": 0})
+    settings = await load_merchant_settings()
     if not settings or not settings.get("bank_account_number"):
         raise HTTPException(
             status_code=400,
             detail="No bank account connected. Please configure bank details first."
         )
     
+    now_iso = utc_now_iso()
     withdrawal = {
-        "id": str(uuid.uuid4()),
+        "id": uuid.uuid4().hex,
         "amount": amount,
         "status": "pending",  # pending, processing, completed, failed
         "notes": notes,
         "bank_account": f"****{settings.get('bank_account_number', 'XXXX')[-4:]}",
         "bank_name": settings.get("bank_name"),
         "requested_by": current_user["id"],
-        "requested_at": datetime.now(timezone.utc).isoformat(),
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "requested_at": now_iso,
+        "created_at": now_iso
     }
     
-    await db.platform_withdrawals.insert_one(withdrawal)
+    await db.platform_withdrawals.insert_one({"_id": withdrawal["id"], **withdrawal})
+    balance_cache.clear()
     
     # Audit log
     await create_audit_log(
@@ -4210,18 +4774,14 @@ async def create_platform_withdrawal(
         notes=f"Amount: ${amount:.2f}"
     )
     
-    withdrawal.pop("_id", None)
     return {"message": "Withdrawal request created", "withdrawal": withdrawal}
 
 @api_router.get("/admin/merchants/withdrawals")
 async def get_platform_withdrawals(
     status: Optional[str] = None,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_admin)
 ):
     """Get platform withdrawal history."""
-    if current_user.get("role") not in ["admin", "super_admin"]:
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
     query = {}
     if status:
         query["status"] = status
@@ -4237,51 +4797,88 @@ async def update_withdrawal_status(
     withdrawal_id: str,
     status: str,
     transaction_ref: Optional[str] = None,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_super_admin)
 ):
     """Update withdrawal status (for manual processing)."""
-    if current_user.get("admin_role") != "super_admin":
-        raise HTTPException(status_code=403, detail="Super Admin access required")
-    
     if status not in ["processing", "completed", "failed"]:
         raise HTTPException(status_code=400, detail="Invalid status")
     
-    withdrawal = await db.platform_withdrawals.find_one({"id": withdrawal_id})
-    if not withdrawal:
-        raise HTTPException(status_code=404, detail="Withdrawal not found")
-    
+    now_iso = utc_now_iso()
     update_data = {
         "status": status,
-        "updated_at": datetime.now(timezone.utc).isoformat(),
+        "updated_at": now_iso,
         "updated_by": current_user["id"]
     }
     
     if status == "completed":
-        update_data["completed_at"] = datetime.now(timezone.utc).isoformat()
+        update_data["completed_at"] = now_iso
     if transaction_ref:
         update_data["transaction_ref"] = transaction_ref
     
-    await db.platform_withdrawals.update_one(
+    result = await db.platform_withdrawals.update_one(
         {"id": withdrawal_id},
         {"$set": update_data}
     )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Withdrawal not found")
+    
+    balance_cache.clear()
     
     return {"message": f"Withdrawal marked as {status}"}
 
 # ============== STRIPE CONFIGURATION ==============
 
+STRIPE_PUBLISHABLE_PREFIXES = frozenset({"pk_test_", "pk_live_"})
+STRIPE_SECRET_PREFIXES = frozenset({"sk_test_", "sk_live_"})
+
+@lru_cache(maxsize=1)
+def stripe_secret_box() -> Optional[AESGCM]:
+    """Cipher for Stripe secrets saved via the admin config, keyed by STRIPE_CONFIG_KEY
+    (urlsafe base64, 32 bytes). None when the variable is unset."""
+    key = os.environ.get('STRIPE_CONFIG_KEY')
+    if not key:
+        return None
+    key_bytes = base64.urlsafe_b64decode(key)
+    if len(key_bytes) != 32:
+        raise RuntimeError("STRIPE_CONFIG_KEY must be 32 bytes of urlsafe base64")
+    return AESGCM(key_bytes)
+
+def require_stripe_secret_box() -> AESGCM:
+    """stripe_secret_box(), raising if STRIPE_CONFIG_KEY is unset."""
+    box = stripe_secret_box()
+    if box is None:
+        raise RuntimeError("STRIPE_CONFIG_KEY is not set")
+    return box
+
+def encrypt_secret(value: str) -> str:
+    """AES-GCM encrypt a secret for storage as base64(nonce + ciphertext)."""
+    nonce = os.urandom(12)
+    return base64.b64encode(nonce + require_stripe_secret_box().encrypt(nonce, value.encode(), None)).decode()
+
+def decrypt_secret(token: str) -> str:
+    """Inverse of encrypt_secret; only code that actually calls Stripe should need this."""
+    raw = base64.b64decode(token)
+    return require_stripe_secret_box().decrypt(raw[:12], raw[12:], None).decode()
+
+async def get_stripe_api_key() -> str:
+    """Secret key for Stripe calls: the configured one if saved, else the STRIPE_API_KEY env fallback."""
+    config = await load_stripe_config() or {}
+    if config.get("secret_key_ct"):
+        if stripe_secret_box() is not None:
+            return decrypt_secret(config["secret_key_ct"])
+        logger.warning("[STRIPE] Saved secret key ignored: STRIPE_CONFIG_KEY is not set")
+    # Configs saved before encryption kept the plaintext key
+    return config.get("secret_key") or stripe.api_key
+
 class StripeConfigUpdate(BaseModel):
     publishable_key: str
     secret_key: str
     webhook_secret: Optional[str] = None
 
 @api_router.get("/admin/stripe/config")
-async def get_stripe_config(current_user: dict = Depends(get_current_user)):
+async def get_stripe_config(current_user: dict = Depends(require_admin)):
     """Get Stripe configuration status."""
-    if current_user.get("role") not in ["admin", "super_admin"]:
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
-    config = await db.stripe_config.find_one({"type": "platform"}, {"_id": 0})
+    config = await load_stripe_config()
     
     if not config:
         return {
@@ -4293,53 +4890,60 @@ async def get_stripe_config(current_user: dict = Depends(get_current_user)):
             "is_configured": False
         }
     
-    # Mask sensitive data
+    # Secrets are stored encrypted; only the presence flags are needed here
+    # (plaintext fields are still honoured for configs saved before encryption)
+    has_secret_key = bool(config.get("has_secret_key") or config.get("secret_key"))
+    has_webhook_secret = bool(config.get("has_webhook_secret") or config.get("webhook_secret"))
     return {
         "config": {
             "publishable_key": config.get("publishable_key", ""),
-            "secret_key": "••••••••" if config.get("secret_key") else "",
-            "webhook_secret": "••••••••" if config.get("webhook_secret") else ""
+            "secret_key": "••••••••" if has_secret_key else "",
+            "webhook_secret": "••••••••" if has_webhook_secret else ""
         },
-        "is_configured": bool(config.get("publishable_key") and config.get("secret_key"))
+        "is_configured": bool(config.get("publishable_key") and has_secret_key)
     }
 
 @api_router.put("/admin/stripe/config")
 async def update_stripe_config(
     config: StripeConfigUpdate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_super_admin)
 ):
     """Update Stripe API configuration."""
-    if current_user.get("admin_role") != "super_admin":
-        raise HTTPException(status_code=403, detail="Super Admin access required")
+    if stripe_secret_box() is None:
+        raise HTTPException(status_code=503, detail="Stripe configuration storage is disabled: STRIPE_CONFIG_KEY is not set")
     
-    # Validate keys format
-    if not config.publishable_key.startswith(("pk_test_", "pk_live_")):
+    # Validate keys format (prefixes are all 8 chars: pk_test_, pk_live_, sk_test_, sk_live_)
+    publishable_prefix = config.publishable_key[:8]
+    secret_prefix = config.secret_key[:8]
+    if publishable_prefix not in STRIPE_PUBLISHABLE_PREFIXES:
         raise HTTPException(status_code=400, detail="Invalid publishable key format. Should start with pk_test_ or pk_live_")
     
-    if not config.secret_key.startswith(("sk_test_", "sk_live_")):
+    if secret_prefix not in STRIPE_SECRET_PREFIXES:
         raise HTTPException(status_code=400, detail="Invalid secret key format. Should start with sk_test_ or sk_live_")
     
     # Check if mixing test and live keys
-    is_test_publishable = config.publishable_key.startswith("pk_test_")
-    is_test_secret = config.secret_key.startswith("sk_test_")
-    if is_test_publishable != is_test_secret:
+    if publishable_prefix[3:] != secret_prefix[3:]:
         raise HTTPException(status_code=400, detail="Cannot mix test and live keys. Both must be test or both must be live.")
+    mode = "test" if publishable_prefix == "pk_test_" else "live"
     
     update_data = {
         "type": "platform",
         "publishable_key": config.publishable_key,
-        "secret_key": config.secret_key,
-        "webhook_secret": config.webhook_secret,
-        "mode": "test" if is_test_publishable else "live",
-        "updated_at": datetime.now(timezone.utc).isoformat(),
+        "secret_key_ct": encrypt_secret(config.secret_key),
+        "has_secret_key": True,
+        "webhook_secret_ct": encrypt_secret(config.webhook_secret) if config.webhook_secret else None,
+        "has_webhook_secret": bool(config.webhook_secret),
+        "mode": mode,
+        "updated_at": utc_now_iso(),
         "updated_by": current_user["id"]
     }
     
     await db.stripe_config.update_one(
         {"type": "platform"},
-        {"$set": update_data},
+        {"$set": update_data, "$unset": {"secret_key": "", "webhook_secret": ""}},
         upsert=True
     )
+    invalidate_cached("stripe_config")
     
     # Audit log
     await create_audit_log(
@@ -4348,12 +4952,12 @@ async def update_stripe_config(
         action_type="stripe_config_updated",
         entity_type="stripe_config",
         entity_id="platform",
-        notes=f"Stripe {'test' if is_test_publishable else 'live'} mode configured"
+        notes=f"Stripe {mode} mode configured"
     )
     
-    logger.info(f"[STRIPE] Configuration updated by {current_user['id']} - Mode: {'test' if is_test_publishable else 'live'}")
+    logger.info(f"[STRIPE] Configuration updated by {current_user['id']} - Mode: {mode}")
     
-    return {"message": "Stripe configuration saved successfully", "mode": "test" if is_test_publishable else "live"}
+    return {"message": "Stripe configuration saved successfully", "mode": mode}
 
 # ============== STRIPE PAYMENTS & TRANSACTIONS ==============
 
@@ -4365,6 +4969,36 @@ def calculate_stripe_fee(amount: float) -> float:
     """Calculate Stripe processing fee."""
     return round((amount * STRIPE_FEE_PERCENT / 100) + STRIPE_FEE_FIXED, 2)
 
+def stripe_fee_expr(amount) -> dict:
+    """Aggregation expression equivalent to calculate_stripe_fee for one amount."""
+    return {"$round": [{"$add": [{"$multiply": [amount, STRIPE_FEE_PERCENT / 100]}, STRIPE_FEE_FIXED]}, 2]}
+
+async def count_by_status(collection, statuses: tuple, match: Optional[dict] = None) -> Dict[str, int]:
+    """Count documents per status with one $group; statuses with no documents count as 0."""
+    pipeline = [
+        {"$match": {**(match or {}), "status": {"$in": list(statuses)}}},
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+    ]
+    counts = dict.fromkeys(statuses, 0)
+    for row in await aggregate_list(collection, pipeline, len(statuses)):
+        counts[row["_id"]] = row["count"]
+    return counts
+
+def encode_trip_cursor(trip: dict) -> str:
+    """Encode a trip's (end_time, id) position as an opaque pagination cursor."""
+    return base64.urlsafe_b64encode(f"{trip.get('end_time', '')}|{trip.get('id', '')}".encode()).decode()
+
+def trip_cursor_filter(cursor: str) -> dict:
+    """Decode a trip cursor into a filter matching trips after it in (end_time, id) desc order."""
+    try:
+        end_time, trip_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"$or": [
+        {"end_time": {"$lt": end_time}},
+        {"end_time": end_time, "id": {"$lt": trip_id}}
+    ]}
+
 class RefundRequest(BaseModel):
     trip_id: str
     refund_type: str = "full"  # full, partial
@@ -4377,6 +5011,54 @@ class PayoutScheduleUpdate(BaseModel):
     early_cashout_fee_percent: float = 1.5
     min_payout_amount: float = 50.0
 
+TRANSACTION_TRIP_PROJECTION = {
+    "_id": 0, "id": 1, "end_time": 1, "driver_id": 1, "user_id": 1, "mode": 1,
+    "payment_status": 1, "payment_method": 1,
+    "final_fare.base_fare": 1, "final_fare.distance_cost": 1, "final_fare.waiting_cost": 1,
+    "final_fare.tip": 1, "final_fare.government_fee": 1, "final_fare.gst": 1,
+    "final_fare.qst": 1, "final_fare.total_final": 1
+}
+
+def trip_fee_stages(commission_rate: float) -> List[dict]:
+    """$addFields stages computing gross, tip, taxes, stripe_fee, platform_commission
+    and net_to_driver for each trip."""
+    return [
+        {"$addFields": {
+            "gross": {"$ifNull": ["$final_fare.total_final", 0]},
+            "tip": {"$ifNull": ["$final_fare.tip", 0]},
+            "gst": {"$ifNull": ["$final_fare.gst", 0]},
+            "qst": {"$ifNull": ["$final_fare.qst", 0]}
+        }},
+        {"$addFields": {
+            "stripe_fee": stripe_fee_expr("$gross"),
+            "platform_commission": {"$round": [{"$multiply": [{"$subtract": ["$gross", "$tip"]}, commission_rate]}, 2]}
+        }},
+        {"$addFields": {
+            "net_to_driver": {"$round": [{"$subtract": ["$gross", {"$add": ["$stripe_fee", "$platform_commission"]}]}, 2]}
+        }}
+    ]
+
+def trip_fare_pipeline(
+    match: Optional[dict],
+    commission_rate: float,
+    limit: Optional[int] = None,
+    skip: Optional[int] = None,
+    projection: Optional[dict] = None
+) -> List[dict]:
+    """Aggregation stages selecting completed trips (newest first) with fees computed
+    server-side. Shared by the payment transaction listing and the exports; pass
+    match=None when the $match is applied earlier (e.g. ahead of a $facet)."""
+    pipeline = [{"$match": match}] if match is not None else []
+    pipeline.append({"$sort": {"end_time": -1, "id": -1}})
+    if skip:
+        pipeline.append({"$skip": skip})
+    if limit:
+        pipeline.append({"$limit": limit})
+    if projection:
+        pipeline.append({"$project": projection})
+    
+    return pipeline + trip_fee_stages(commission_rate)
+
 @api_router.get("/admin/payments/transactions")
 async def get_payment_transactions(
     page: int = 1,
@@ -4385,85 +5067,92 @@ async def get_payment_transactions(
     rider_id: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    current_user: dict = Depends(get_current_user)
+    cursor: Optional[str] = None,
+    with_total: bool = True,
+    current_user: dict = Depends(require_admin)
 ):
     """Get detailed payment transactions with full fare breakdown."""
-    if current_user.get("role") not in ["admin", "super_admin"]:
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
     # Build query
-    query = {"status": "completed"}
+    query = build_trip_date_query(start_date, end_date)
     if driver_id:
         query["driver_id"] = driver_id
     if rider_id:
         query["user_id"] = rider_id
-    if start_date:
-        query["end_time"] = {"$gte": start_date}
-    if end_date:
-        if "end_time" in query:
-            query["end_time"]["$lte"] = end_date
-        else:
-            query["end_time"] = {"$lte": end_date}
     
+    # Seek past the cursor when given instead of skipping earlier pages
+    page_query = query
     skip = (page - 1) * limit
-    
-    # Get trips with full fare details
-    trips = await db.meter_trips.find(
-        query, {"_id": 0}
-    ).sort("end_time", -1).skip(skip).limit(limit).to_list(limit)
-    
-    total = await db.meter_trips.count_documents(query)
+    if cursor:
+        page_query = {"$and": [query, trip_cursor_filter(cursor)]}
+        skip = 0
     
     # Get commission rate
-    commission_config = await db.commission_configs.find_one({"is_active": True}, {"_id": 0})
-    commission_rate = commission_config.get("rate", 15) / 100 if commission_config else 0.15
-    
-    # Enrich with driver/rider info and calculate fees
-    transactions = []
-    for trip in trips:
-        fare = trip.get("final_fare", {})
-        total_amount = fare.get("total_final", 0)
-        tip = fare.get("tip", 0)
-        
-        # Calculate fees
-        stripe_fee = calculate_stripe_fee(total_amount)
-        platform_commission = round((total_amount - tip) * commission_rate, 2)
-        net_amount = round(total_amount - stripe_fee - platform_commission, 2)
-        
-        # Get driver info
-        driver = await db.drivers.find_one({"user_id": trip.get("driver_id")}, {"_id": 0, "name": 1, "email": 1, "phone": 1})
-        
-        # Get rider info if exists
-        rider = None
-        if trip.get("user_id"):
-            rider = await db.users.find_one({"id": trip.get("user_id")}, {"_id": 0, "name": 1, "email": 1, "phone": 1})
-        
-        transactions.append({
-            "id": trip.get("id"),
-            "trip_id": trip.get("id"),
-            "date": trip.get("end_time"),
-            "driver": driver,
-            "rider": rider if rider else {"name": "Street Hail", "email": None},
-            "mode": trip.get("mode", "app"),
+    commission_rate = await get_commission_rate()
+    
+    # Page of trips with driver/rider info and fees computed server-side in one round trip
+    pipeline = trip_fare_pipeline(
+        page_query, commission_rate, limit=limit, skip=skip, projection=TRANSACTION_TRIP_PROJECTION
+    ) + [
+        {"$lookup": {
+            "from": "drivers",
+            "localField": "driver_id",
+            "foreignField": "user_id",
+            "pipeline": [{"$project": {"_id": 0, "name": 1, "email": 1, "phone": 1}}],
+            "as": "driver"
+        }},
+        {"$lookup": {
+            "from": "users",
+            "localField": "user_id",
+            "foreignField": "id",
+            "pipeline": [{"$project": {"_id": 0, "name": 1, "email": 1, "phone": 1}}],
+            "as": "rider"
+        }},
+        {"$project": {
+            "_id": 0,
+            "id": 1,
+            "trip_id": "$id",
+            "date": "$end_time",
+            "driver": {"$ifNull": [{"$arrayElemAt": ["$driver", 0]}, None]},
+            "rider": {"$ifNull": [{"$arrayElemAt": ["$rider", 0]}, {"name": "Street Hail", "email": None}]},
+            "mode": {"$ifNull": ["$mode", "app"]},
             # Fare breakdown
-            "base_fare": fare.get("base_fare", 0),
-            "distance_fare": fare.get("distance_cost", 0),
-            "waiting_time_fare": fare.get("waiting_cost", 0),
-            "tip": tip,
-            "quebec_fee": fare.get("government_fee", 0.90),
-            "gst": fare.get("gst", 0),
-            "qst": fare.get("qst", 0),
-            "total_taxes": round(fare.get("gst", 0) + fare.get("qst", 0), 2),
-            "gross_amount": total_amount,
+            "base_fare": {"$ifNull": ["$final_fare.base_fare", 0]},
+            "distance_fare": {"$ifNull": ["$final_fare.distance_cost", 0]},
+            "waiting_time_fare": {"$ifNull": ["$final_fare.waiting_cost", 0]},
+            "tip": 1,
+            "quebec_fee": {"$ifNull": ["$final_fare.government_fee", 0.90]},
+            "gst": 1,
+            "qst": 1,
+            "total_taxes": {"$round": [{"$add": ["$gst", "$qst"]}, 2]},
+            "gross_amount": "$gross",
             # Deductions
-            "stripe_fee": stripe_fee,
-            "platform_commission": platform_commission,
-            "commission_rate": commission_rate * 100,
+            "stripe_fee": 1,
+            "platform_commission": 1,
+            "commission_rate": {"$literal": commission_rate * 100},
             # Net
-            "net_to_driver": net_amount,
-            "payment_status": trip.get("payment_status", "completed"),
-            "payment_method": trip.get("payment_method", "card")
-        })
+            "net_to_driver": 1,
+            "payment_status": {"$ifNull": ["$payment_status", "completed"]},
+            "payment_method": {"$ifNull": ["$payment_method", "card"]}
+        }}
+    ]
+    transactions = await aggregate_list(db.meter_trips, pipeline, limit)
+    
+    # The unfiltered completed-trip total is shared and cached briefly; filtered
+    # totals can be skipped entirely with with_total=false (use has_next instead)
+    total = None
+    if query == {"status": "completed"}:
+        total = transaction_count_cache.get("completed_trips")
+        if total is None:
+            total = await db.meter_trips.count_documents(query)
+            transaction_count_cache.set("completed_trips", total)
+    elif with_total:
+        total = await db.meter_trips.count_documents(query)
+    
+    has_next = len(transactions) == limit
+    next_cursor = None
+    if has_next:
+        last = transactions[-1]
+        next_cursor = encode_trip_cursor({"end_time": last.get("date"), "id": last.get("id")})
     
     return {
         "transactions": transactions,
@@ -4471,7 +5160,9 @@ async def get_payment_transactions(
             "page": page,
             "limit": limit,
             "total": total,
-            "pages": (total + limit - 1) // limit
+            "pages": (total + limit - 1) // limit if total is not None else None,
+            "has_next": has_next,
+            "next_cursor": next_cursor
         },
         "summary": {
             "total_transactions": total,
@@ -4479,18 +5170,20 @@ async def get_payment_transactions(
         }
     }
 
-@api_router.get("/admin/payments/transactions/export")
-async def export_payment_transactions(
-    start_date: Optional[str] = None,
-    end_date: Optional[str] = None,
-    format: str = "csv",
-    current_user: dict = Depends(get_current_user)
-):
-    """Export transactions for accounting/reporting."""
-    if current_user.get("role") not in ["admin", "super_admin"]:
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
-    # Get all transactions for the date range
+EXPORT_CSV_COLUMNS = (
+    "trip_id", "date", "driver_id", "base_fare", "distance_fare", "waiting_fare", "tip",
+    "quebec_fee", "gst", "qst", "gross_total", "stripe_fee", "platform_commission", "net_to_driver"
+)
+
+EXPORT_TRIP_PROJECTION = {
+    "_id": 0, "id": 1, "end_time": 1, "driver_id": 1,
+    "final_fare.base_fare": 1, "final_fare.distance_cost": 1, "final_fare.waiting_cost": 1,
+    "final_fare.tip": 1, "final_fare.government_fee": 1, "final_fare.gst": 1,
+    "final_fare.qst": 1, "final_fare.total_final": 1
+}
+
+def build_trip_date_query(start_date: Optional[str], end_date: Optional[str]) -> dict:
+    """Completed-trip query bounded by optional end_time dates."""
     query = {"status": "completed"}
     if start_date:
         query["end_time"] = {"$gte": start_date}
@@ -4499,55 +5192,116 @@ async def export_payment_transactions(
             query["end_time"]["$lte"] = end_date
         else:
             query["end_time"] = {"$lte": end_date}
-    
-    trips = await db.meter_trips.find(query, {"_id": 0}).sort("end_time", -1).to_list(10000)
+    return query
+
+# Final shape of an accounting export row, applied after trip_fare_pipeline
+EXPORT_ROW_PROJECTION = {
+    "_id": 0,
+    "trip_id": "$id",
+    "date": "$end_time",
+    "driver_id": 1,
+    "base_fare": {"$ifNull": ["$final_fare.base_fare", 0]},
+    "distance_fare": {"$ifNull": ["$final_fare.distance_cost", 0]},
+    "waiting_fare": {"$ifNull": ["$final_fare.waiting_cost", 0]},
+    "tip": 1,
+    "quebec_fee": {"$ifNull": ["$final_fare.government_fee", 0.90]},
+    "gst": 1,
+    "qst": 1,
+    "gross_total": "$gross",
+    "stripe_fee": 1,
+    "platform_commission": 1,
+    "net_to_driver": 1
+}
+
+EXPORT_ROW_LIMIT = 10000  # rows in the JSON export; the CSV stream has no cap
+
+def export_rows_pipeline(query: Optional[dict], commission_rate: float, limit: Optional[int] = None) -> List[dict]:
+    """Aggregation producing accounting export rows for completed trips."""
+    return trip_fare_pipeline(query, commission_rate, limit=limit, projection=EXPORT_TRIP_PROJECTION) + [
+        {"$project": EXPORT_ROW_PROJECTION}
+    ]
+
+@api_router.get("/admin/payments/transactions/export/csv")
+async def stream_payment_transactions_csv(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    current_user: dict = Depends(require_admin)
+):
+    """Stream the transactions export as CSV straight from the Mongo cursor."""
+    query = build_trip_date_query(start_date, end_date)
+    commission_rate = await get_commission_rate()
+    
+    async def csv_rows():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_CSV_COLUMNS)
+        yield buffer.getvalue()
+        
+        async for row in await db.meter_trips.aggregate(export_rows_pipeline(query, commission_rate)):
+            buffer.seek(0)
+            buffer.truncate(0)
+            writer.writerow([row.get(column) for column in EXPORT_CSV_COLUMNS])
+            yield buffer.getvalue()
+    
+    filename = f"transactions_{datetime.now(timezone.utc).strftime('%Y-%m-%d')}.csv"
+    return StreamingResponse(
+        csv_rows(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@api_router.get("/admin/payments/transactions/export")
+async def export_payment_transactions(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    format: str = "csv",
+    current_user: dict = Depends(require_admin)
+):
+    """Export transactions for accounting/reporting."""
+    # Get all transactions for the date range
+    query = build_trip_date_query(start_date, end_date)
     
     # Get commission rate
-    commission_config = await db.commission_configs.find_one({"is_active": True}, {"_id": 0})
-    commission_rate = commission_config.get("rate", 15) / 100 if commission_config else 0.15
+    commission_rate = await get_commission_rate()
     
-    export_data = []
-    for trip in trips:
-        fare = trip.get("final_fare", {})
-        total_amount = fare.get("total_final", 0)
-        tip = fare.get("tip", 0)
-        stripe_fee = calculate_stripe_fee(total_amount)
-        platform_commission = round((total_amount - tip) * commission_rate, 2)
-        
-        export_data.append({
-            "trip_id": trip.get("id"),
-            "date": trip.get("end_time"),
-            "driver_id": trip.get("driver_id"),
-            "base_fare": fare.get("base_fare", 0),
-            "distance_fare": fare.get("distance_cost", 0),
-            "waiting_fare": fare.get("waiting_cost", 0),
-            "tip": tip,
-            "quebec_fee": fare.get("government_fee", 0.90),
-            "gst": fare.get("gst", 0),
-            "qst": fare.get("qst", 0),
-            "gross_total": total_amount,
-            "stripe_fee": stripe_fee,
-            "platform_commission": platform_commission,
-            "net_to_driver": round(total_amount - stripe_fee - platform_commission, 2)
-        })
+    # Rows (a leading $match/$sort/$limit on the status/end_time index) and grand totals
+    # over every matching trip, run concurrently as separate cursors
+    totals_pipeline = [{"$match": query}, {"$project": EXPORT_TRIP_PROJECTION}] + trip_fee_stages(commission_rate) + [
+        {"$group": {
+            "_id": None,
+            "trip_count": {"$sum": 1},
+            "gross_total": {"$sum": "$gross"},
+            "tip": {"$sum": "$tip"},
+            "stripe_fee": {"$sum": "$stripe_fee"},
+            "platform_commission": {"$sum": "$platform_commission"},
+            "net_to_driver": {"$sum": "$net_to_driver"}
+        }},
+        {"$project": {"_id": 0}}
+    ]
+    export_data, totals_rows = await asyncio.gather(
+        aggregate_list(db.meter_trips, export_rows_pipeline(query, commission_rate, limit=EXPORT_ROW_LIMIT)),
+        aggregate_list(db.meter_trips, totals_pipeline, 1)
+    )
+    totals = totals_rows[0] if totals_rows else {}
     
     return {
         "data": export_data,
         "count": len(export_data),
-        "generated_at": datetime.now(timezone.utc).isoformat()
+        "totals": {
+            key: (round(value, 2) if isinstance(value, float) else value)
+            for key, value in totals.items()
+        },
+        "generated_at": utc_now_iso()
     }
 
 @api_router.get("/admin/payments/payout-settings")
-async def get_payout_settings(current_user: dict = Depends(get_current_user)):
+async def get_payout_settings(current_user: dict = Depends(require_admin)):
     """Get driver payout schedule settings."""
-    if current_user.get("role") not in ["admin", "super_admin"]:
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
-    settings = await db.payout_settings.find_one({"type": "global"}, {"_id": 0})
+    settings = await load_payout_settings()
     
     if not settings:
         settings = {
-            "id": str(uuid.uuid4()),
+            "id": uuid.uuid4().hex,
             "type": "global",
             "schedule": "weekly",  # weekly or daily
             "payout_day": "friday",  # for weekly
@@ -4555,24 +5309,21 @@ async def get_payout_settings(current_user: dict = Depends(get_current_user)):
             "early_cashout_fee_percent": 1.5,
             "min_payout_amount": 50.0,
             "auto_payout_enabled": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": utc_now_iso()
         }
-        await db.payout_settings.insert_one(settings)
-        settings.pop("_id", None)
+        await db.payout_settings.insert_one({"_id": settings["id"], **settings})
+        invalidate_cached("payout_settings")
     
     return {"settings": settings}
 
 @api_router.put("/admin/payments/payout-settings")
 async def update_payout_settings(
     updates: PayoutScheduleUpdate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_super_admin)
 ):
     """Update driver payout schedule settings."""
-    if current_user.get("admin_role") != "super_admin":
-        raise HTTPException(status_code=403, detail="Super Admin access required")
-    
     update_data = updates.dict()
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_data["updated_at"] = utc_now_iso()
     update_data["updated_by"] = current_user["id"]
     
     await db.payout_settings.update_one(
@@ -4580,6 +5331,7 @@ async def update_payout_settings(
         {"$set": update_data},
         upsert=True
     )
+    invalidate_cached("payout_settings")
     
     return {"message": "Payout settings updated"}
 
@@ -4587,12 +5339,9 @@ async def update_payout_settings(
 async def get_driver_payouts(
     status: Optional[str] = None,
     driver_id: Optional[str] = None,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_admin)
 ):
     """Get driver payouts with detailed status."""
-    if current_user.get("role") not in ["admin", "super_admin"]:
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
     query = {}
     if status:
         query["status"] = status
@@ -4601,39 +5350,30 @@ async def get_driver_payouts(
     
     payouts = await db.driver_payouts.find(query, {"_id": 0}).sort("created_at", -1).to_list(200)
     
-    # Enrich with driver info
+    # Enrich with driver info (one $in query for the whole page)
+    driver_ids = list({p.get("driver_id") for p in payouts if p.get("driver_id")})
+    drivers = await db.drivers.find(
+        {"user_id": {"$in": driver_ids}},
+        {"_id": 0, "user_id": 1, "name": 1, "email": 1, "stripe_account_id": 1}
+    ).to_list(len(driver_ids) or 1)
+    drivers_by_id = {d.pop("user_id"): d for d in drivers}
     for payout in payouts:
-        driver = await db.drivers.find_one(
-            {"user_id": payout.get("driver_id")}, 
-            {"_id": 0, "name": 1, "email": 1, "stripe_account_id": 1}
-        )
-        payout["driver"] = driver
+        payout["driver"] = drivers_by_id.get(payout.get("driver_id"))
     
     # Get summary counts
-    pending_count = await db.driver_payouts.count_documents({"status": "pending"})
-    processing_count = await db.driver_payouts.count_documents({"status": "processing"})
-    completed_count = await db.driver_payouts.count_documents({"status": "completed"})
-    failed_count = await db.driver_payouts.count_documents({"status": "failed"})
+    summary = await count_by_status(db.driver_payouts, ("pending", "processing", "completed", "failed"))
     
     return {
         "payouts": payouts,
-        "summary": {
-            "pending": pending_count,
-            "processing": processing_count,
-            "completed": completed_count,
-            "failed": failed_count
-        }
+        "summary": summary
     }
 
 @api_router.post("/admin/payments/driver-payouts/{payout_id}/retry")
 async def retry_failed_payout(
     payout_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_super_admin)
 ):
     """Retry a failed payout."""
-    if current_user.get("admin_role") != "super_admin":
-        raise HTTPException(status_code=403, detail="Super Admin access required")
-    
     payout = await db.driver_payouts.find_one({"id": payout_id})
     if not payout:
         raise HTTPException(status_code=404, detail="Payout not found")
@@ -4642,29 +5382,47 @@ async def retry_failed_payout(
         raise HTTPException(status_code=400, detail="Can only retry failed payouts")
     
     # Reset to pending for retry
+    now_iso = utc_now_iso()
     await db.driver_payouts.update_one(
         {"id": payout_id},
         {"$set": {
             "status": "pending",
             "retry_count": payout.get("retry_count", 0) + 1,
-            "last_retry_at": datetime.now(timezone.utc).isoformat(),
-            "updated_at": datetime.now(timezone.utc).isoformat()
+            "last_retry_at": now_iso,
+            "updated_at": now_iso
         }}
     )
     
     return {"message": "Payout queued for retry"}
 
+@api_router.post("/admin/payments/driver-payouts/retry-all")
+async def retry_all_failed_payouts(current_user: dict = Depends(require_super_admin)):
+    """Queue every failed payout for retry in a single update."""
+    now_iso = utc_now_iso()
+    result = await db.driver_payouts.update_many(
+        {"status": "failed"},
+        {
+            "$set": {"status": "pending", "last_retry_at": now_iso, "updated_at": now_iso},
+            "$inc": {"retry_count": 1}
+        }
+    )
+
+    return {
+        "message": f"{result.modified_count} payouts queued for retry",
+        "retried": result.modified_count
+    }
+
 @api_router.post("/admin/payments/refunds")
 async def create_refund(
     refund_request: RefundRequest,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_admin)
 ):
     """Create a refund for a trip."""
-    if current_user.get("role") not in ["admin", "super_admin"]:
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
     # Get the trip
-    trip = await db.meter_trips.find_one({"id": refund_request.trip_id}, {"_id": 0})
+    trip = await db.meter_trips.find_one(
+        {"id": refund_request.trip_id},
+        {"_id": 0, "driver_id": 1, "user_id": 1, "final_fare.total_final": 1, "final_fare.tip": 1}
+    )
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
     
@@ -4685,7 +5443,7 @@ async def create_refund(
     
     # Create refund record
     refund = {
-        "id": str(uuid.uuid4()),
+        "id": uuid.uuid4().hex,
         "trip_id": refund_request.trip_id,
         "driver_id": trip.get("driver_id"),
         "user_id": trip.get("user_id"),
@@ -4696,29 +5454,26 @@ async def create_refund(
         "reason": refund_request.reason,
         "status": "pending",
         "created_by": current_user["id"],
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utc_now_iso()
     }
     
-    await db.refunds.insert_one(refund)
-    
-    # Update trip status
-    await db.meter_trips.update_one(
-        {"id": refund_request.trip_id},
-        {"$set": {"refund_status": "pending", "refund_id": refund["id"]}}
+    # Refund insert and trip status update are independent; the trip was already read above
+    await asyncio.gather(
+        db.refunds.insert_one({"_id": refund["id"], **refund}),
+        db.meter_trips.update_one(
+            {"id": refund_request.trip_id},
+            {"$set": {"refund_status": "pending", "refund_id": refund["id"]}}
+        )
     )
     
-    refund.pop("_id", None)
     return {"message": "Refund created", "refund": refund}
 
 @api_router.get("/admin/payments/refunds")
 async def get_refunds(
     status: Optional[str] = None,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_admin)
 ):
     """Get all refunds."""
-    if current_user.get("role") not in ["admin", "super_admin"]:
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
     query = {}
     if status:
         query["status"] = status
@@ -4731,27 +5486,24 @@ async def get_refunds(
 async def process_refund(
     refund_id: str,
     status: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_super_admin)
 ):
     """Process a refund (approve/reject)."""
-    if current_user.get("admin_role") != "super_admin":
-        raise HTTPException(status_code=403, detail="Super Admin access required")
-    
     if status not in ["approved", "rejected", "completed"]:
         raise HTTPException(status_code=400, detail="Invalid status")
     
-    refund = await db.refunds.find_one({"id": refund_id})
-    if not refund:
-        raise HTTPException(status_code=404, detail="Refund not found")
-    
-    await db.refunds.update_one(
+    refund = await db.refunds.find_one_and_update(
         {"id": refund_id},
         {"$set": {
             "status": status,
             "processed_by": current_user["id"],
-            "processed_at": datetime.now(timezone.utc).isoformat()
-        }}
+            "processed_at": utc_now_iso()
+        }},
+        projection={"_id": 0, "trip_id": 1},
+        return_document=ReturnDocument.AFTER
     )
+    if not refund:
+        raise HTTPException(status_code=404, detail="Refund not found")
     
     # Update trip refund status
     await db.meter_trips.update_one(
@@ -4764,12 +5516,9 @@ async def process_refund(
 @api_router.get("/admin/payments/disputes")
 async def get_payment_disputes(
     status: Optional[str] = None,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_admin)
 ):
     """Get payment disputes (chargebacks)."""
-    if current_user.get("role") not in ["admin", "super_admin"]:
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
     query = {"type": "chargeback"}
     if status:
         query["status"] = status
@@ -4777,29 +5526,20 @@ async def get_payment_disputes(
     disputes = await db.payment_disputes.find(query, {"_id": 0}).sort("created_at", -1).to_list(100)
     
     # Count by status
-    open_count = await db.payment_disputes.count_documents({"type": "chargeback", "status": "open"})
-    under_review = await db.payment_disputes.count_documents({"type": "chargeback", "status": "under_review"})
-    won = await db.payment_disputes.count_documents({"type": "chargeback", "status": "won"})
-    lost = await db.payment_disputes.count_documents({"type": "chargeback", "status": "lost"})
+    summary = await count_by_status(
+        db.payment_disputes, ("open", "under_review", "won", "lost"), {"type": "chargeback"}
+    )
     
     return {
         "disputes": disputes,
-        "summary": {
-            "open": open_count,
-            "under_review": under_review,
-            "won": won,
-            "lost": lost
-        }
+        "summary": summary
     }
 
 # ============== DRIVER STRIPE CONNECT ==============
 
 @api_router.get("/driver/stripe/status")
-async def get_driver_stripe_status(current_user: dict = Depends(get_current_user)):
+async def get_driver_stripe_status(current_user: dict = Depends(require_driver)):
     """Get driver's Stripe Connect account status."""
-    if current_user.get("role") != "driver":
-        raise HTTPException(status_code=403, detail="Driver access required")
-    
     driver = await db.drivers.find_one({"user_id": current_user["id"]}, {"_id": 0})
     if not driver:
         raise HTTPException(status_code=404, detail="Driver not found")
@@ -4818,12 +5558,9 @@ async def get_driver_stripe_status(current_user: dict = Depends(get_current_user
 @api_router.post("/driver/stripe/connect")
 async def create_stripe_connect_link(
     request: Request,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_driver)
 ):
     """Generate Stripe Connect onboarding link for driver."""
-    if current_user.get("role") != "driver":
-        raise HTTPException(status_code=403, detail="Driver access required")
-    
     driver = await db.drivers.find_one({"user_id": current_user["id"]}, {"_id": 0})
     if not driver:
         raise HTTPException(status_code=404, detail="Driver not found")
@@ -4832,14 +5569,14 @@ async def create_stripe_connect_link(
     # In production, this would use stripe.Account.create() and stripe.AccountLink.create()
     
     base_url = str(request.base_url).rstrip('/')
-    onboarding_id = str(uuid.uuid4())
+    onboarding_id = uuid.uuid4().hex
     
     # Store onboarding session
     await db.stripe_onboarding.insert_one({
         "id": onboarding_id,
         "driver_id": current_user["id"],
         "status": "pending",
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utc_now_iso()
     })
     
     # Mock onboarding URL (in production, this comes from Stripe)
@@ -4857,36 +5594,37 @@ async def create_stripe_connect_link(
 @api_router.post("/driver/stripe/complete-onboarding")
 async def complete_stripe_onboarding(
     session_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_driver)
 ):
     """Complete Stripe Connect onboarding (mock for demo)."""
-    if current_user.get("role") != "driver":
-        raise HTTPException(status_code=403, detail="Driver access required")
-    
     # Verify session
-    session = await db.stripe_onboarding.find_one({"id": session_id, "driver_id": current_user["id"]})
+    session = await db.stripe_onboarding.find_one(
+        {"id": session_id, "driver_id": current_user["id"]},
+        {"_id": 0, "id": 1}
+    )
     if not session:
         raise HTTPException(status_code=404, detail="Onboarding session not found")
     
     # Generate mock Stripe account ID
-    mock_stripe_account = f"acct_mock_{str(uuid.uuid4())[:8]}"
+    mock_stripe_account = f"acct_mock_{uuid.uuid4().hex[:8]}"
     
-    # Update driver with Stripe info
-    await db.drivers.update_one(
-        {"user_id": current_user["id"]},
-        {"$set": {
-            "stripe_account_id": mock_stripe_account,
-            "stripe_account_status": "active",
-            "stripe_payouts_enabled": True,
-            "stripe_charges_enabled": True,
-            "stripe_connected_at": datetime.now(timezone.utc).isoformat()
-        }}
-    )
-    
-    # Update onboarding session
-    await db.stripe_onboarding.update_one(
-        {"id": session_id},
-        {"$set": {"status": "completed", "completed_at": datetime.now(timezone.utc).isoformat()}}
+    # Driver Stripe info and onboarding session live in different collections; write both at once
+    now_iso = utc_now_iso()
+    await asyncio.gather(
+        db.drivers.update_one(
+            {"user_id": current_user["id"]},
+            {"$set": {
+                "stripe_account_id": mock_stripe_account,
+                "stripe_account_status": "active",
+                "stripe_payouts_enabled": True,
+                "stripe_charges_enabled": True,
+                "stripe_connected_at": now_iso
+            }}
+        ),
+        db.stripe_onboarding.update_one(
+            {"id": session_id},
+            {"$set": {"status": "completed", "completed_at": now_iso}}
+        )
     )
     
     logger.info(f"[STRIPE CONNECT] Driver {current_user['id']} completed onboarding")
@@ -4896,12 +5634,9 @@ async def complete_stripe_onboarding(
 @api_router.get("/driver/earnings/summary")
 async def get_driver_earnings_summary(
     period: str = "weekly",
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_driver)
 ):
     """Get driver earnings summary (daily/weekly/monthly)."""
-    if current_user.get("role") != "driver":
-        raise HTTPException(status_code=403, detail="Driver access required")
-    
     now = datetime.now(timezone.utc)
     
     # Calculate date range based on period
@@ -4915,30 +5650,35 @@ async def get_driver_earnings_summary(
     else:
         start_date = now - timedelta(days=7)
     
-    # Get completed trips in period
-    trips = await db.meter_trips.find({
-        "driver_id": current_user["id"],
-        "status": "completed",
-        "end_time": {"$gte": start_date.isoformat()}
-    }, {"_id": 0}).to_list(1000)
+    # Sum completed trips in period server-side
+    pipeline = [
+        {"$match": {
+            "driver_id": current_user["id"],
+            "status": "completed",
+            "end_time": {"$gte": start_date.isoformat()}
+        }},
+        {"$group": {
+            "_id": None,
+            "total_fares": {"$sum": "$final_fare.total_final"},
+            "total_tips": {"$sum": "$final_fare.tip"},
+            "stripe_fees": {"$sum": stripe_fee_expr({"$ifNull": ["$final_fare.total_final", 0]})},
+            "trip_count": {"$sum": 1}
+        }}
+    ]
+    result = await aggregate_list(db.meter_trips, pipeline, 1)
+    totals = result[0] if result else {}
     
     # Get commission rate
-    commission_config = await db.commission_configs.find_one({"is_active": True}, {"_id": 0})
-    commission_rate = commission_config.get("rate", 15) / 100 if commission_config else 0.15
+    commission_rate = await get_commission_rate()
     
     # Calculate earnings
-    total_fares = 0
-    total_tips = 0
-    total_trips = len(trips)
-    
-    for trip in trips:
-        fare = trip.get("final_fare", {})
-        total_fares += fare.get("total_final", 0)
-        total_tips += fare.get("tip", 0)
+    total_fares = totals.get("total_fares", 0)
+    total_tips = totals.get("total_tips", 0)
+    total_trips = totals.get("trip_count", 0)
     
     # Calculate net after commission
     platform_commission = round((total_fares - total_tips) * commission_rate, 2)
-    stripe_fees = round(calculate_stripe_fee(total_fares) * total_trips if total_trips > 0 else 0, 2)
+    stripe_fees = round(totals.get("stripe_fees", 0), 2)
     net_earnings = round(total_fares - platform_commission - stripe_fees, 2)
     
     return {
@@ -4955,33 +5695,35 @@ async def get_driver_earnings_summary(
     }
 
 @api_router.get("/driver/payouts")
-async def get_driver_payouts(current_user: dict = Depends(get_current_user)):
-    """Get driver's payout history."""
-    if current_user.get("role") != "driver":
-        raise HTTPException(status_code=403, detail="Driver access required")
-    
-    payouts = await db.driver_payouts.find(
-        {"driver_id": current_user["id"]},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(50)
-    
-    # Get pending balance
-    pending_balance = 0
-    pending_trips = await db.meter_trips.find({
-        "driver_id": current_user["id"],
-        "status": "completed",
-        "payout_status": {"$ne": "paid"}
-    }, {"_id": 0, "final_fare": 1}).to_list(1000)
-    
-    commission_config = await db.commission_configs.find_one({"is_active": True}, {"_id": 0})
-    commission_rate = commission_config.get("rate", 15) / 100 if commission_config else 0.15
+async def get_driver_payouts(current_user: dict = Depends(require_driver)):
+    """Get driver's payout history."""
+    # Get pending balance: gross, tips and per-trip Stripe fees summed server-side
+    pipeline = [
+        {"$match": {
+            "driver_id": current_user["id"],
+            "status": "completed",
+            "payout_status": {"$ne": "paid"}
+        }},
+        {"$limit": 1000},
+        {"$group": {
+            "_id": None,
+            "gross": {"$sum": "$final_fare.total_final"},
+            "tips": {"$sum": "$final_fare.tip"},
+            "stripe_fees": {"$sum": stripe_fee_expr({"$ifNull": ["$final_fare.total_final", 0]})}
+        }}
+    ]
+    # Payout history, pending totals and commission rate are independent reads
+    payouts, result, commission_rate = await asyncio.gather(
+        db.driver_payouts.find(
+            {"driver_id": current_user["id"]},
+            {"_id": 0}
+        ).sort("created_at", -1).to_list(50),
+        aggregate_list(db.meter_trips, pipeline, 1),
+        get_commission_rate()
+    )
+    pending = result[0] if result else {"gross": 0, "tips": 0, "stripe_fees": 0}
     
-    for trip in pending_trips:
-        fare = trip.get("final_fare", {})
-        total = fare.get("total_final", 0)
-        tip = fare.get("tip", 0)
-        net = total - ((total - tip) * commission_rate) - calculate_stripe_fee(total)
-        pending_balance += net
+    pending_balance = pending["gross"] - (pending["gross"] - pending["tips"]) * commission_rate - pending["stripe_fees"]
     
     return {
         "payouts": payouts,
@@ -4992,19 +5734,20 @@ async def get_driver_payouts(current_user: dict = Depends(get_current_user)):
 @api_router.post("/driver/payouts/early-cashout")
 async def request_early_cashout(
     amount: float,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_driver)
 ):
     """Request early cashout with fee."""
-    if current_user.get("role") != "driver":
-        raise HTTPException(status_code=403, detail="Driver access required")
+    # Driver Stripe account and payout settings are independent reads
+    driver, settings = await asyncio.gather(
+        db.drivers.find_one({"user_id": current_user["id"]}, {"_id": 0, "stripe_account_id": 1}),
+        load_payout_settings()
+    )
     
     # Check driver has Stripe connected
-    driver = await db.drivers.find_one({"user_id": current_user["id"]}, {"_id": 0})
     if not driver or not driver.get("stripe_account_id"):
         raise HTTPException(status_code=400, detail="Please connect your Stripe account first")
     
     # Get payout settings
-    settings = await db.payout_settings.find_one({"type": "global"}, {"_id": 0})
     early_fee_percent = settings.get("early_cashout_fee_percent", 1.5) if settings else 1.5
     min_amount = settings.get("min_payout_amount", 50) if settings else 50
     
@@ -5017,7 +5760,7 @@ async def request_early_cashout(
     
     # Create payout record
     payout = {
-        "id": str(uuid.uuid4()),
+        "id": uuid.uuid4().hex,
         "driver_id": current_user["id"],
         "type": "early_cashout",
         "gross_amount": amount,
@@ -5025,7 +5768,7 @@ async def request_early_cashout(
         "fee_percent": early_fee_percent,
         "net_amount": net_amount,
         "status": "pending",
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utc_now_iso()
     }
     
     await db.driver_payouts.insert_one(payout)
@@ -5038,101 +5781,133 @@ async def request_early_cashout(
     }
 
 @api_router.get("/driver/statements")
-async def get_driver_statements(current_user: dict = Depends(get_current_user)):
+async def get_driver_statements(current_user: dict = Depends(require_driver)):
     """Get available statements for download."""
-    if current_user.get("role") != "driver":
-        raise HTTPException(status_code=403, detail="Driver access required")
-    
     # Generate monthly statement list
     now = datetime.now(timezone.utc)
-    statements = []
-    
+    months = []
     for i in range(6):  # Last 6 months
         month_date = now - timedelta(days=30 * i)
-        month_name = month_date.strftime("%B %Y")
-        
-        # Check if there are trips for this month
         month_start = month_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         if month_date.month == 12:
             month_end = month_date.replace(year=month_date.year + 1, month=1, day=1)
         else:
             month_end = month_date.replace(month=month_date.month + 1, day=1)
-        
-        trip_count = await db.meter_trips.count_documents({
+        months.append((month_date, month_start, month_end))
+    
+    # Per-month counts and gross plus six-month totals in one aggregation,
+    # bucketing on the "YYYY-MM" prefix of end_time
+    pipeline = [
+        {"$match": {
             "driver_id": current_user["id"],
             "status": "completed",
-            "end_time": {"$gte": month_start.isoformat(), "$lt": month_end.isoformat()}
-        })
+            "end_time": {"$gte": months[-1][1].isoformat(), "$lt": months[0][2].isoformat()}
+        }},
+        {"$facet": {
+            "by_month": [{"$group": {
+                "_id": {"$substrCP": ["$end_time", 0, 7]},
+                "count": {"$sum": 1},
+                "gross": {"$sum": "$final_fare.total_final"}
+            }}],
+            "totals": [{"$group": {
+                "_id": None,
+                "count": {"$sum": 1},
+                "gross": {"$sum": "$final_fare.total_final"}
+            }}]
+        }}
+    ]
+    result = (await aggregate_list(db.meter_trips, pipeline, 1))[0]
+    by_month = {row["_id"]: row for row in result["by_month"]}
+    totals = result["totals"][0] if result["totals"] else {"count": 0, "gross": 0}
+    
+    statements = []
+    for month_date, month_start, month_end in months:
+        month_name = month_date.strftime("%B %Y")
+        bucket = by_month.get(month_start.strftime("%Y-%m"))
         
-        if trip_count > 0:
+        if bucket:
             statements.append({
                 "id": f"stmt_{month_date.strftime('%Y%m')}",
                 "month": month_name,
                 "period_start": month_start.isoformat(),
                 "period_end": month_end.isoformat(),
-                "trip_count": trip_count,
+                "trip_count": bucket["count"],
+                "gross_earnings": round(bucket["gross"], 2),
                 "available": True
             })
     
-    return {"statements": statements}
+    return {
+        "statements": statements,
+        "totals": {"trip_count": totals["count"], "gross_earnings": round(totals["gross"], 2)}
+    }
 
-@api_router.get("/driver/statements/{statement_id}/download")
-async def download_driver_statement(
-    statement_id: str,
-    current_user: dict = Depends(get_current_user)
-):
-    """Generate and return statement data (would be PDF in production)."""
-    if current_user.get("role") != "driver":
-        raise HTTPException(status_code=403, detail="Driver access required")
-    
-    # Parse statement ID to get month
+def statement_period(statement_id: str) -> tuple:
+    """(start, end) datetimes of the month a stmt_YYYYMM statement ID covers."""
     try:
         year_month = statement_id.replace("stmt_", "")
         year = int(year_month[:4])
         month = int(year_month[4:])
-    except:
+        start_date = datetime(year, month, 1, tzinfo=timezone.utc)
+    except ValueError:
         raise HTTPException(status_code=400, detail="Invalid statement ID")
     
-    start_date = datetime(year, month, 1, tzinfo=timezone.utc)
     if month == 12:
         end_date = datetime(year + 1, 1, 1, tzinfo=timezone.utc)
     else:
         end_date = datetime(year, month + 1, 1, tzinfo=timezone.utc)
+    return start_date, end_date
+
+@api_router.get("/driver/statements/{statement_id}/download")
+async def download_driver_statement(
+    statement_id: str,
+    current_user: dict = Depends(require_driver)
+):
+    """Generate and return statement data (would be PDF in production)."""
+    start_date, end_date = statement_period(statement_id)
     
-    # Get trips for the month
-    trips = await db.meter_trips.find({
-        "driver_id": current_user["id"],
-        "status": "completed",
-        "end_time": {"$gte": start_date.isoformat(), "$lt": end_date.isoformat()}
-    }, {"_id": 0}).to_list(1000)
-    
-    # Get driver info
-    driver = await db.drivers.find_one({"user_id": current_user["id"]}, {"_id": 0, "name": 1, "email": 1})
+    # Month totals and per-trip lines for the month in one aggregation
+    pipeline = [
+        {"$match": {
+            "driver_id": current_user["id"],
+            "status": "completed",
+            "end_time": {"$gte": start_date.isoformat(), "$lt": end_date.isoformat()}
+        }},
+        {"$limit": 1000},
+        {"$facet": {
+            "totals": [{"$group": {
+                "_id": None,
+                "total_fares": {"$sum": "$final_fare.total_final"},
+                "total_tips": {"$sum": "$final_fare.tip"},
+                "total_gov_fees": {"$sum": {"$ifNull": ["$final_fare.government_fee", 0.90]}},
+                "total_gst": {"$sum": "$final_fare.gst"},
+                "total_qst": {"$sum": "$final_fare.qst"},
+                "trip_count": {"$sum": 1}
+            }}],
+            "trip_details": [{"$project": {
+                "_id": 0,
+                "date": {"$ifNull": ["$end_time", None]},
+                "fare": {"$ifNull": ["$final_fare.total_final", 0]},
+                "tip": {"$ifNull": ["$final_fare.tip", 0]}
+            }}]
+        }}
+    ]
+    # Trip totals, driver info and commission rate are independent reads
+    facets, driver, commission_rate = await asyncio.gather(
+        aggregate_list(db.meter_trips, pipeline, 1),
+        db.drivers.find_one({"user_id": current_user["id"]}, {"_id": 0, "name": 1, "email": 1}),
+        get_commission_rate()
+    )
+    result = facets[0]
+    totals = result["totals"][0] if result["totals"] else {}
+    trip_details = result["trip_details"]
     
     # Calculate totals
-    commission_config = await db.commission_configs.find_one({"is_active": True}, {"_id": 0})
-    commission_rate = commission_config.get("rate", 15) / 100 if commission_config else 0.15
-    
-    total_fares = 0
-    total_tips = 0
-    total_gov_fees = 0
-    total_gst = 0
-    total_qst = 0
     
-    trip_details = []
-    for trip in trips:
-        fare = trip.get("final_fare", {})
-        total_fares += fare.get("total_final", 0)
-        total_tips += fare.get("tip", 0)
-        total_gov_fees += fare.get("government_fee", 0.90)
-        total_gst += fare.get("gst", 0)
-        total_qst += fare.get("qst", 0)
-        
-        trip_details.append({
-            "date": trip.get("end_time"),
-            "fare": fare.get("total_final", 0),
-            "tip": fare.get("tip", 0)
-        })
+    total_fares = totals.get("total_fares", 0)
+    total_tips = totals.get("total_tips", 0)
+    total_gov_fees = totals.get("total_gov_fees", 0)
+    total_gst = totals.get("total_gst", 0)
+    total_qst = totals.get("total_qst", 0)
     
     platform_commission = round((total_fares - total_tips) * commission_rate, 2)
     net_earnings = round(total_fares - platform_commission, 2)
@@ -5143,7 +5918,7 @@ async def download_driver_statement(
             "period": f"{start_date.strftime('%B %Y')}",
             "period_start": start_date.isoformat(),
             "period_end": end_date.isoformat(),
-            "total_trips": len(trips),
+            "total_trips": totals.get("trip_count", 0),
             "gross_earnings": round(total_fares, 2),
             "tips": round(total_tips, 2),
             "government_fees": round(total_gov_fees, 2),
@@ -5154,51 +5929,85 @@ async def download_driver_statement(
             "net_earnings": net_earnings,
             "trip_details": trip_details
         },
-        "generated_at": datetime.now(timezone.utc).isoformat()
+        "generated_at": utc_now_iso()
+    }
+
+@api_router.get("/driver/statements/{statement_id}/download.ndjson")
+async def stream_driver_statement_trips(
+    statement_id: str,
+    current_user: dict = Depends(require_driver)
+):
+    """Stream a statement's trip lines as NDJSON, one trip per line, for the PDF generator."""
+    start_date, end_date = statement_period(statement_id)
+    query = {
+        "driver_id": current_user["id"],
+        "status": "completed",
+        "end_time": {"$gte": start_date.isoformat(), "$lt": end_date.isoformat()}
     }
+    
+    async def generate():
+        cursor = db.meter_trips.find(
+            query,
+            {"_id": 0, "id": 1, "end_time": 1, "final_fare.total_final": 1, "final_fare.tip": 1}
+        ).sort("end_time", 1)
+        async for trip in cursor:
+            fare = trip.get("final_fare") or {}
+            yield orjson.dumps({
+                "id": trip.get("id"),
+                "date": trip.get("end_time"),
+                "fare": fare.get("total_final", 0),
+                "tip": fare.get("tip", 0)
+            }) + b"\n"
+    
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f"attachment; filename={statement_id}.ndjson"}
+    )
 
 # ============== DRIVER SETTINGS & DOCUMENTS ==============
 
 @api_router.get("/driver/trips")
-async def get_driver_trips(current_user: dict = Depends(get_current_user)):
+async def get_driver_trips(current_user: dict = Depends(require_driver)):
     """Get driver's trip history."""
-    if current_user.get("role") != "driver":
-        raise HTTPException(status_code=403, detail="Driver access required")
-    
     trips = await db.meter_trips.find(
         {"driver_id": current_user["id"]},
-        {"_id": 0}
+        {"_id": 0, "fare_snapshots": 0}  # Exclude large snapshot data
     ).sort("created_at", -1).to_list(100)
     
     return {"trips": trips}
 
 @api_router.get("/driver/ratings")
-async def get_driver_ratings(current_user: dict = Depends(get_current_user)):
+async def get_driver_ratings(current_user: dict = Depends(require_driver)):
     """Get driver's ratings and reviews."""
-    if current_user.get("role") != "driver":
-        raise HTTPException(status_code=403, detail="Driver access required")
-    
-    # Get ratings from trips
-    trips = await db.meter_trips.find(
-        {"driver_id": current_user["id"], "rating": {"$exists": True}},
-        {"_id": 0, "rating": 1, "created_at": 1}
-    ).to_list(1000)
+    # Rating summary from trips, computed server-side
+    pipeline = [
+        {"$match": {"driver_id": current_user["id"], "rating": {"$exists": True}}},
+        {"$group": {
+            "_id": None,
+            "avg": {"$avg": "$rating"},
+            "n": {"$sum": 1},
+            "five": {"$sum": {"$cond": [{"$eq": ["$rating", 5]}, 1, 0]}}
+        }}
+    ]
+    # Rating summary and latest reviews are independent reads
+    result, reviews = await asyncio.gather(
+        aggregate_list(db.meter_trips, pipeline, 1),
+        db.driver_reviews.find(
+            {"driver_id": current_user["id"]},
+            {"_id": 0}
+        ).sort("created_at", -1).to_list(20)
+    )
     
     # Calculate summary
-    total_ratings = len(trips)
+    total_ratings = result[0]["n"] if result else 0
     if total_ratings > 0:
-        avg_rating = sum(t.get("rating", 0) for t in trips) / total_ratings
-        five_star = len([t for t in trips if t.get("rating") == 5])
+        avg_rating = result[0]["avg"] or 0
+        five_star = result[0]["five"]
     else:
         avg_rating = 4.85  # Default for new drivers
         five_star = 0
     
-    # Get reviews with comments
-    reviews = await db.driver_reviews.find(
-        {"driver_id": current_user["id"]},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(20)
-    
     return {
         "summary": {
             "average_rating": round(avg_rating, 2),
@@ -5213,44 +6022,40 @@ async def get_driver_ratings(current_user: dict = Depends(get_current_user)):
         "reviews": reviews
     }
 
+DEFAULT_DRIVER_SETTINGS = {
+    "bank_info": {},
+    "documents": [],
+    "car_info": {},
+    "background_check": None,
+    "tax_info": {}
+}
+
 @api_router.get("/driver/settings")
-async def get_driver_settings(current_user: dict = Depends(get_current_user)):
+async def get_driver_settings(current_user: dict = Depends(require_driver)):
     """Get all driver settings."""
-    if current_user.get("role") != "driver":
-        raise HTTPException(status_code=403, detail="Driver access required")
-    
     settings = await db.driver_settings.find_one(
         {"driver_id": current_user["id"]},
         {"_id": 0}
     )
     
     if not settings:
-        settings = {
-            "driver_id": current_user["id"],
-            "bank_info": {},
-            "documents": [],
-            "car_info": {},
-            "background_check": None,
-            "tax_info": {}
-        }
+        # Read-only response; the shared empty containers are never mutated
+        settings = {"driver_id": current_user["id"], **DEFAULT_DRIVER_SETTINGS}
     
     return settings
 
 @api_router.put("/driver/settings/bank")
 async def update_driver_bank(
     bank_info: dict,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_driver)
 ):
     """Update driver's bank information."""
-    if current_user.get("role") != "driver":
-        raise HTTPException(status_code=403, detail="Driver access required")
-    
     await db.driver_settings.update_one(
         {"driver_id": current_user["id"]},
         {"$set": {
             "driver_id": current_user["id"],
             "bank_info": bank_info,
-            "bank_updated_at": datetime.now(timezone.utc).isoformat()
+            "bank_updated_at": utc_now_iso()
         }},
         upsert=True
     )
@@ -5260,18 +6065,15 @@ async def update_driver_bank(
 @api_router.put("/driver/settings/car")
 async def update_driver_car(
     car_info: dict,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_driver)
 ):
     """Update driver's car information."""
-    if current_user.get("role") != "driver":
-        raise HTTPException(status_code=403, detail="Driver access required")
-    
     await db.driver_settings.update_one(
         {"driver_id": current_user["id"]},
         {"$set": {
             "driver_id": current_user["id"],
             "car_info": car_info,
-            "car_updated_at": datetime.now(timezone.utc).isoformat()
+            "car_updated_at": utc_now_iso()
         }},
         upsert=True
     )
@@ -5281,18 +6083,15 @@ async def update_driver_car(
 @api_router.put("/driver/settings/tax")
 async def update_driver_tax(
     tax_info: dict,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_driver)
 ):
     """Update driver's tax information."""
-    if current_user.get("role") != "driver":
-        raise HTTPException(status_code=403, detail="Driver access required")
-    
     await db.driver_settings.update_one(
         {"driver_id": current_user["id"]},
         {"$set": {
             "driver_id": current_user["id"],
             "tax_info": tax_info,
-            "tax_updated_at": datetime.now(timezone.utc).isoformat()
+            "tax_updated_at": utc_now_iso()
         }},
         upsert=True
     )
@@ -5300,15 +6099,13 @@ async def update_driver_tax(
     return {"message": "Tax information saved"}
 
 @api_router.post("/driver/settings/background-check")
-async def request_background_check(current_user: dict = Depends(get_current_user)):
+async def request_background_check(current_user: dict = Depends(require_driver)):
     """Request a background check."""
-    if current_user.get("role") != "driver":
-        raise HTTPException(status_code=403, detail="Driver access required")
-    
+    now = datetime.now(timezone.utc)
     background_check = {
         "status": "pending",
-        "requested_at": datetime.now(timezone.utc).isoformat(),
-        "estimated_completion": (datetime.now(timezone.utc) + timedelta(days=5)).isoformat()
+        "requested_at": now.isoformat(),
+        "estimated_completion": (now + timedelta(days=5)).isoformat()
     }
     
     await db.driver_settings.update_one(
@@ -5324,19 +6121,10 @@ async def request_background_check(current_user: dict = Depends(get_current_user
 
 # ============== DRIVER CONTRACTS ==============
 
-@api_router.get("/admin/contracts/template")
-async def get_contract_template(current_user: dict = Depends(get_current_user)):
-    """Get the current driver contract template."""
-    if current_user["role"] != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
-    contract = await db.contract_templates.find_one({"active": True}, {"_id": 0})
-    if not contract:
-        contract = {
-            "id": str(uuid.uuid4()),
-            "version": "1.0",
-            "title": "Driver Partnership Agreement",
-            "content": """
+DEFAULT_CONTRACT_TEMPLATE = {
+    "version": "1.0",
+    "title": "Driver Partnership Agreement",
+    "content": """
 DRIVER PARTNERSHIP AGREEMENT
 
 This Agreement is made between Transpo ("Company") and the Driver ("Partner").
@@ -5362,27 +6150,34 @@ By signing below, the Partner acknowledges and agrees to these terms.
 
 Signature: ____________________
 Date: ____________________
-            """,
+            """
+}
+
+@api_router.get("/admin/contracts/template")
+async def get_contract_template(current_user: dict = Depends(require_admin_role)):
+    """Get the current driver contract template."""
+    contract = await db.contract_templates.find_one({"active": True}, {"_id": 0})
+    if not contract:
+        now_iso = utc_now_iso()
+        contract = {
+            "id": uuid.uuid4().hex,
+            **DEFAULT_CONTRACT_TEMPLATE,
             "active": True,
-            "effective_date": datetime.now(timezone.utc).isoformat(),
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "effective_date": now_iso,
+            "created_at": now_iso
         }
-        await db.contract_templates.insert_one(contract)
+        await db.contract_templates.insert_one({"_id": contract["id"], **contract})
     
-    contract.pop("_id", None)
     return contract
 
 @api_router.put("/admin/contracts/template")
 async def update_contract_template(
     updates: DriverContractUpdate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_admin_role)
 ):
     """Update the driver contract template."""
-    if current_user["role"] != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
     update_data = {k: v for k, v in updates.dict().items() if v is not None}
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_data["updated_at"] = utc_now_iso()
     update_data["updated_by"] = current_user["id"]
     
     await db.contract_templates.update_one(
@@ -5393,11 +6188,8 @@ async def update_contract_template(
     return {"message": "Contract template updated"}
 
 @api_router.get("/admin/contracts/signed")
-async def get_signed_contracts(current_user: dict = Depends(get_current_user)):
+async def get_signed_contracts(current_user: dict = Depends(require_admin_role)):
     """Get all signed driver contracts."""
-    if current_user["role"] != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
     contracts = await db.driver_contracts.find({}, {"_id": 0}).sort("signed_at", -1).to_list(100)
     return {"contracts": contracts}
 
@@ -5407,12 +6199,9 @@ async def get_signed_contracts(current_user: dict = Depends(get_current_user)):
 async def generate_tax_report(
     year: int = None,
     quarter: int = None,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_admin_role)
 ):
     """Generate tax report for a period."""
-    if current_user["role"] != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
     year = year or datetime.now().year
     
     # Build date range
@@ -5443,9 +6232,9 @@ async def generate_tax_report(
         }}
     ]
     
-    result = await db.meter_sessions.aggregate(pipeline).to_list(1)
+    result = await aggregate_list(db.meter_sessions, pipeline, 1)
     
-    settings = await db.platform_settings.find_one({"type": "global"}, {"_id": 0})
+    settings = await load_platform_settings()
     commission_rate = settings.get("commission_rate", 25) if settings else 25
     gst_rate = settings.get("tax_settings", {}).get("gst_rate", 5) if settings else 5
     qst_rate = settings.get("tax_settings", {}).get("qst_rate", 9.975) if settings else 9.975
@@ -5481,23 +6270,20 @@ async def generate_tax_report(
 
 @api_router.post("/fare/estimate")
 async def estimate_fare(request: FareEstimateRequest):
-    distance_km = calculate_distance_km(
+    distance_km, duration_min = estimate_trip_metrics(
         request.pickup_lat, request.pickup_lng,
         request.dropoff_lat, request.dropoff_lng
     )
-    duration_min = estimate_duration_minutes(distance_km)
     
-    hour = datetime.now().hour
-    surge = 1.0
-    if 7 <= hour <= 9 or 17 <= hour <= 19:
-        surge = 1.25
+    surge = SURGE_BY_HOUR[datetime.now().hour]
     
-    our_fare = calculate_fare(distance_km, duration_min, request.vehicle_type, surge)
-    competitor_estimates = get_competitor_estimates(distance_km, duration_min)
+    our_fare = cached_fare(distance_km, duration_min, request.vehicle_type, surge)
+    competitor_estimates = cached_competitor_estimates(distance_km, duration_min)
     
     all_options = [{"provider": "Transpo", "estimated_fare": our_fare["total"], "is_platform": True}]
     all_options.extend(competitor_estimates)
-    all_options.sort(key=lambda x: x["estimated_fare"])
+    # Ties go to the platform fare
+    all_options.sort(key=lambda x: (x["estimated_fare"], not x.get("is_platform", False)))
     
     recommendation = "best_value" if all_options[0]["provider"] == "Transpo" else "competitive"
     
@@ -5518,13 +6304,14 @@ async def book_taxi(request: TaxiBookingRequest, current_user: dict = Depends(ge
     duration_min = estimate_duration_minutes(distance_km)
     fare = calculate_fare(distance_km, duration_min, request.vehicle_type)
     
-    nearby_drivers = await find_nearby_drivers(
+    # Scheduled rides are matched later, so only immediate bookings need the driver search
+    nearby_drivers = [] if request.is_scheduled else await find_nearby_drivers(
         request.pickup_lat, request.pickup_lng,
         radius_km=5.0, vehicle_type=request.vehicle_type, limit=5
     )
     
-    booking_id = str(uuid.uuid4())
-    now = datetime.now(timezone.utc).isoformat()
+    booking_id = uuid.uuid4().hex
+    now = utc_now_iso()
     
     # Determine contact info based on booking type
     if request.booking_for_self:
@@ -5612,7 +6399,10 @@ class UserCancellationRequest(BaseModel):
 @api_router.post("/bookings/{booking_id}/cancel")
 async def user_cancel_booking(booking_id: str, request: UserCancellationRequest = None, current_user: dict = Depends(get_current_user)):
     """User cancels their own booking. Late cancellations (after 3 min) incur a rating penalty."""
-    booking = await db.bookings.find_one({"id": booking_id, "user_id": current_user["id"]})
+    booking = await db.bookings.find_one(
+        {"id": booking_id, "user_id": current_user["id"]},
+        {"_id": 0, "status": 1, "created_at": 1, "driver_id": 1}
+    )
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
     
@@ -5620,9 +6410,7 @@ async def user_cancel_booking(booking_id: str, request: UserCancellationRequest
         raise HTTPException(status_code=400, detail="Booking cannot be cancelled")
     
     now = datetime.now(timezone.utc)
-    created_at = datetime.fromisoformat(booking["created_at"].replace('Z', '+00:00'))
-    if created_at.tzinfo is None:
-        created_at = created_at.replace(tzinfo=timezone.utc)
+    created_at = as_utc_datetime(booking["created_at"])
     
     minutes_since_booking = (now - created_at).total_seconds() / 60
     is_late_cancellation = minutes_since_booking > USER_RATING_CONFIG["late_cancel_threshold_minutes"]
@@ -5632,7 +6420,7 @@ async def user_cancel_booking(booking_id: str, request: UserCancellationRequest
         {"id": booking_id},
         {"$set": {
             "status": "cancelled",
-            "cancelled_at": now.isoformat(),
+            "cancelled_at": now,
             "cancelled_by": "user",
             "cancellation_reason": request.reason if request else None,
             "is_late_cancellation": is_late_cancellation
@@ -5649,17 +6437,18 @@ async def user_cancel_booking(booking_id: str, request: UserCancellationRequest
     rating_deducted = 0
     # Apply late cancellation penalty
     if is_late_cancellation:
-        user = await db.users.find_one({"id": current_user["id"]}, {"_id": 0})
-        current_rating = user.get("rating", USER_RATING_CONFIG["initial_rating"])
-        new_rating = max(1.0, current_rating - USER_RATING_CONFIG["late_cancel_penalty"])
         rating_deducted = USER_RATING_CONFIG["late_cancel_penalty"]
         
+        # Pipeline update: read-modify-write of the rating happens atomically on the server
         await db.users.update_one(
             {"id": current_user["id"]},
-            {
-                "$set": {"rating": new_rating},
-                "$inc": {"late_cancellation_count": 1}
-            }
+            [{"$set": {
+                "rating": {"$max": [1.0, {"$subtract": [
+                    {"$ifNull": ["$rating", USER_RATING_CONFIG["initial_rating"]]},
+                    USER_RATING_CONFIG["late_cancel_penalty"]
+                ]}]},
+                "late_cancellation_count": {"$add": [{"$ifNull": ["$late_cancellation_count", 0]}, 1]}
+            }}]
         )
     
     return {
@@ -5687,25 +6476,84 @@ async def get_user_rating(current_user: dict = Depends(get_current_user)):
 
 # ============== MAP/LOCATION ROUTES ==============
 
+# The public landing map is served from a short-lived in-memory snapshot of available
+# drivers, so page views don't each run a driver query; every worker refreshes its copy
+# from Mongo once the TTL lapses, which also picks up status and location changes
+MAP_DRIVERS_LIMIT = 20
+online_drivers_cache = TTLCache(maxsize=1, ttl=2)
+
+async def load_online_drivers() -> tuple:
+    """(drivers, lats, lngs) for online, available drivers, refreshed every couple of seconds."""
+    snapshot = online_drivers_cache.get("drivers")
+    if snapshot is None:
+        drivers = [
+            d for d in await db.drivers.find(
+                {"status": "online", "is_available": True},
+                {"_id": 0, "id": 1, "location": 1, "vehicle_type": 1, "rating": 1, "profile_photo": 1}
+            ).to_list(None)
+            if d.get("location")
+        ]
+        lats = np.fromiter((d["location"].get("latitude", 0) for d in drivers), dtype=np.float64, count=len(drivers))
+        lngs = np.fromiter((d["location"].get("longitude", 0) for d in drivers), dtype=np.float64, count=len(drivers))
+        snapshot = (drivers, lats, lngs)
+        online_drivers_cache.set("drivers", snapshot)
+    return snapshot
+
 @api_router.get("/map/drivers")
 async def get_map_drivers(lat: float, lng: float, radius: float = 5.0):
-    drivers = await find_nearby_drivers(lat, lng, radius_km=radius, limit=20)
+    drivers, lats, lngs = await load_online_drivers()
+    if not drivers:
+        return {"drivers": []}
+    
+    # Nearest drivers inside the radius, from one vectorized distance pass
+    distances = calculate_distances_km(lat, lng, lats, lngs)
+    in_range = np.flatnonzero(distances <= radius)
+    if len(in_range) > MAP_DRIVERS_LIMIT:
+        in_range = in_range[np.argpartition(distances[in_range], MAP_DRIVERS_LIMIT)[:MAP_DRIVERS_LIMIT]]
+    nearest = in_range[np.argsort(distances[in_range], kind="stable")].tolist()
+    
     return {
         "drivers": [
             {
-                "id": d["id"],
-                "location": d["location"],
-                "vehicle_type": d["vehicle_type"],
-                "rating": d["rating"],
-                "eta_minutes": d["eta_minutes"],
-                "profile_photo": d.get("profile_photo")
+                "id": drivers[i]["id"],
+                "location": drivers[i]["location"],
+                "vehicle_type": drivers[i].get("vehicle_type"),
+                "rating": drivers[i].get("rating"),
+                "eta_minutes": round(estimate_duration_minutes(float(distances[i]), traffic_factor=1.2), 1),
+                "profile_photo": drivers[i].get("profile_photo")
             }
-            for d in drivers
+            for i in nearest
         ]
     }
 
 # ============== PAYMENT ROUTES ==============
 
+# Every ride is sold as the same Stripe Product with a per-session price, instead of an
+# inline product_data that makes Stripe create a throwaway product per checkout.
+# Set STRIPE_RIDE_PRODUCT_ID to pin one; otherwise the product is created under a fixed
+# custom id, so every worker, restart and deploy shares it instead of adding another.
+STRIPE_RIDE_PRODUCT_ID = os.environ.get('STRIPE_RIDE_PRODUCT_ID', 'transpo_ride')
+stripe_ride_product_ready = False
+stripe_ride_product_lock = asyncio.Lock()
+
+def ensure_stripe_ride_product(api_key: str):
+    """Create the ride product under its fixed id unless it already exists."""
+    try:
+        stripe.Product.create(id=STRIPE_RIDE_PRODUCT_ID, name="Transpo Ride", api_key=api_key)
+    except stripe.error.InvalidRequestError as e:
+        if e.code != "resource_already_exists":
+            raise
+
+async def get_stripe_ride_product_id() -> str:
+    """ID of the reusable Stripe Product for taxi rides."""
+    global stripe_ride_product_ready
+    if not stripe_ride_product_ready:
+        async with stripe_ride_product_lock:
+            if not stripe_ride_product_ready:
+                await asyncio.to_thread(ensure_stripe_ride_product, await get_stripe_api_key())
+                stripe_ride_product_ready = True
+    return STRIPE_RIDE_PRODUCT_ID
+
 @api_router.post("/payments/create-checkout")
 async def create_checkout_session(request: Request, booking_id: str, current_user: dict = Depends(get_current_user)):
     booking = await db.bookings.find_one({"id": booking_id, "user_id": current_user["id"]})
@@ -5715,35 +6563,42 @@ async def create_checkout_session(request: Request, booking_id: str, current_use
     host_url = str(request.base_url).rstrip('/')
     amount = booking["fare"]["total"]
     
+    # Everything except the Stripe session ID is known up front
+    session_params = {
+        "payment_method_types": ['card'],
+        "line_items": [{
+            'price_data': {
+                'currency': 'cad',
+                'unit_amount': int(amount * 100),
+            },
+            'quantity': 1,
+        }],
+        "payment_intent_data": {
+            'description': f'Transpo Ride - {booking["pickup"]["address"][:30]} to {booking["dropoff"]["address"][:30]}',
+        },
+        "mode": 'payment',
+        "success_url": f'{host_url}/payment/success?session_id={{CHECKOUT_SESSION_ID}}&booking_id={booking_id}',
+        "cancel_url": f'{host_url}/payment/cancel?booking_id={booking_id}',
+        "metadata": {'booking_id': booking_id, 'user_id': current_user["id"]}
+    }
+    transaction = {
+        "id": uuid.uuid4().hex,
+        "booking_id": booking_id,
+        "user_id": current_user["id"],
+        "amount": amount,
+        "currency": "cad",
+        "status": "pending",
+        "created_at": utc_now_iso()
+    }
+    
     try:
-        session = stripe.checkout.Session.create(
-            payment_method_types=['card'],
-            line_items=[{
-                'price_data': {
-                    'currency': 'cad',
-                    'product_data': {
-                        'name': f'Transpo Ride - {booking["pickup"]["address"][:30]} to {booking["dropoff"]["address"][:30]}',
-                    },
-                    'unit_amount': int(amount * 100),
-                },
-                'quantity': 1,
-            }],
-            mode='payment',
-            success_url=f'{host_url}/payment/success?session_id={{CHECKOUT_SESSION_ID}}&booking_id={booking_id}',
-            cancel_url=f'{host_url}/payment/cancel?booking_id={booking_id}',
-            metadata={'booking_id': booking_id, 'user_id': current_user["id"]}
+        session_params["line_items"][0]["price_data"]["product"] = await get_stripe_ride_product_id()
+        # The Stripe SDK is synchronous; keep its HTTP call off the event loop
+        session = await asyncio.to_thread(
+            stripe.checkout.Session.create, api_key=await get_stripe_api_key(), **session_params
         )
         
-        await db.payment_transactions.insert_one({
-            "id": str(uuid.uuid4()),
-            "session_id": session.id,
-            "booking_id": booking_id,
-            "user_id": current_user["id"],
-            "amount": amount,
-            "currency": "cad",
-            "status": "pending",
-            "created_at": datetime.now(timezone.utc).isoformat()
-        })
+        await db.payment_transactions.insert_one({**transaction, "session_id": session.id})
         
         return {"checkout_url": session.url, "session_id": session.id}
     except Exception as e:
@@ -5753,17 +6608,20 @@ async def create_checkout_session(request: Request, booking_id: str, current_use
 @api_router.get("/payments/status/{session_id}")
 async def get_payment_status(session_id: str, current_user: dict = Depends(get_current_user)):
     try:
-        session = stripe.checkout.Session.retrieve(session_id)
-        
-        await db.payment_transactions.update_one(
-            {"session_id": session_id},
-            {"$set": {"status": session.payment_status, "updated_at": datetime.now(timezone.utc).isoformat()}}
+        session = await asyncio.to_thread(
+            stripe.checkout.Session.retrieve, session_id, api_key=await get_stripe_api_key()
         )
         
+        # The transaction and booking live in different collections; write them concurrently
+        writes = [db.payment_transactions.update_one(
+            {"session_id": session_id},
+            {"$set": {"status": session.payment_status, "updated_at": utc_now_iso()}}
+        )]
         if session.payment_status == "paid":
             booking_id = session.metadata.get("booking_id")
             if booking_id:
-                await db.bookings.update_one({"id": booking_id}, {"$set": {"payment_status": "paid"}})
+                writes.append(db.bookings.update_one({"id": booking_id}, {"$set": {"payment_status": "paid"}}))
+        await asyncio.gather(*writes)
         
         return {
             "status": session.status,
@@ -5776,20 +6634,42 @@ async def get_payment_status(session_id: str, current_user: dict = Depends(get_c
 
 # ============== SEED DATA ==============
 
+# Fixed demo vocab, built once at import
+DEMO_VEHICLE_TYPES = ("sedan", "suv", "van", "bike")
+DEMO_VEHICLE_MAKES = ("Toyota", "Honda", "Ford", "Chevrolet")
+DEMO_VEHICLE_MODELS = ("Camry", "Accord", "Escape", "Equinox")
+DEMO_VEHICLE_COLORS = ("White", "Black", "Silver", "Blue", "Red")
+DEMO_FIRST_NAMES = ("John", "Marie", "David", "Sophie", "Michael", "Emma", "James", "Olivia", "Robert", "Charlotte", "William", "Amelia", "Joseph", "Mia", "Charles")
+DEMO_LAST_NAMES = ("Smith", "Tremblay", "Johnson", "Roy", "Williams", "Gagnon", "Brown", "Bouchard", "Jones", "Côté", "Garcia", "Fortin", "Miller", "Lavoie", "Davis")
+
 @api_router.post("/seed/drivers")
 async def seed_demo_drivers():
     base_lat, base_lng = 45.5017, -73.5673
     demo_drivers = []
-    vehicle_types = ["sedan", "suv", "van", "bike"]
-    first_names = ["John", "Marie", "David", "Sophie", "Michael", "Emma", "James", "Olivia", "Robert", "Charlotte", "William", "Amelia", "Joseph", "Mia", "Charles"]
-    last_names = ["Smith", "Tremblay", "Johnson", "Roy", "Williams", "Gagnon", "Brown", "Bouchard", "Jones", "Côté", "Garcia", "Fortin", "Miller", "Lavoie", "Davis"]
-    
-    for i in range(15):
-        driver_id = str(uuid.uuid4())
-        lat_offset = (random.random() - 0.5) * 0.08
-        lng_offset = (random.random() - 0.5) * 0.08
-        first_name = first_names[i]
-        last_name = last_names[i]
+    count = len(DEMO_FIRST_NAMES)
+    
+    # Draw every random field in one vectorized pass; .tolist() yields BSON-friendly Python types
+    rng = np.random.default_rng()
+    lats = (base_lat + (rng.random(count) - 0.5) * 0.08).tolist()
+    lngs = (base_lng + (rng.random(count) - 0.5) * 0.08).tolist()
+    statuses = np.where(rng.random(count) > 0.3, "online", "offline").tolist()
+    available = (rng.random(count) > 0.2).tolist()
+    vtypes = rng.choice(DEMO_VEHICLE_TYPES, count).tolist()
+    makes = rng.choice(DEMO_VEHICLE_MAKES, count).tolist()
+    models = rng.choice(DEMO_VEHICLE_MODELS, count).tolist()
+    colors = rng.choice(DEMO_VEHICLE_COLORS, count).tolist()
+    ratings = np.round(4.0 + rng.random(count), 1).tolist()
+    total_rides = rng.integers(10, 501, count).tolist()
+    acceptance = np.round(0.7 + rng.random(count) * 0.3, 2).tolist()
+    earnings_today = np.round(rng.random(count) * 200, 2).tolist()
+    earnings_total = np.round(rng.random(count) * 10000, 2).tolist()
+    now_iso = utc_now_iso()
+    today = datetime.now(timezone.utc).date().isoformat()
+    
+    for i in range(count):
+        driver_id = uuid.uuid4().hex
+        first_name = DEMO_FIRST_NAMES[i]
+        last_name = DEMO_LAST_NAMES[i]
         
         driver = {
             "id": driver_id,
@@ -5800,30 +6680,35 @@ async def seed_demo_drivers():
             "email": f"driver{i+1}@transpo.com",
             "phone": f"+1514555{1000+i}",
             "profile_photo": None,
-            "status": "online" if random.random() > 0.3 else "offline",
-            "is_available": random.random() > 0.2,
-            "vehicle_type": random.choice(vehicle_types),
-            "vehicle_make": random.choice(["Toyota", "Honda", "Ford", "Chevrolet"]),
-            "vehicle_model": random.choice(["Camry", "Accord", "Escape", "Equinox"]),
-            "vehicle_color": random.choice(["White", "Black", "Silver", "Blue", "Red"]),
+            "status": statuses[i],
+            "is_available": available[i],
+            "vehicle_type": vtypes[i],
+            "vehicle_make": makes[i],
+            "vehicle_model": models[i],
+            "vehicle_color": colors[i],
             "license_plate": f"ABC {100+i}",
             "services": ["taxi"],
-            "rating": round(4.0 + random.random(), 1),
-            "total_rides": random.randint(10, 500),
-            "acceptance_rate": round(0.7 + random.random() * 0.3, 2),
-            "earnings_today": round(random.random() * 200, 2),
-            "earnings_total": round(random.random() * 10000, 2),
-            "location": {"latitude": base_lat + lat_offset, "longitude": base_lng + lng_offset},
+            "rating": ratings[i],
+            "total_rides": total_rides[i],
+            "acceptance_rate": acceptance[i],
+            "earnings_today": earnings_today[i],
+            "earnings_date": today,
+            "earnings_total": earnings_total[i],
+            "location": {"latitude": lats[i], "longitude": lngs[i]},
+            "current_location": geo_point(lats[i], lngs[i]),
             "drivers_license_status": "approved",
             "taxi_license_status": "approved",
             "profile_photo_status": "approved",
             "verification_status": "approved",
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": now_iso
         }
         demo_drivers.append(driver)
     
-    await db.drivers.delete_many({"email": {"$regex": "driver.*@transpo.com"}})
-    await db.drivers.insert_many(demo_drivers)
+    # Idempotent upsert keyed on email: one round-trip, no delete pass, other drivers untouched
+    await db.drivers.bulk_write(
+        [ReplaceOne({"email": d["email"]}, d, upsert=True) for d in demo_drivers],
+        ordered=False
+    )
     
     return {"message": f"Created {len(demo_drivers)} demo drivers", "count": len(demo_drivers)}
 
@@ -5849,9 +6734,9 @@ async def create_super_admin():
     else:
         # Create super admin
         super_admin = {
-            "id": str(uuid.uuid4()),
+            "id": uuid.uuid4().hex,
             "email": "admin@demo.com",
-            "password": pwd_context.hash("demo123"),
+            "password": await hash_password("demo123"),
             "name": "Super Admin",
             "first_name": "Super",
             "last_name": "Admin",
@@ -5874,15 +6759,86 @@ async def root():
 
 @api_router.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.now(timezone.utc).isoformat()}
+    # orjson serialises aware datetimes to ISO 8601 itself
+    return {"status": "healthy", "timestamp": datetime.now(timezone.utc)}
 
 # ============== TAXI METER ENDPOINTS ==============
 
 from taxi_meter import TaxiMeter, calculate_fare_estimate, get_rates, QUEBEC_TAXI_RATES
 from services.map_provider import get_map_provider
 
-# In-memory storage for active meters (in production, use Redis)
-active_meters: Dict[str, TaxiMeter] = {}
+# Resolved once; the provider holds any pooled async HTTP client until shutdown
+MAP_PROVIDER = get_map_provider()
+
+# Running meters are not cached between requests: each one lives in its meter_sessions
+# document (meter_state) with a meter_version counter. Requests load the state, and
+# save_meter_state writes it back only if the version is unchanged, so any worker can
+# serve any meter and concurrent requests can't overwrite each other's progress.
+METER_UPDATE_ATTEMPTS = 3
+
+async def get_active_meter(meter_id: str) -> Optional[Tuple[TaxiMeter, int]]:
+    """Running meter restored from its session's saved state, with the state's version."""
+    session = await db.meter_sessions.find_one(
+        {"id": meter_id, "status": "running"},
+        {"_id": 0, "meter_state": 1, "meter_version": 1}
+    )
+    if not session or not session.get("meter_state"):
+        return None
+    return TaxiMeter.from_dict(session["meter_state"]), session.get("meter_version", 0)
+
+async def save_meter_state(meter_id: str, meter: TaxiMeter, version: int, fields: Optional[dict] = None) -> bool:
+    """Persist the meter (plus any extra session fields) if nobody saved it since `version`."""
+    result = await db.meter_sessions.update_one(
+        {
+            "id": meter_id,
+            "status": "running",
+            # Sessions started before versioning have no counter yet
+            "meter_version": version if version else {"$in": [0, None]}
+        },
+        {"$set": {"meter_state": meter.to_dict(), **(fields or {})}, "$inc": {"meter_version": 1}}
+    )
+    return result.modified_count == 1
+
+# GPS fare snapshots are buffered per meter and written in batches to the meter_snapshots
+# time-series collection (one small document per fix, bucketed and compressed by Mongo)
+# rather than $push-ed onto the session; a meter's buffer is flushed early once full
+snapshot_buffers: Dict[str, List[dict]] = {}
+SNAPSHOT_FLUSH_INTERVAL = 2.0  # seconds
+SNAPSHOT_FLUSH_SIZE = 50
+snapshot_flush_task: Optional[asyncio.Task] = None
+
+async def flush_meter_snapshots(meter_ids: Optional[List[str]] = None):
+    """Write buffered snapshots for the given meters (all if None).
+    If the write fails the batches go back to the front of their buffers for the next flush."""
+    ids = list(snapshot_buffers) if meter_ids is None else meter_ids
+    batches = {}
+    for meter_id in ids:
+        batch = snapshot_buffers.pop(meter_id, None)
+        if batch:
+            batches[meter_id] = batch
+    if not batches:
+        return
+    try:
+        await db.meter_snapshots.insert_many(
+            [snapshot for batch in batches.values() for snapshot in batch],
+            ordered=False
+        )
+    except BulkWriteError as e:
+        # Unordered: the rest was written, and rejected documents would be rejected again
+        logger.error(f"[METER] Dropped {len(e.details.get('writeErrors', []))} invalid fare snapshots")
+    except BaseException:
+        for meter_id, batch in batches.items():
+            snapshot_buffers[meter_id] = batch + snapshot_buffers.get(meter_id, [])
+        raise
+
+async def snapshot_flush_loop():
+    """Flush all snapshot buffers every SNAPSHOT_FLUSH_INTERVAL seconds."""
+    while True:
+        await asyncio.sleep(SNAPSHOT_FLUSH_INTERVAL)
+        try:
+            await flush_meter_snapshots()
+        except PyMongoError as e:
+            logger.error(f"[METER] Failed to flush fare snapshots: {e}")
 
 class MeterStartRequest(BaseModel):
     lat: float
@@ -5898,16 +6854,27 @@ class MeterStopRequest(BaseModel):
     custom_tip: Optional[float] = 0
     payment_method: Optional[str] = "cash"
 
+TAXI_RATES_MAX_AGE = 60  # seconds
+
+@lru_cache(maxsize=8)
+def taxi_rates_etag(period: str) -> str:
+    """Strong ETag for the rate table; it only changes with the rate period."""
+    return '"' + hashlib.md5(period.encode()).hexdigest() + '"'
+
 @api_router.get("/taxi/rates")
-async def get_taxi_rates():
+async def get_taxi_rates(request: Request):
     """Get current Quebec taxi rates."""
     now = datetime.now(timezone.utc)
     rates = get_rates(now)
-    return {
+    etag = taxi_rates_etag(rates["period"])
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={TAXI_RATES_MAX_AGE}"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return ORJSONResponse({
         "current_period": rates["period"],
         "rates": QUEBEC_TAXI_RATES,
-        "current_time": now.isoformat()
-    }
+        "current_time": now
+    }, headers=headers)
 
 @api_router.post("/taxi/meter/start")
 async def start_taxi_meter(
@@ -5924,16 +6891,21 @@ async def start_taxi_meter(
         raise HTTPException(status_code=403, detail="Only drivers can use the meter")
     
     driver_id = current_user["id"]
-    meter_id = str(uuid.uuid4())
+    meter_id = uuid.uuid4().hex
     
     # Create new meter
     meter = TaxiMeter()
     meter.start(request.lat, request.lng)
-    active_meters[meter_id] = meter
     
     # Get address for location
-    map_provider = get_map_provider()
-    address = map_provider.reverse_geocode(request.lat, request.lng)
+    address = await MAP_PROVIDER.reverse_geocode(request.lat, request.lng)
+    
+    # Kept on the meter too, so stopping it doesn't need to re-read the session
+    meter.start_location = {
+        "lat": request.lat,
+        "lng": request.lng,
+        "address": address.formatted
+    }
     
     # Store meter session in DB
     session_data = {
@@ -5941,14 +6913,11 @@ async def start_taxi_meter(
         "driver_id": driver_id,
         "booking_id": request.booking_id,
         "mode": "app_booking" if request.booking_id else "street_hail",
-        "start_time": datetime.now(timezone.utc).isoformat(),
-        "start_location": {
-            "lat": request.lat,
-            "lng": request.lng,
-            "address": address.formatted
-        },
+        "start_time": meter.trip_start_time.isoformat(),
+        "start_location": meter.start_location,
         "status": "running",
-        "fare_snapshots": []
+        "meter_state": meter.to_dict(),
+        "meter_version": 0
     }
     await db.meter_sessions.insert_one(session_data)
     
@@ -5971,22 +6940,29 @@ async def update_taxi_meter(
     if current_user.get("role") != "driver":
         raise HTTPException(status_code=403, detail="Only drivers can use the meter")
     
-    if meter_id not in active_meters:
-        raise HTTPException(status_code=404, detail="Meter not found or expired")
-    
-    meter = active_meters[meter_id]
-    fare = meter.update(request.lat, request.lng)
+    # Apply the fix to the latest saved state; reload and reapply if another request saved first
+    for _ in range(METER_UPDATE_ATTEMPTS):
+        loaded = await get_active_meter(meter_id)
+        if loaded is None:
+            raise HTTPException(status_code=404, detail="Meter not found or expired")
+        meter, version = loaded
+        fare = meter.update(request.lat, request.lng)
+        if await save_meter_state(meter_id, meter, version):
+            break
+    else:
+        raise HTTPException(status_code=409, detail="Meter is being updated, please retry")
     
-    # Store snapshot periodically (every update for now)
-    await db.meter_sessions.update_one(
-        {"id": meter_id},
-        {"$push": {"fare_snapshots": {
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "lat": request.lat,
-            "lng": request.lng,
-            "fare": fare["total_before_tip"]
-        }}}
-    )
+    # Buffer the snapshot; the flush loop writes it with the rest of the batch
+    buffer = snapshot_buffers.setdefault(meter_id, [])
+    buffer.append({
+        "ts": meter.last_timestamp,
+        "meter_id": meter_id,
+        "lat": request.lat,
+        "lng": request.lng,
+        "fare": fare["total_before_tip"]
+    })
+    if len(buffer) >= SNAPSHOT_FLUSH_SIZE:
+        await flush_meter_snapshots([meter_id])
     
     return {
         "meter_id": meter_id,
@@ -6004,14 +6980,35 @@ async def stop_taxi_meter(
     if current_user.get("role") != "driver":
         raise HTTPException(status_code=403, detail="Only drivers can use the meter")
     
-    if meter_id not in active_meters:
+    loaded = await get_active_meter(meter_id)
+    if loaded is None:
         raise HTTPException(status_code=404, detail="Meter not found or expired")
+    meter, version = loaded
     
-    meter = active_meters[meter_id]
     meter.stop()
     
+    # Persist buffered snapshots alongside the (cached) settings read
+    settings, _ = await asyncio.gather(
+        load_platform_settings(),
+        flush_meter_snapshots([meter_id])
+    )
+    
+    # The meter holds its last GPS fix and start location; only meters restored
+    # from state saved before start_location was tracked need the session read
+    start_location = meter.start_location
+    if start_location is None:
+        session = await db.meter_sessions.find_one({"id": meter_id}, {"_id": 0, "start_location": 1})
+        start_location = session.get("start_location") if session else None
+    last_lat, last_lng = meter.last_gps or (0, 0)
+    last_snapshot = {"lat": last_lat, "lng": last_lng}
+    
+    # Reverse geocode concurrently while the final fare is computed
+    geocode_task = asyncio.create_task(MAP_PROVIDER.reverse_geocode(
+        last_snapshot.get("lat", 0),
+        last_snapshot.get("lng", 0)
+    ))
+    
     # Get commission rate from platform settings
-    settings = await db.platform_settings.find_one({"type": "global"}, {"_id": 0})
     commission_rate = settings.get("commission_rate", 25.0) if settings else 25.0
     
     # Use payment-specific commission if applicable
@@ -6028,60 +7025,37 @@ async def stop_taxi_meter(
         custom_tip=request.custom_tip,
         commission_rate=commission_rate
     )
+    end_address = await geocode_task
     
-    # Get end location from session or start location
-    session = await db.meter_sessions.find_one({"id": meter_id})
-    
-    # Get last location - use snapshots if available, otherwise use start location
-    fare_snapshots = session.get("fare_snapshots", []) if session else []
-    if fare_snapshots:
-        last_snapshot = fare_snapshots[-1]
-    else:
-        # No movement, use start location
-        start_loc = session.get("start_location", {}) if session else {}
-        last_snapshot = {
-            "lat": start_loc.get("lat", 0),
-            "lng": start_loc.get("lng", 0)
-        }
-    
-    map_provider = get_map_provider()
-    end_address = map_provider.reverse_geocode(
-        last_snapshot.get("lat", 0), 
-        last_snapshot.get("lng", 0)
-    )
-    
-    # Update session as completed
-    await db.meter_sessions.update_one(
-        {"id": meter_id},
-        {"$set": {
-            "status": "completed",
-            "end_time": datetime.now(timezone.utc).isoformat(),
-            "end_location": {
-                "lat": last_snapshot.get("lat"),
-                "lng": last_snapshot.get("lng"),
-                "address": end_address.formatted
-            },
-            "final_fare": final_fare,
-            "payment_method": request.payment_method
-        }}
-    )
-    
-    # Remove from active meters
-    del active_meters[meter_id]
+    # Update session as completed, unless another request changed or stopped the meter meanwhile
+    ended_at = datetime.now(timezone.utc)
+    saved = await save_meter_state(meter_id, meter, version, {
+        "status": "completed",
+        "end_time": ended_at.isoformat(),
+        "end_location": {
+            "lat": last_snapshot.get("lat"),
+            "lng": last_snapshot.get("lng"),
+            "address": end_address.formatted
+        },
+        "final_fare": final_fare,
+        "payment_method": request.payment_method
+    })
+    if not saved:
+        raise HTTPException(status_code=409, detail="Meter changed while stopping, please retry")
     
     return {
         "meter_id": meter_id,
         "status": "completed",
         "final_fare": final_fare,
         "receipt": {
-            "start_location": session.get("start_location") if session else None,
+            "start_location": start_location,
             "end_location": {
                 "lat": last_snapshot.get("lat"),
                 "lng": last_snapshot.get("lng"),
                 "address": end_address.formatted
             },
-            "start_time": session.get("start_time") if session else None,
-            "end_time": datetime.now(timezone.utc).isoformat(),
+            "start_time": meter.trip_start_time.isoformat(),
+            "end_time": ended_at,
             "fare_breakdown": final_fare,
             "payment_method": request.payment_method
         }
@@ -6093,9 +7067,13 @@ async def get_meter_status(
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     """Get current meter status and fare."""
-    if meter_id not in active_meters:
+    loaded = await get_active_meter(meter_id)
+    if loaded is None:
         # Check if it's a completed session
-        session = await db.meter_sessions.find_one({"id": meter_id})
+        session = await db.meter_sessions.find_one(
+            {"id": meter_id},
+            {"_id": 0, "status": 1, "final_fare": 1, "mode": 1}
+        )
         if session:
             return {
                 "meter_id": meter_id,
@@ -6104,8 +7082,8 @@ async def get_meter_status(
                 "mode": session.get("mode")
             }
         raise HTTPException(status_code=404, detail="Meter not found")
+    meter, _ = loaded
     
-    meter = active_meters[meter_id]
     return {
         "meter_id": meter_id,
         "status": "running" if meter.is_running else "stopped",
@@ -6115,19 +7093,27 @@ async def get_meter_status(
 @api_router.get("/taxi/history")
 async def get_meter_history(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    limit: int = 20
+    limit: int = 20,
+    before: Optional[str] = None
 ):
     """Get driver's meter session history."""
     current_user = await get_current_user_jwt(credentials)
     if current_user.get("role") != "driver":
         raise HTTPException(status_code=403, detail="Only drivers can access meter history")
     
+    # Keyset pagination on the (driver_id, start_time) index: pass next_cursor back as before
+    limit = max(1, min(limit, 100))
+    query = {"driver_id": current_user["id"]}
+    if before:
+        query["start_time"] = {"$lt": before}
+    
     sessions = await db.meter_sessions.find(
-        {"driver_id": current_user["id"]},
-        {"_id": 0, "fare_snapshots": 0}  # Exclude large snapshot data
+        query,
+        {"_id": 0, "fare_snapshots": 0, "meter_state": 0}  # Exclude large/internal data
     ).sort("start_time", -1).limit(limit).to_list(limit)
     
-    return {"sessions": sessions}
+    next_cursor = sessions[-1].get("start_time") if len(sessions) == limit else None
+    return {"sessions": sessions, "next_cursor": next_cursor}
 
 @api_router.get("/taxi/estimate")
 async def estimate_taxi_fare(
@@ -6140,8 +7126,7 @@ async def estimate_taxi_fare(
     Get fare estimate using Quebec rates and road-based distance.
     Uses MapProvider for accurate distance calculation.
     """
-    map_provider = get_map_provider()
-    route = map_provider.get_route(
+    route = await MAP_PROVIDER.get_route(
         (pickup_lat, pickup_lng),
         (dropoff_lat, dropoff_lng)
     )
@@ -6173,6 +7158,107 @@ async def estimate_taxi_fare(
     
     return estimate
 
+# ============== DATABASE INDEXES ==============
+
+UNIQUE_INDEXES = (
+    ("bookings", "id"),
+    ("meter_sessions", "id"),
+    ("users", "email"),
+)
+
+async def ensure_indexes():
+    """Create the indexes the hot query paths rely on (no-op if they already exist)."""
+    # The platform_totals stream needs pre- and post-images of trips and withdrawals (MongoDB 6.0+)
+    global platform_totals_pre_images
+    try:
+        existing = set(await db.list_collection_names(filter={"name": {"$in": list(PLATFORM_TOTALS_FIELDS)}}))
+        for name in PLATFORM_TOTALS_FIELDS:
+            if name in existing:
+                await db.command("collMod", name, changeStreamPreAndPostImages={"enabled": True})
+            else:
+                await db.create_collection(name, changeStreamPreAndPostImages={"enabled": True})
+        platform_totals_pre_images = True
+    except PyMongoError as e:
+        logger.warning(f"[DB] Change stream pre-images unavailable: {e}")
+    
+    # Meter GPS snapshots: time-series collection where supported (MongoDB 5.0+),
+    # otherwise a plain collection with the same (meter_id, ts) access path
+    if "meter_snapshots" not in await db.list_collection_names(filter={"name": "meter_snapshots"}):
+        try:
+            await db.create_collection(
+                "meter_snapshots",
+                timeseries={"timeField": "ts", "metaField": "meter_id", "granularity": "seconds"}
+            )
+        except PyMongoError as e:
+            logger.warning(f"[DB] Time-series meter_snapshots unavailable, using a regular collection: {e}")
+    
+    try:
+        await db.meter_snapshots.create_index([("meter_id", 1), ("ts", 1)])
+        await db.platform_transactions.create_index([("created_at", -1), ("id", -1)])
+        await db.platform_transactions.create_index([("type", 1), ("created_at", -1), ("id", -1)])
+        # meter_trips are completed outside this service; derive end_time_epoch from the ISO
+        # end_time so the merchant overview doesn't parse strings (unparseable values stay null
+        # and keep the parsing fallback in trip_end_epoch)
+        await db.meter_trips.update_many(
+            {"end_time_epoch": {"$exists": False}, "end_time": {"$ne": None}},
+            [{"$set": {"end_time_epoch": {"$divide": [
+                {"$toLong": {"$convert": {"input": "$end_time", "to": "date", "onError": None, "onNull": None}}},
+                1000
+            ]}}}]
+        )
+        await db.meter_trips.create_index([("end_time_epoch", 1)])
+        # Completed-trip listings filter on status, sort on (end_time, id) and read only a few
+        # fare fields, so this index serves the filter, the sort and narrow projections
+        await db.meter_trips.create_index([
+            ("status", 1), ("end_time", -1), ("id", -1), ("driver_id", 1), ("user_id", 1),
+            ("final_fare.total_final", 1), ("final_fare.tip", 1)
+        ])
+        # Driver earnings, statements, payouts and trip history
+        await db.meter_trips.create_index([("driver_id", 1), ("status", 1), ("end_time", -1)])
+        await db.meter_trips.create_index([("driver_id", 1), ("created_at", -1)])
+        await db.meter_trips.create_index([("driver_id", 1), ("status", 1), ("payout_status", 1)])
+        await db.bookings.create_index([("user_id", 1), ("created_at", -1)])
+        # Driver job board: pending offers per matched driver, then the driver's own bookings
+        # (active jobs and the weekly completed_at range share the same prefix)
+        await db.bookings.create_index([("status", 1), ("matched_drivers", 1)])
+        await db.bookings.create_index([("driver_id", 1), ("status", 1), ("completed_at", -1)])
+        await db.bookings.create_index([("created_at", -1)])
+        await db.drivers.create_index([("user_id", 1)])
+        await db.drivers.create_index([("status", 1), ("is_available", 1), ("vehicle_type", 1)])
+        # Meter history lists a driver's sessions newest first
+        await db.meter_sessions.create_index([("driver_id", 1), ("start_time", -1)])
+        await db.payment_transactions.create_index([("session_id", 1)])
+        await db.drivers.create_index([("email", 1)])
+        # Backfill GeoJSON points for drivers that only have the legacy lat/lng location
+        await db.drivers.update_many(
+            {
+                "current_location": {"$exists": False},
+                "location.latitude": {"$type": "number"},
+                "location.longitude": {"$type": "number"}
+            },
+            [{"$set": {"current_location": {
+                "type": "Point",
+                "coordinates": ["$location.longitude", "$location.latitude"]
+            }}}]
+        )
+        await db.drivers.create_index([("current_location", "2dsphere")])
+        # Matching only ever looks at online, available drivers; indexing just those keeps the
+        # geo walk off the (much larger) offline fleet
+        await db.drivers.create_index(
+            [("current_location", "2dsphere"), ("vehicle_type", 1)],
+            partialFilterExpression={"status": "online", "is_available": True}
+        )
+    except Exception as e:
+        logger.error(f"[DB] Failed to ensure indexes: {e}")
+    
+    # Unique indexes are created one by one: legacy duplicates make a build fail,
+    # and that should neither block the others nor the non-unique indexes above
+    for collection, field in UNIQUE_INDEXES:
+        try:
+            await db[collection].create_index([(field, 1)], unique=True)
+        except Exception as e:
+            logger.error(f"[DB] Failed to create unique index {collection}.{field}: {e}")
+
 # Include router and middleware
 app.include_router(api_router)
 
@@ -6184,6 +7270,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def start_background_workers():
+    global audit_worker_task, platform_totals_task, snapshot_flush_task
+    audit_worker_task = asyncio.create_task(audit_worker())
+    snapshot_flush_task = asyncio.create_task(snapshot_flush_loop())
+    # Open the first pooled connection before traffic arrives
+    await client.admin.command("ping")
+    await ensure_indexes()
+    platform_totals_task = asyncio.create_task(platform_totals_worker())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
+    await flush_audit_queue()
+    if snapshot_flush_task:
+        snapshot_flush_task.cancel()
+    await flush_meter_snapshots()
+    if platform_totals_task:
+        platform_totals_task.cancel()
+    await MAP_PROVIDER.close()
+    await client.close()
@@ -7,6 +7,7 @@ from abc import ABC, abstractmethod
 from typing import Dict, List, Tuple, Optional
 import math
 from dataclasses import dataclass
+import httpx
 
 
 @dataclass
@@ -30,36 +31,41 @@ class Address:
 
 
 class MapProvider(ABC):
-    """Abstract base class for map providers."""
+    """Abstract base class for map providers. Lookups are async so network-backed
+    providers can await their HTTP calls on the event loop."""
     
     # Road factor - multiply straight-line distance by this for realistic road distance
     ROAD_FACTOR = 1.4
     
     @abstractmethod
-    def get_route(self, origin: Tuple[float, float], destination: Tuple[float, float]) -> Route:
+    async def get_route(self, origin: Tuple[float, float], destination: Tuple[float, float]) -> Route:
         """Get route between two points."""
         pass
     
     @abstractmethod
-    def calculate_distance(self, origin: Tuple[float, float], destination: Tuple[float, float]) -> float:
+    async def calculate_distance(self, origin: Tuple[float, float], destination: Tuple[float, float]) -> float:
         """Calculate distance in km between two points."""
         pass
     
     @abstractmethod
-    def estimate_duration(self, origin: Tuple[float, float], destination: Tuple[float, float]) -> float:
+    async def estimate_duration(self, origin: Tuple[float, float], destination: Tuple[float, float]) -> float:
         """Estimate travel duration in minutes."""
         pass
     
     @abstractmethod
-    def reverse_geocode(self, lat: float, lng: float) -> Address:
+    async def reverse_geocode(self, lat: float, lng: float) -> Address:
         """Convert coordinates to address."""
         pass
     
     @abstractmethod
-    def geocode(self, address: str) -> Optional[Address]:
+    async def geocode(self, address: str) -> Optional[Address]:
         """Convert address string to coordinates."""
         pass
     
+    async def close(self):
+        """Release any network resources held by the provider."""
+        pass
+    
     @staticmethod
     def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
         """
@@ -76,7 +82,8 @@ class MapProvider(ABC):
         a = (math.sin(delta_lat / 2) ** 2 + 
              math.cos(lat1_rad) * math.cos(lat2_rad) * 
              math.sin(delta_lon / 2) ** 2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+        # 2·asin(√a) == 2·atan2(√a, √(1-a)), with one transcendental call
+        c = 2 * math.asin(math.sqrt(min(a, 1.0)))
         
         return R * c
 
@@ -117,7 +124,7 @@ class MockMapProvider(MapProvider):
         ),
     }
     
-    def get_route(self, origin: Tuple[float, float], destination: Tuple[float, float]) -> Route:
+    async def get_route(self, origin: Tuple[float, float], destination: Tuple[float, float]) -> Route:
         """Get route with road-based distance estimate."""
         straight_line = self.haversine_distance(origin[0], origin[1], destination[0], destination[1])
         road_distance = straight_line * self.ROAD_FACTOR
@@ -130,17 +137,17 @@ class MockMapProvider(MapProvider):
             steps=None
         )
     
-    def calculate_distance(self, origin: Tuple[float, float], destination: Tuple[float, float]) -> float:
+    async def calculate_distance(self, origin: Tuple[float, float], destination: Tuple[float, float]) -> float:
         """Calculate road-based distance in km."""
         straight_line = self.haversine_distance(origin[0], origin[1], destination[0], destination[1])
         return round(straight_line * self.ROAD_FACTOR, 2)
     
-    def estimate_duration(self, origin: Tuple[float, float], destination: Tuple[float, float]) -> float:
+    async def estimate_duration(self, origin: Tuple[float, float], destination: Tuple[float, float]) -> float:
         """Estimate travel duration in minutes."""
-        distance = self.calculate_distance(origin, destination)
+        distance = await self.calculate_distance(origin, destination)
         return round((distance / self.AVG_CITY_SPEED) * 60, 1)
     
-    def reverse_geocode(self, lat: float, lng: float) -> Address:
+    async def reverse_geocode(self, lat: float, lng: float) -> Address:
         """Convert coordinates to nearest known address."""
         # Find nearest mock address
         nearest = None
@@ -162,7 +169,7 @@ class MockMapProvider(MapProvider):
             city="Montréal", province="QC", country="Canada"
         )
     
-    def geocode(self, address: str) -> Optional[Address]:
+    async def geocode(self, address: str) -> Optional[Address]:
         """Find coordinates for address string."""
         address_lower = address.lower()
         
@@ -182,25 +189,33 @@ class GoogleMapProvider(MapProvider):
     
     def __init__(self, api_key: str):
         self.api_key = api_key
-        # Initialize Google Maps client here when implemented
+        # One pooled async client for all API calls, so requests reuse kept-alive TLS
+        # connections without blocking the event loop; closed on app shutdown
+        self.http = httpx.AsyncClient(
+            timeout=5.0,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20)
+        )
+    
+    async def close(self):
+        await self.http.aclose()
     
-    def get_route(self, origin: Tuple[float, float], destination: Tuple[float, float]) -> Route:
+    async def get_route(self, origin: Tuple[float, float], destination: Tuple[float, float]) -> Route:
         # TODO: Implement Google Directions API call
         raise NotImplementedError("Google Maps integration pending API key")
     
-    def calculate_distance(self, origin: Tuple[float, float], destination: Tuple[float, float]) -> float:
+    async def calculate_distance(self, origin: Tuple[float, float], destination: Tuple[float, float]) -> float:
         # TODO: Implement Google Distance Matrix API call
         raise NotImplementedError("Google Maps integration pending API key")
     
-    def estimate_duration(self, origin: Tuple[float, float], destination: Tuple[float, float]) -> float:
+    async def estimate_duration(self, origin: Tuple[float, float], destination: Tuple[float, float]) -> float:
         # TODO: Implement Google Distance Matrix API call
         raise NotImplementedError("Google Maps integration pending API key")
     
-    def reverse_geocode(self, lat: float, lng: float) -> Address:
+    async def reverse_geocode(self, lat: float, lng: float) -> Address:
         # TODO: Implement Google Geocoding API call
         raise NotImplementedError("Google Maps integration pending API key")
     
-    def geocode(self, address: str) -> Optional[Address]:
+    async def geocode(self, address: str) -> Optional[Address]:
         # TODO: Implement Google Geocoding API call
         raise NotImplementedError("Google Maps integration pending API key")
 
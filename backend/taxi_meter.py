@@ -34,6 +34,10 @@ QUEBEC_TAXI_RATES = {
 }
 
 
+# Rate period for each hour of the day (day 05:00 - 22:59, night 23:00 - 04:59)
+RATE_PERIOD_BY_HOUR = tuple("day" if 5 <= hour < 23 else "night" for hour in range(24))
+
+
 def get_rate_period(trip_start_time: datetime) -> str:
     """
     Determine if trip uses day or night rate based on start time.
@@ -42,11 +46,7 @@ def get_rate_period(trip_start_time: datetime) -> str:
     Day: 05:00 - 22:59
     Night: 23:00 - 04:59
     """
-    hour = trip_start_time.hour
-    if 5 <= hour < 23:
-        return "day"
-    else:
-        return "night"
+    return RATE_PERIOD_BY_HOUR[trip_start_time.hour]
 
 
 def get_rates(trip_start_time: datetime) -> Dict:
@@ -75,7 +75,8 @@ def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     a = (math.sin(delta_lat / 2) ** 2 + 
          math.cos(lat1_rad) * math.cos(lat2_rad) * 
          math.sin(delta_lon / 2) ** 2)
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    # 2·asin(√a) == 2·atan2(√a, √(1-a)), with one transcendental call
+    c = 2 * math.asin(math.sqrt(min(a, 1.0)))
     
     return R * c
 
@@ -109,6 +110,7 @@ class TaxiMeter:
         self.waiting_cost = 0.0
         
         # GPS tracking
+        self.start_location = None  # {"lat", "lng", "address"} for the receipt
         self.last_gps = None
         self.last_timestamp = None
         
@@ -116,6 +118,36 @@ class TaxiMeter:
         self.is_running = False
         self.is_completed = False
         
+    def to_dict(self) -> Dict:
+        """Serializable meter state, so a running meter can be restored in another process."""
+        return {
+            "trip_start_time": self.trip_start_time.isoformat(),
+            "total_distance_km": self.total_distance_km,
+            "total_waiting_minutes": self.total_waiting_minutes,
+            "distance_cost": self.distance_cost,
+            "waiting_cost": self.waiting_cost,
+            "start_location": self.start_location,
+            "last_gps": list(self.last_gps) if self.last_gps else None,
+            "last_timestamp": self.last_timestamp.isoformat() if self.last_timestamp else None,
+            "is_running": self.is_running,
+            "is_completed": self.is_completed
+        }
+    
+    @classmethod
+    def from_dict(cls, state: Dict) -> "TaxiMeter":
+        """Rebuild a meter from to_dict() output (rates are re-derived from the start time)."""
+        meter = cls(datetime.fromisoformat(state["trip_start_time"]))
+        meter.total_distance_km = state["total_distance_km"]
+        meter.total_waiting_minutes = state["total_waiting_minutes"]
+        meter.distance_cost = state["distance_cost"]
+        meter.waiting_cost = state["waiting_cost"]
+        meter.start_location = state.get("start_location")
+        meter.last_gps = tuple(state["last_gps"]) if state.get("last_gps") else None
+        meter.last_timestamp = datetime.fromisoformat(state["last_timestamp"]) if state.get("last_timestamp") else None
+        meter.is_running = state["is_running"]
+        meter.is_completed = state["is_completed"]
+        return meter
+        
     def start(self, initial_lat: float, initial_lng: float):
         """Start the meter with initial GPS position."""
         self.is_running = True
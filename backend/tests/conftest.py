@@ -0,0 +1,13 @@
+"""
+Shared setup for the backend unit tests: make server importable without a
+running deployment. AsyncMongoClient does not connect until first use, and
+tests swap server.db for mocks.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "transpo_test")
@@ -0,0 +1,89 @@
+"""
+Running meters live in their meter_sessions document: each request loads the
+state and saves it back only if meter_version has not moved.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from taxi_meter import TaxiMeter
+
+DRIVER = {"id": "driver-1", "role": "driver"}
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    fake_db = MagicMock()
+    fake_db.meter_sessions.find_one = AsyncMock()
+    fake_db.meter_sessions.update_one = AsyncMock(return_value=MagicMock(modified_count=1))
+    monkeypatch.setattr(server, "db", fake_db)
+    monkeypatch.setattr(server, "get_current_user_jwt", AsyncMock(return_value=DRIVER))
+    return fake_db.meter_sessions
+
+
+def running_state() -> dict:
+    meter = TaxiMeter()
+    meter.start(45.5017, -73.5673)
+    return meter.to_dict()
+
+
+def test_save_meter_state_rejects_version_mismatch(sessions):
+    sessions.update_one.return_value = MagicMock(modified_count=0)
+    meter = TaxiMeter.from_dict(running_state())
+
+    assert asyncio.run(server.save_meter_state("m1", meter, 3)) is False
+
+    query, update = sessions.update_one.await_args.args
+    assert query == {"id": "m1", "status": "running", "meter_version": 3}
+    assert update["$inc"] == {"meter_version": 1}
+    assert update["$set"]["meter_state"] == meter.to_dict()
+
+
+def test_save_meter_state_matches_unversioned_legacy_session(sessions):
+    meter = TaxiMeter.from_dict(running_state())
+
+    assert asyncio.run(server.save_meter_state("m1", meter, 0)) is True
+
+    query, _ = sessions.update_one.await_args.args
+    assert query["meter_version"] == {"$in": [0, None]}
+
+
+def test_legacy_session_without_version_loads_as_version_zero(sessions):
+    sessions.find_one.return_value = {"meter_state": running_state()}
+
+    meter, version = asyncio.run(server.get_active_meter("m1"))
+
+    assert version == 0
+    assert meter.is_running
+
+
+def test_legacy_session_without_state_is_not_active(sessions):
+    sessions.find_one.return_value = {}
+
+    assert asyncio.run(server.get_active_meter("m1")) is None
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(server.update_taxi_meter(
+            "m1", server.MeterUpdateRequest(lat=45.5, lng=-73.56), credentials=None
+        ))
+    assert exc.value.status_code == 404
+
+
+def test_update_gives_up_with_409_after_repeated_conflicts(sessions, monkeypatch):
+    monkeypatch.setattr(server, "snapshot_buffers", {})
+    sessions.find_one.return_value = {"meter_state": running_state(), "meter_version": 5}
+    sessions.update_one.return_value = MagicMock(modified_count=0)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(server.update_taxi_meter(
+            "m1", server.MeterUpdateRequest(lat=45.5, lng=-73.56), credentials=None
+        ))
+
+    assert exc.value.status_code == 409
+    assert sessions.find_one.await_count == server.METER_UPDATE_ATTEMPTS
+    assert sessions.update_one.await_count == server.METER_UPDATE_ATTEMPTS
+    # Nothing is buffered for a fix that was never saved
+    assert server.snapshot_buffers == {}
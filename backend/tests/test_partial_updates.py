@@ -0,0 +1,29 @@
+"""
+Partial-update smoke tests: a PUT/PATCH payload with one field must only $set
+that field (plus the bookkeeping fields), never the model's other optionals.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import server
+
+
+def test_one_field_settings_update_sets_one_payload_key(monkeypatch):
+    fake_db = MagicMock()
+    fake_db.platform_settings.update_one = AsyncMock()
+    monkeypatch.setattr(server, "db", fake_db)
+    monkeypatch.setattr(server, "utc_now_iso", lambda: "2026-01-01T00:00:00+00:00")
+
+    updates = server.PlatformSettingsUpdate(commission_rate=20.0)
+    asyncio.run(server.update_platform_settings(updates, current_user={"id": "admin-1"}))
+
+    fake_db.platform_settings.update_one.assert_awaited_once_with(
+        {"type": "global"},
+        {"$set": {
+            "commission_rate": 20.0,
+            "updated_at": "2026-01-01T00:00:00+00:00",
+            "updated_by": "admin-1"
+        }},
+        upsert=True
+    )
@@ -0,0 +1,77 @@
+"""
+Stored Stripe secrets: encryption with STRIPE_CONFIG_KEY, and which key Stripe
+calls end up using with or without it.
+"""
+
+import asyncio
+import base64
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+TEST_KEY = base64.urlsafe_b64encode(b"k" * 32).decode()
+
+
+@pytest.fixture
+def config_key(monkeypatch):
+    monkeypatch.setenv("STRIPE_CONFIG_KEY", TEST_KEY)
+    server.stripe_secret_box.cache_clear()
+    yield
+    server.stripe_secret_box.cache_clear()
+
+
+@pytest.fixture
+def no_config_key(monkeypatch):
+    monkeypatch.delenv("STRIPE_CONFIG_KEY", raising=False)
+    server.stripe_secret_box.cache_clear()
+    yield
+    server.stripe_secret_box.cache_clear()
+
+
+def use_stripe_config(monkeypatch, config):
+    async def load_stripe_config():
+        return config
+    monkeypatch.setattr(server, "load_stripe_config", load_stripe_config)
+
+
+def test_encrypt_decrypt_round_trip(config_key):
+    token = server.encrypt_secret("sk_test_123")
+
+    assert "sk_test_123" not in token
+    assert server.decrypt_secret(token) == "sk_test_123"
+    # Fresh nonce per call
+    assert server.encrypt_secret("sk_test_123") != token
+
+
+def test_encrypt_without_key_raises(no_config_key):
+    with pytest.raises(RuntimeError):
+        server.encrypt_secret("sk_test_123")
+
+
+def test_api_key_from_encrypted_config(config_key, monkeypatch):
+    use_stripe_config(monkeypatch, {"secret_key_ct": server.encrypt_secret("sk_test_saved")})
+
+    assert asyncio.run(server.get_stripe_api_key()) == "sk_test_saved"
+
+
+def test_api_key_from_legacy_plaintext_config(no_config_key, monkeypatch):
+    use_stripe_config(monkeypatch, {"secret_key": "sk_test_legacy"})
+
+    assert asyncio.run(server.get_stripe_api_key()) == "sk_test_legacy"
+
+
+def test_api_key_falls_back_to_env_key(no_config_key, monkeypatch):
+    use_stripe_config(monkeypatch, {"secret_key_ct": "c2VhbGVk"})
+    monkeypatch.setattr(server.stripe, "api_key", "sk_test_env")
+
+    assert asyncio.run(server.get_stripe_api_key()) == "sk_test_env"
+
+
+def test_update_config_without_key_is_unavailable(no_config_key):
+    config = server.StripeConfigUpdate(publishable_key="pk_test_abc", secret_key="sk_test_abc")
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(server.update_stripe_config(config, current_user={"id": "super-1"}))
+    assert exc.value.status_code == 503
@@ -0,0 +1,41 @@
+"""
+TaxiMeter state round-trips: running meters are saved with to_dict() and
+restored with from_dict() on every request.
+"""
+
+from datetime import timedelta
+
+from taxi_meter import TaxiMeter
+
+
+def started_meter() -> TaxiMeter:
+    meter = TaxiMeter()
+    meter.start(45.5017, -73.5673)
+    meter.start_location = {"lat": 45.5017, "lng": -73.5673, "address": "Downtown Montreal, QC"}
+    # Pretend the last fix was a minute ago so the next update accrues distance and time
+    meter.last_timestamp -= timedelta(minutes=1)
+    meter.update(45.5088, -73.5540)
+    return meter
+
+
+def test_round_trip_mid_trip():
+    meter = started_meter()
+    assert meter.total_distance_km > 0
+
+    restored = TaxiMeter.from_dict(meter.to_dict())
+
+    assert restored.to_dict() == meter.to_dict()
+    assert restored.rates == meter.rates
+    assert restored.is_running and not restored.is_completed
+
+
+def test_round_trip_after_stop():
+    meter = started_meter()
+    final = meter.stop()
+
+    restored = TaxiMeter.from_dict(meter.to_dict())
+
+    assert restored.to_dict() == meter.to_dict()
+    assert not restored.is_running and restored.is_completed
+    # A stopped meter ignores further fixes
+    assert restored.update(45.52, -73.56)["total_before_tip"] == final["total_before_tip"]
@@ -601,21 +601,10 @@ export default function AdminDashboard() {
       if (transactionFilters.start_date) params.append('start_date', transactionFilters.start_date);
       if (transactionFilters.end_date) params.append('end_date', transactionFilters.end_date);
       
-      const res = await fetch(`${API_URL}/admin/payments/transactions/export?${params}`, { headers: getAuthHeaders() });
+      // Server streams the CSV; download it as-is
+      const res = await fetch(`${API_URL}/admin/payments/transactions/export/csv?${params}`, { headers: getAuthHeaders() });
       if (res.ok) {
-        const data = await res.json();
-        // Convert to CSV and download
-        const headers = ['Trip ID', 'Date', 'Base Fare', 'Distance', 'Waiting', 'Tip', 'Quebec Fee', 'GST', 'QST', 'Gross Total', 'Stripe Fee', 'Commission', 'Net to Driver'];
-        const csvContent = [
-          headers.join(','),
-          ...data.data.map(row => [
-            row.trip_id, row.date, row.base_fare, row.distance_fare, row.waiting_fare,
-            row.tip, row.quebec_fee, row.gst, row.qst, row.gross_total,
-            row.stripe_fee, row.platform_commission, row.net_to_driver
-          ].join(','))
-        ].join('\n');
-        
-        const blob = new Blob([csvContent], { type: 'text/csv' });
+        const blob = await res.blob();
         const url = window.URL.createObjectURL(blob);
         const a = document.createElement('a');
         a.href = url;